@@ -0,0 +1,35 @@
+"""leases table
+
+Revision ID: a0d2f4b6c8e9
+Revises: f9c1e3a5b7d8
+Create Date: 2026-10-18 21:48:03.716294
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a0d2f4b6c8e9'
+down_revision: Union[str, Sequence[str], None] = 'f9c1e3a5b7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Leader lease for the background loops (core.leader)
+    op.create_table(
+        "leases",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("holder", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.Float(), nullable=False),
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("leases")
@@ -0,0 +1,34 @@
+"""customer list name index
+
+Revision ID: a3c1e5f7b9d2
+Revises: 764db1abccba
+Create Date: 2026-10-18 09:12:41.518233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c1e5f7b9d2'
+down_revision: Union[str, Sequence[str], None] = '764db1abccba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Matches the customer list ORDER BY, used by keyset pagination
+    op.create_index(
+        "ix_customers_name_nocase",
+        "customers",
+        [sa.text("first_name COLLATE NOCASE"), sa.text("last_name COLLATE NOCASE"), "id"],
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_customers_name_nocase", table_name="customers")
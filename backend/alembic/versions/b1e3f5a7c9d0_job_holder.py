@@ -0,0 +1,37 @@
+"""job holder and heartbeat
+
+Revision ID: b1e3f5a7c9d0
+Revises: a0d2f4b6c8e9
+Create Date: 2026-10-18 23:12:40.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1e3f5a7c9d0'
+down_revision: Union[str, Sequence[str], None] = 'a0d2f4b6c8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Owning process of a job (core.jobs): only stale jobs are marked interrupted
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("jobs")}
+    with op.batch_alter_table("jobs") as batch_op:
+        # ensure_job_columns at startup may have added them already
+        if "holder" not in columns:
+            batch_op.add_column(sa.Column("holder", sa.String(), nullable=True))
+        if "heartbeat_at" not in columns:
+            batch_op.add_column(sa.Column("heartbeat_at", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("heartbeat_at")
+        batch_op.drop_column("holder")
@@ -0,0 +1,34 @@
+"""reference cache version stamps
+
+Revision ID: b3e5d7f9a1c4
+Revises: a8d4e6f1c3b5
+Create Date: 2026-10-18 17:21:45.104318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e5d7f9a1c4'
+down_revision: Union[str, Sequence[str], None] = 'a8d4e6f1c3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_all at startup may have made it already
+    op.create_table(
+        "cache_versions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cache_versions")
@@ -0,0 +1,98 @@
+"""customer full-text search index (FTS5)
+
+Revision ID: b7d2f4a6c8e1
+Revises: a3c1e5f7b9d2
+Create Date: 2026-10-18 10:04:17.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2f4a6c8e1'
+down_revision: Union[str, Sequence[str], None] = 'a3c1e5f7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same DDL as functions.search at the time of this revision, kept here so the
+# revision does not change with the app code
+COUNTRY_CODE = "46"
+FTS_COLUMNS = "rowid, name, email, phone, location, comment"
+
+
+def _digits_sql(column: str) -> str:
+    sql = column
+    for ch in ("+", " ", "-", "(", ")", "/", "."):
+        sql = f"replace({sql}, '{ch}', '')"
+    return f"coalesce({sql}, '')"
+
+
+def _phone_sql(column: str) -> str:
+    digits = _digits_sql(column)
+    return (
+        f"{digits} || ' ' || CASE"
+        f" WHEN {digits} LIKE '{COUNTRY_CODE}%' THEN '0' || substr({digits}, {len(COUNTRY_CODE) + 1})"
+        f" WHEN {digits} LIKE '0%' THEN '{COUNTRY_CODE}' || substr({digits}, 2)"
+        f" ELSE '' END"
+    )
+
+
+def _row_sql(prefix: str) -> str:
+    return (
+        f"{prefix}id, "
+        f"coalesce({prefix}first_name, '') || ' ' || coalesce({prefix}last_name, ''), "
+        f"coalesce({prefix}email, ''), "
+        f"{_phone_sql(prefix + 'phone')}, "
+        f"coalesce({prefix}location, ''), "
+        f"coalesce({prefix}comment, '')"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    if conn.dialect.name != "sqlite":
+        return
+    # Standalone FTS5 table keyed on rowid = customers.id, kept in sync by triggers
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+            name, email, phone, location, comment,
+            prefix = '2 3 4'
+        )
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts ({FTS_COLUMNS}) VALUES ({_row_sql('NEW.')});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_update AFTER UPDATE OF
+            first_name, last_name, email, phone, location, comment ON customers BEGIN
+            DELETE FROM customers_fts WHERE rowid = OLD.id;
+            INSERT INTO customers_fts ({FTS_COLUMNS}) VALUES ({_row_sql('NEW.')});
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_delete AFTER DELETE ON customers BEGIN
+            DELETE FROM customers_fts WHERE rowid = OLD.id;
+        END
+    """)
+
+    # Backfill
+    op.execute("DELETE FROM customers_fts")
+    op.execute(f"INSERT INTO customers_fts ({FTS_COLUMNS}) SELECT {_row_sql('')} FROM customers")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+    if conn.dialect.name != "sqlite":
+        return
+    op.execute("DROP TRIGGER IF EXISTS customers_fts_insert")
+    op.execute("DROP TRIGGER IF EXISTS customers_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS customers_fts_delete")
+    op.execute("DROP TABLE IF EXISTS customers_fts")
@@ -0,0 +1,105 @@
+"""customer categories/organisations/tags junction tables
+
+Revision ID: c4e8a1d3f5b7
+Revises: b7d2f4a6c8e1
+Create Date: 2026-10-18 11:26:03.774410
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1d3f5b7'
+down_revision: Union[str, Sequence[str], None] = 'b7d2f4a6c8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _values(raw):
+    """JSON list or CSV text -> set of strings (same rules as customer_values())."""
+    if raw is None:
+        return set()
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            pass
+    if raw is None:
+        return set()
+    if isinstance(raw, list):
+        return {str(v).strip() for v in raw if str(v).strip()}
+    return {v.strip().strip("'\"") for v in str(raw).split(",") if v.strip().strip("'\"")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_all at startup may have made these already
+    op.create_table(
+        "customer_categories",
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("value_id", sa.String(), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_customer_categories_value", "customer_categories", ["value_id", "customer_id"], if_not_exists=True)
+
+    op.create_table(
+        "customer_organisations",
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("value_id", sa.String(), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_customer_organisations_value", "customer_organisations", ["value_id", "customer_id"], if_not_exists=True)
+
+    op.create_table(
+        "customer_tags",
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("value_id", sa.Integer(), sa.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_customer_tags_value", "customer_tags", ["value_id", "customer_id"], if_not_exists=True)
+
+    # --- Backfill from the JSON columns ---
+    # Tables may already exist (created empty by create_all at startup), refill them
+    conn = op.get_bind()
+    for table in ("customer_categories", "customer_organisations", "customer_tags"):
+        conn.execute(sa.text(f"DELETE FROM {table}"))
+
+    rows = conn.execute(sa.text("SELECT id, categories, organisations, tags FROM customers")).all()
+
+    categories, organisations, tag_names = [], [], {}
+    for customer_id, cats, orgs, tags in rows:
+        categories += [{"customer_id": customer_id, "value_id": v} for v in _values(cats)]
+        organisations += [{"customer_id": customer_id, "value_id": v} for v in _values(orgs)]
+        tag_names[customer_id] = _values(tags)
+
+    all_names = set().union(*tag_names.values()) if tag_names else set()
+    tag_ids = {name: id for id, name in conn.execute(sa.text("SELECT id, name FROM tags"))}
+    for name in sorted(all_names - tag_ids.keys()):
+        conn.execute(sa.text("INSERT INTO tags (name) VALUES (:name)"), {"name": name})
+    tag_ids = {name: id for id, name in conn.execute(sa.text("SELECT id, name FROM tags"))}
+    tags = [
+        {"customer_id": customer_id, "value_id": tag_ids[name]}
+        for customer_id, names in tag_names.items()
+        for name in names
+    ]
+
+    if categories:
+        conn.execute(sa.text("INSERT INTO customer_categories (customer_id, value_id) VALUES (:customer_id, :value_id)"), categories)
+    if organisations:
+        conn.execute(sa.text("INSERT INTO customer_organisations (customer_id, value_id) VALUES (:customer_id, :value_id)"), organisations)
+    if tags:
+        conn.execute(sa.text("INSERT INTO customer_tags (customer_id, value_id) VALUES (:customer_id, :value_id)"), tags)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_customer_tags_value", table_name="customer_tags")
+    op.drop_table("customer_tags")
+    op.drop_index("ix_customer_organisations_value", table_name="customer_organisations")
+    op.drop_table("customer_organisations")
+    op.drop_index("ix_customer_categories_value", table_name="customer_categories")
+    op.drop_table("customer_categories")
@@ -0,0 +1,51 @@
+"""unique alarm and product_customer rows for save_call upserts
+
+Revision ID: c4f6a8b0d2e5
+Revises: b3e5d7f9a1c4
+Create Date: 2026-10-18 18:02:37.519024
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f6a8b0d2e5'
+down_revision: Union[str, Sequence[str], None] = 'b3e5d7f9a1c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Duplicates from concurrent saves: keep the oldest row, the one save_call kept updating
+    op.execute(
+        "DELETE FROM product_customers WHERE id NOT IN "
+        "(SELECT MIN(id) FROM product_customers GROUP BY customer_id, product_id)"
+    )
+    op.execute(
+        "DELETE FROM alarms WHERE id NOT IN "
+        "(SELECT MIN(id) FROM alarms GROUP BY customer_id, caller_id, coalesce(product_id, 0))"
+    )
+    op.create_index(
+        "uq_product_customers_customer_product",
+        "product_customers",
+        ["customer_id", "product_id"],
+        unique=True,
+        if_not_exists=True,
+    )
+    op.create_index(
+        "uq_alarms_customer_caller_product",
+        "alarms",
+        ["customer_id", "caller_id", sa.text("coalesce(product_id, 0)")],
+        unique=True,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_alarms_customer_caller_product", table_name="alarms")
+    op.drop_index("uq_product_customers_customer_product", table_name="product_customers")
@@ -0,0 +1,34 @@
+"""calls (customer_id, id) index
+
+Revision ID: d7a9c1e3f5b6
+Revises: c4f6a8b0d2e5
+Create Date: 2026-10-18 19:41:08.214630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a9c1e3f5b6'
+down_revision: Union[str, Sequence[str], None] = 'c4f6a8b0d2e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Call panel keyset pages: newest calls of a customer by id
+    op.create_index(
+        "ix_calls_customer_id",
+        "calls",
+        ["customer_id", "id"],
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_calls_customer_id", table_name="calls")
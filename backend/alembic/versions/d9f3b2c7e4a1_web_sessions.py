@@ -0,0 +1,37 @@
+"""server-side web_sessions table
+
+Revision ID: d9f3b2c7e4a1
+Revises: c4e8a1d3f5b7
+Create Date: 2026-10-18 13:02:41.518220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f3b2c7e4a1'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1d3f5b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_all at startup may have made it already
+    op.create_table(
+        "web_sessions",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("data", sa.Text(), nullable=False),
+        sa.Column("expires_at", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_web_sessions_expires_at", "web_sessions", ["expires_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_web_sessions_expires_at", table_name="web_sessions")
+    op.drop_table("web_sessions")
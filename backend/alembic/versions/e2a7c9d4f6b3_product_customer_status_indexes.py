@@ -0,0 +1,41 @@
+"""product_customers status indexes
+
+Revision ID: e2a7c9d4f6b3
+Revises: d9f3b2c7e4a1
+Create Date: 2026-10-18 13:41:09.207731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c9d4f6b3'
+down_revision: Union[str, Sequence[str], None] = 'd9f3b2c7e4a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Status totals (GROUP BY status) and keyset listing per product / per customer
+    op.create_index(
+        "ix_product_customers_product_status",
+        "product_customers",
+        ["product_id", "status", "id"],
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+    op.create_index(
+        "ix_product_customers_customer_status",
+        "product_customers",
+        ["customer_id", "status", "id"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_product_customers_customer_status", table_name="product_customers")
+    op.drop_index("ix_product_customers_product_status", table_name="product_customers")
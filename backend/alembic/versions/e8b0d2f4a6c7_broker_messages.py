@@ -0,0 +1,37 @@
+"""broker_messages table
+
+Revision ID: e8b0d2f4a6c7
+Revises: d7a9c1e3f5b6
+Create Date: 2026-10-18 20:26:44.902175
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b0d2f4a6c7'
+down_revision: Union[str, Sequence[str], None] = 'd7a9c1e3f5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Pub/sub messages for BROKER=database (core.broker)
+    op.create_table(
+        "broker_messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sqlite_autoincrement=True,
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("broker_messages")
@@ -19,11 +19,8 @@ branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
-def upgrade():
-    print("[upgrade] Starting migration: adding last_call_date column")
-    op.add_column("customers", sa.Column("last_call_date", sa.DateTime(timezone=True), nullable=True))
-
-    connection = op.get_bind()
+def _upgrade_rows(connection):
+    """Per-row fallback for databases without SQLite's JSON functions."""
     customers = connection.execute(sa.text("SELECT id, extra FROM customers")).fetchall()
     print(f"[upgrade] Found {len(customers)} customers to inspect")
 
@@ -58,12 +55,9 @@ def upgrade():
         except Exception as e:
             print(f"[upgrade] ⚠️ Failed to parse or update customer {customer_id}: {e}")
 
-    print("[upgrade] ✅ Migration complete.")
-
 
-def downgrade():
-    print("[downgrade] Starting rollback: moving last_call_date back into extra")
-    connection = op.get_bind()
+def _downgrade_rows(connection):
+    """Per-row fallback for databases without SQLite's JSON functions."""
     customers = connection.execute(sa.text("SELECT id, last_call_date, extra FROM customers")).fetchall()
     print(f"[downgrade] Found {len(customers)} customers to inspect")
 
@@ -99,5 +93,45 @@ def downgrade():
         except Exception as e:
             print(f"[downgrade] ⚠️ Failed to handle customer {customer_id}: {e}")
 
+
+def upgrade():
+    print("[upgrade] Starting migration: adding last_call_date column")
+    op.add_column("customers", sa.Column("last_call_date", sa.DateTime(timezone=True), nullable=True))
+
+    connection = op.get_bind()
+    if connection.dialect.name == "sqlite":
+        # One set-based UPDATE instead of a statement per customer.
+        # datetime() turns ISO strings (with offset) into UTC, NULL if unparseable
+        result = connection.execute(sa.text("""
+            UPDATE customers
+            SET last_call_date = datetime(json_extract(extra, '$.last_call_date')),
+                extra = json_remove(extra, '$.last_call_date')
+            WHERE json_valid(extra)
+              AND datetime(json_extract(extra, '$.last_call_date')) IS NOT NULL
+        """))
+        print(f"[upgrade] Migrated {result.rowcount} customers")
+    else:
+        _upgrade_rows(connection)
+
+    print("[upgrade] ✅ Migration complete.")
+
+
+def downgrade():
+    print("[downgrade] Starting rollback: moving last_call_date back into extra")
+    connection = op.get_bind()
+    if connection.dialect.name == "sqlite":
+        result = connection.execute(sa.text("""
+            UPDATE customers
+            SET extra = json_set(
+                CASE WHEN json_valid(extra) THEN extra ELSE '{}' END,
+                '$.last_call_date',
+                strftime('%Y-%m-%dT%H:%M:00+00:00', last_call_date)
+            )
+            WHERE last_call_date IS NOT NULL
+        """))
+        print(f"[downgrade] Restored {result.rowcount} customers")
+    else:
+        _downgrade_rows(connection)
+
     op.drop_column("customers", "last_call_date")
     print("[downgrade] ✅ Rollback complete.")
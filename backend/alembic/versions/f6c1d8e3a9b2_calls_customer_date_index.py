@@ -0,0 +1,34 @@
+"""calls (customer_id, call_date, status) index
+
+Revision ID: f6c1d8e3a9b2
+Revises: e2a7c9d4f6b3
+Create Date: 2026-10-18 14:20:51.630174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c1d8e3a9b2'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c9d4f6b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Per-customer call lookups: MAX(call_date) for last_call_date, call history
+    op.create_index(
+        "ix_calls_customer_date",
+        "calls",
+        ["customer_id", "call_date", "status"],
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_calls_customer_date", table_name="calls")
@@ -0,0 +1,34 @@
+"""alarms date index
+
+Revision ID: f9c1e3a5b7d8
+Revises: e8b0d2f4a6c7
+Create Date: 2026-10-18 21:07:19.562381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9c1e3a5b7d8'
+down_revision: Union[str, Sequence[str], None] = 'e8b0d2f4a6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Alarm scheduler start-up load: alarms not passed yet (functions.alarms)
+    op.create_index(
+        "ix_alarms_date",
+        "alarms",
+        ["date"],
+        if_not_exists=True,  # create_all at startup may have made it already
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_alarms_date", table_name="alarms")
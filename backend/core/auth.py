@@ -4,9 +4,13 @@ from fastapi import FastAPI, Request, Depends, HTTPException
 from sqlalchemy.orm import relationship, Session
 from fastapi import FastAPI, Request, Form, Depends, HTTPException
 
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from core.models.models import User
 from core.models.models import BaseMixin, Update, User
-from core.database import get_db
+from core.database import get_db, get_async_db
 
 
 # --- Helper ---
@@ -21,4 +25,22 @@ def get_current_user(
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
\ No newline at end of file
+    return user
+
+
+async def get_current_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Async version of get_current_user for routes using get_async_db."""
+    user_id = request.session.get("user")
+
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    result = await db.execute(
+        select(User).options(joinedload(User.caller)).where(User.id == user_id)  # one query, caller joined
+    )
+    user = result.scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
@@ -0,0 +1,223 @@
+# core/broker.py
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from core.database import ASYNC_DATABASE_URL, async_write_lock, create_async_db_engine
+from core.models.models import BrokerMessage
+
+# -------------------------------------------------
+# Pub/sub broker: messages reach subscribers in every worker
+#
+# BROKER selects the backend:
+#   local     in-process only (one uvicorn worker, the default)
+#   database  broker_messages table on the app database, polled every
+#             BROKER_POLL_MS by each worker; no extra service needed
+#   redis     Redis PUBLISH/SUBSCRIBE at BROKER_URL (needs the redis package)
+#
+# A handler is an async fn(message: dict). A worker subscribes to the
+# channels it has listeners for (core.ws: one channel per user with open
+# sockets) and publish() reaches them wherever they are.
+# publish() returns the number of workers that received the message
+# when the backend knows it (local, redis), None otherwise (database).
+# -------------------------------------------------
+
+BROKER = os.environ.get("BROKER", "local")
+BROKER_URL = os.environ.get("BROKER_URL", "redis://localhost:6379/0")
+BROKER_POLL_MS = float(os.environ.get("BROKER_POLL_MS", "100"))
+BROKER_RETENTION = 60    # seconds a database message is kept; far above the poll interval
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Broker:
+    """In-process broker; the base of the cross-process backends."""
+    name = "local"
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Handler]] = {}
+
+    def start(self):
+        """Start listening on the running loop (no-op if running)."""
+
+    async def stop(self):
+        pass
+
+    async def publish(self, channel: str, message: dict) -> Optional[int]:
+        return 1 if await self._dispatch(channel, message) else 0
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self.handlers.setdefault(channel, []).append(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler):
+        handlers = self.handlers.get(channel, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.handlers.pop(channel, None)
+
+    async def _dispatch(self, channel: str, message: dict) -> int:
+        """Run this worker's handlers for channel; returns how many ran."""
+        handlers = list(self.handlers.get(channel, []))
+        for handler in handlers:
+            try:
+                await handler(message)
+            except Exception as e:
+                print(f"Broker handler failed on {channel}: {e}")
+        return len(handlers)
+
+
+class DatabaseBroker(Broker):
+    """
+    Messages are rows in broker_messages. Every worker polls for rows newer
+    than the last id it saw and dispatches the ones on its channels.
+    """
+    name = "database"
+
+    def __init__(self, url: str = ASYNC_DATABASE_URL, poll_ms: float = BROKER_POLL_MS):
+        super().__init__()
+        self.url = url
+        self.poll_ms = poll_ms
+        self.engine = None
+        self.task: asyncio.Task | None = None
+
+    def start(self):
+        if self.engine is None:
+            # own pool: the poller must never wait behind request connections
+            self.engine = create_async_db_engine(self.url)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def publish(self, channel: str, message: dict) -> Optional[int]:
+        self.start()
+        async with async_write_lock():
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    insert(BrokerMessage).values(channel=channel, payload=message, created_at=time.time())
+                )
+        return None
+
+    async def _poll(self):
+        async with self.engine.connect() as conn:
+            last_id = (await conn.execute(select(func.max(BrokerMessage.id)))).scalar() or 0
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_ms / 1000)
+            try:
+                async with self.engine.connect() as conn:
+                    rows = (await conn.execute(
+                        select(BrokerMessage.id, BrokerMessage.channel, BrokerMessage.payload)
+                        .where(BrokerMessage.id > last_id)
+                        .order_by(BrokerMessage.id)
+                    )).all()
+                for row in rows:
+                    last_id = row.id   # read past other channels too: a later subscriber gets no backlog
+                    if row.channel in self.handlers:
+                        await self._dispatch(row.channel, row.payload)
+
+                if time.monotonic() - last_prune > BROKER_RETENTION:
+                    last_prune = time.monotonic()
+                    async with async_write_lock():
+                        async with self.engine.begin() as conn:
+                            await conn.execute(
+                                delete(BrokerMessage).where(BrokerMessage.created_at < time.time() - BROKER_RETENTION)
+                            )
+            except Exception as e:
+                print(f"Broker poll error: {e}")
+
+
+class RedisBroker(Broker):
+    """Redis PUBLISH/SUBSCRIBE; one subscription per channel with local handlers."""
+    name = "redis"
+
+    def __init__(self, url: str = BROKER_URL):
+        super().__init__()
+        self.url = url
+        self.redis = None
+        self.pubsub = None
+        self.task: asyncio.Task | None = None
+
+    def start(self):
+        if self.redis is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                raise RuntimeError("BROKER=redis needs the redis package (pip install redis)")
+            self.redis = aioredis.from_url(self.url)
+            self.pubsub = self.redis.pubsub()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.redis is not None:
+            await self.pubsub.aclose()
+            await self.redis.aclose()
+            self.redis = self.pubsub = None
+
+    async def publish(self, channel: str, message: dict) -> Optional[int]:
+        self.start()
+        return await self.redis.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self.start()
+        if channel not in self.handlers:
+            await self.pubsub.subscribe(channel)
+        await super().subscribe(channel, handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler):
+        await super().unsubscribe(channel, handler)
+        if channel not in self.handlers and self.pubsub is not None:
+            await self.pubsub.unsubscribe(channel)
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self.pubsub.subscribed:
+                    await asyncio.sleep(BROKER_POLL_MS / 1000)
+                    continue
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    await self._dispatch(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Broker listen error: {e}")
+                await asyncio.sleep(1)
+
+
+BROKERS = {"local": Broker, "database": DatabaseBroker, "redis": RedisBroker}
+
+
+def make_broker(kind: str = BROKER) -> Broker:
+    if kind not in BROKERS:
+        raise ValueError(f"Unknown BROKER '{kind}'. Choose from: {', '.join(BROKERS)}")
+    return BROKERS[kind]()
+
+
+broker = make_broker()
@@ -1,8 +1,11 @@
 # app/database.py
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from core.models.base import Base
+import asyncio
+import contextlib
 import os
 from sqlalchemy.orm import relationship, Session
 from core.models.models import BaseMixin, Update, User
@@ -11,14 +14,123 @@ from core.models.models import BaseMixin, Update, User
 #DATABASE_URL = "sqlite:///./dbdata/app.db"
 DATABASE_URL = os.environ["DATABASE_URL"]  # <- comes from docker-compose env
 
+# -------------------------------------------------
+# SQLite storage profiles
+# -------------------------------------------------
+# Pragmas applied to every pooled connection when it is opened.
+# Select with DB_PROFILE (docker-compose sets "production").
+STORAGE_PROFILES = {
+    # SQLite defaults: rollback journal, synchronous=FULL, no mmap
+    "default": {},
+    # WAL lets readers and the single writer run at the same time
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",    # safe with WAL, one fsync per checkpoint
+        "busy_timeout": 5000,       # ms to wait for the write lock
+        "cache_size": -65536,       # negative = KiB -> 64 MB page cache
+        "mmap_size": 268435456,     # 256 MB memory mapped reads
+        "temp_store": "MEMORY",
+    },
+}
+
+DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+
+# Seconds between "PRAGMA optimize" runs (see main.maintenance_scheduler)
+DB_OPTIMIZE_INTERVAL = int(os.environ.get("DB_OPTIMIZE_INTERVAL", "3600"))
+
+
+def apply_storage_profile(dbapi_connection, profile: str = DB_PROFILE):
+    """Run the pragmas of a storage profile on a raw DB-API connection."""
+    pragmas = STORAGE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        # Cheap on open: only analyzes tables that clearly need it
+        cursor.execute("PRAGMA optimize=0x10002")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """
+    Create an engine and hook the storage profile into the pool's
+    connect event so every new connection gets the same pragmas.
+    """
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE '{profile}'. Choose from: {', '.join(STORAGE_PROFILES)}"
+        )
+
+    new_engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    if new_engine.dialect.name == "sqlite":
+        @event.listens_for(new_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            apply_storage_profile(dbapi_connection, profile)
+
+    return new_engine
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL to its async driver (sqlite -> aiosqlite)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:"):
+        return "postgresql+asyncpg:" + url[len("postgresql:"):]
+    return url
+
+
+def create_async_db_engine(url: str, profile: str = DB_PROFILE):
+    """Async twin of create_db_engine, same storage profile on connect."""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE '{profile}'. Choose from: {', '.join(STORAGE_PROFILES)}"
+        )
+
+    new_engine = create_async_engine(url)
+
+    if new_engine.dialect.name == "sqlite":
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            apply_storage_profile(dbapi_connection, profile)
+
+    return new_engine
+
+
+def optimize_database(bind=None):
+    """Run PRAGMA optimize so the query planner statistics stay current."""
+    bind = bind or engine
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+
+
 # Create engine
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_db_engine(DATABASE_URL, DB_PROFILE)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for async def routes (aiosqlite, never blocks the event loop)
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL, DB_PROFILE)
+
+# Objects stay usable after commit; templates render them after the handler returns
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+def is_app_session(session) -> bool:
+    """Sessions on the app database (scripts/benchmarks may use their own files)."""
+    bind = session.bind
+    return bind is not None and bind.url.database == engine.url.database
+
+
 # Dependency to get DB session in FastAPI routes
 def get_db():
     """
@@ -33,6 +145,31 @@ def get_db():
         db.close()
 
 
+# Dependency to get an async DB session in async def routes
+# SQLite has one writer. Async handlers that write several statements in one
+# transaction queue here (FIFO, per process) instead of polling in SQLite's
+# busy handler, where a waiter can starve past busy_timeout.
+_async_write_lock = asyncio.Lock()
+
+
+def async_write_lock():
+    """async with async_write_lock(): ... around a multi-statement write + commit."""
+    if async_engine.dialect.name == "sqlite":
+        return _async_write_lock
+    return contextlib.nullcontext()
+
+
+async def get_async_db():
+    """
+    Yields an AsyncSession and ensures it is closed after use.
+    Usage in routes:
+        db: AsyncSession = Depends(get_async_db)
+    Relationships used by templates must be eager loaded (selectinload).
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_admin_user():
     db: Session = SessionLocal()
 
@@ -180,8 +180,103 @@ from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.types import JSON as SQLAlchemyJSON
 
 from sqlalchemy import or_, and_, inspect, Boolean, Integer, String, Date, DateTime
+from sqlalchemy import select, exists, case, cast, literal, type_coerce
+from sqlalchemy.dialects.postgresql import array as pg_array
+import json
 
-def build_filters(data: dict, model):
+CSV_WHITESPACE = " \t\r\n"
+
+def exact_set_filter(col, vals, dialect: str = "sqlite"):
+    """
+    Order-independent exact match of a JSON/CSV column against vals:
+    the set of stored values must equal set(vals).
+
+    Stored value is either a JSON array (["i1", "i2"]) or a JSON string holding
+    CSV ("a, b"); CSV items are stripped and empty items ignored.
+    """
+    vals = [str(v) for v in vals]
+    wanted = len(set(vals))
+
+    if dialect == "postgresql":
+        doc = cast(col, JSONB)
+        target = cast(json.dumps(vals), JSONB)
+        as_array = and_(doc.op("@>")(target), doc.op("<@")(target))
+        # CSV string -> normalized text[]
+        text_value = doc.op("#>>", return_type=String)(literal([], ARRAY(String)))   # doc #>> '{}'
+        item = func.unnest(func.string_to_array(text_value, ",")).column_valued("item")
+        trimmed = func.btrim(item)
+        csv_items = func.coalesce(
+            select(func.array_agg(trimmed)).where(trimmed != "").scalar_subquery(),
+            literal([], ARRAY(String)),
+        )
+        wanted_items = pg_array(vals, type_=String)
+        as_csv = and_(csv_items.op("@>")(wanted_items), csv_items.op("<@")(wanted_items))
+        return or_(
+            and_(func.jsonb_typeof(doc) == "array", as_array),
+            and_(func.jsonb_typeof(doc) == "string", as_csv),
+        )
+
+    # SQLite: expand the stored value to rows with json_each
+    raw = type_coerce(col, String)
+    kind = func.json_type(raw)
+    # CSV text -> JSON array by splitting inside the quoted string ('"a, b"' -> '["a"," b"]')
+    csv_as_array = "[" + func.replace(func.json_quote(func.json_extract(raw, "$")), ",", '","') + "]"
+    items_json = case(
+        (kind == "array", raw),
+        (kind.in_(("text", "integer", "real")), csv_as_array),
+        else_=None,
+    )
+    each = func.json_each(items_json).table_valued("value", "type")
+    item = case(
+        (kind == "array", cast(each.c.value, String)),
+        else_=func.trim(cast(each.c.value, String), CSV_WHITESPACE),
+    )
+    is_item = or_(kind == "array", item != "")
+
+    outside = exists(
+        select(literal(1)).select_from(each)
+        .where(is_item, or_(each.c.type == "null", item.not_in(vals)))
+    )
+    matched = (
+        select(func.count(item.distinct())).select_from(each)
+        .where(item.in_(vals))
+        .scalar_subquery()
+    )
+    return and_(items_json.is_not(None), ~outside, matched == wanted)
+
+
+def junction_filter(owner_id, junction, vals, filter_type: str, lookup=None):
+    """
+    Filter owners (e.g. Customer.id) through a junction table with
+    customer_id / value_id columns and a (value_id, customer_id) index.
+
+    lookup: optional function mapping vals to a value_id selectable (tag names -> tag ids).
+    """
+    vals = [str(v) for v in vals]
+    wanted = len(set(vals))
+    value_ids = lookup(vals) if lookup else vals
+
+    matching = select(junction.customer_id).where(junction.value_id.in_(value_ids))
+    having_all = matching.group_by(junction.customer_id).having(func.count() == wanted)
+
+    if filter_type == "has":
+        return owner_id.in_(matching)
+    if filter_type == "has-all":
+        return owner_id.in_(having_all)
+    if filter_type == "has-not":
+        return owner_id.not_in(matching)
+    if filter_type == "exact":
+        # All wanted values and nothing else
+        total = (
+            select(func.count()).select_from(junction)
+            .where(junction.customer_id == owner_id)
+            .scalar_subquery()
+        )
+        return and_(owner_id.in_(having_all), total == wanted)
+    return None
+
+
+def build_filters(data: dict, model, dialect: str = "sqlite", junctions: dict | None = None):
 
 
     """
@@ -196,6 +291,10 @@ def build_filters(data: dict, model):
         - Dates (with optional start/end ranges)
         - Filter types: exact, has, has-all, has-not, like
         - Extensive debug logging
+
+    dialect: database dialect name, JSON exact matching differs per database
+    junctions: {field: (JunctionModel, lookup)} for JSON/CSV fields with an indexed
+               junction table; has/has-all/has-not/exact then use subqueries on it
     """
     filters = []
     mapper = inspect(model)
@@ -364,6 +463,13 @@ def build_filters(data: dict, model):
             if not vals:
                 continue
 
+            if junctions and field in junctions and filter_type in ("has", "has-all", "has-not", "exact"):
+                junction, lookup = junctions[field]
+                f = junction_filter(model.id, junction, vals, filter_type, lookup)
+                filters.append(f)
+                print(f"  Adding junction filter: {field} {filter_type} {vals}")
+                continue
+
             conditions = []
 
             for v in vals:
@@ -398,8 +504,8 @@ def build_filters(data: dict, model):
             elif filter_type == "has-not":
                 f = and_(*[~c for c in conditions])
             elif filter_type == "exact":
-                # Python-side order-independent exact match
-                f = {"exact_vals": vals, "column": col.key}
+                # Order-independent exact match, done in SQL
+                f = exact_set_filter(col, vals, dialect)
             else:
                 continue
 
@@ -425,9 +531,14 @@ def formatPhoneNr(number: str, country_code: str = '+46') -> str:
     - Converts '00' prefix to '+'.
     - If missing '+', adds country_code and removes one leading 0 from the local part.
     - Does not remove leading 0s from numbers that already start with '+'.
+    - Returns '' when there are no digits.
     """
     # Keep only digits and '+'
-    number = re.sub(r'[^0-9+]', '', number)
+    number = re.sub(r'[^0-9+]', '', number or '')
+
+    # Nothing to format (None, empty, no digits)
+    if not number.strip('+'):
+        return ''
 
     # Convert 00 -> +
     if number.startswith('00'):
@@ -494,4 +605,40 @@ def utc_to_local(dt, fmt: str = "%Y-%m-%d %H:%M", tz_name: str = constants.DEFAU
 
     # Convert to target timezone
     local_dt = dt.astimezone(ZoneInfo(tz_name))
-    return local_dt.strftime(fmt)
\ No newline at end of file
+    return local_dt.strftime(fmt)
+
+# Days since the last successful call -> green shade of the list bubble
+RECENCY_SHADES = [(0, 600), (1, 500), (2, 400), (7, 300), (14, 200), (21, 100), (28, 50)]
+
+def recency_shade(last_call_date, today=None) -> int:
+    """Tailwind green-<n> shade for a last_call_date (0 = never / long ago)."""
+    if not isinstance(last_call_date, datetime):
+        return 0
+    today = today or datetime.now(timezone.utc).date()
+    delta_days = (today - last_call_date.date()).days
+    if delta_days < 0:
+        return 0
+    for max_days, shade in RECENCY_SHADES:
+        if delta_days <= max_days:
+            return shade
+    return 0
+
+import base64
+import json
+
+def encode_cursor(values: list) -> str:
+    """Encode keyset pagination values as an opaque, URL-safe cursor."""
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list | None:
+    """Decode a cursor from encode_cursor. Returns None if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
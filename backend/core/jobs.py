@@ -0,0 +1,223 @@
+# core/jobs.py
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Set
+
+from sqlalchemy import Column, Float, String, inspect, insert, or_, select, update
+
+from core.database import engine
+from core.models.models import Job
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# Background jobs
+#
+# Long admin operations (CSV import, stats/maintenance scripts) run on a
+# small thread pool instead of inside the request. Each job is a row in the
+# jobs table, so any worker process can report its status; the request that
+# starts a job only inserts that row and returns its id.
+#
+# A job function gets a JobContext as first argument and reports through
+# ctx.progress() / ctx.log(); writes are throttled to one per
+# JOB_PROGRESS_INTERVAL. Its return value (JSON) is stored as the result.
+#
+# Every job row records the runner (process) that owns it; the runner
+# refreshes heartbeat_at of its queued/running jobs every
+# JOB_HEARTBEAT_INTERVAL. A job whose heartbeat is older than
+# JOB_STALE_AFTER lost its process (crash, restart) and is marked
+# interrupted, at startup and by the leader's sweep; jobs of other live
+# workers keep their status.
+# -------------------------------------------------
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_PROGRESS_INTERVAL = 0.5   # seconds between progress writes
+JOB_OUTPUT_LIMIT = 65536      # characters of output kept (the tail)
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", "60"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """Handed to a running job function for progress and output."""
+
+    def __init__(self, runner: "JobRunner", job_id: int):
+        self.runner = runner
+        self.job_id = job_id
+        self.done = 0
+        self.total: Optional[int] = None
+        self.message: Optional[str] = None
+        self.lines: List[str] = []
+        self.output_size = 0
+        self.last_write = 0.0
+
+    def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self._maybe_flush()
+
+    def log(self, line: str):
+        self.lines.append(line)
+        self.output_size += len(line) + 1
+        # Keep only the tail
+        while self.output_size > JOB_OUTPUT_LIMIT and len(self.lines) > 1:
+            self.output_size -= len(self.lines.pop(0)) + 1
+        self._maybe_flush()
+
+    @property
+    def output(self) -> str:
+        return "\n".join(self.lines)
+
+    def _maybe_flush(self):
+        if time.monotonic() - self.last_write >= JOB_PROGRESS_INTERVAL:
+            self.flush()
+
+    def flush(self, **values):
+        self.last_write = time.monotonic()
+        self.runner._update(
+            self.job_id, done=self.done, total=self.total, message=self.message, output=self.output, **values
+        )
+
+
+class JobRunner:
+    """Thread pool plus the jobs table."""
+
+    def __init__(self, bind=engine, workers: int = JOB_WORKERS):
+        self.bind = bind
+        self.workers = workers
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active: Set[int] = set()     # ids of this runner's queued/running jobs
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+            return self._executor
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            with self._lock:
+                job_ids = list(self._active)
+            if not job_ids:
+                continue
+            try:
+                with self.bind.begin() as conn:
+                    conn.execute(update(Job).where(Job.id.in_(job_ids)).values(heartbeat_at=time.time()))
+            except Exception as e:
+                logger.error(f"❌ Job heartbeat failed: {e}")
+
+    def _update(self, job_id: int, **values):
+        with self.bind.begin() as conn:
+            conn.execute(update(Job).where(Job.id == job_id).values(**values))
+
+    def submit(self, kind: str, label: str, fn: Callable[..., Any], *args,
+               user_id: Optional[int] = None, **kwargs) -> int:
+        """Queue fn(ctx, *args, **kwargs); returns the job id right away."""
+        with self.bind.begin() as conn:
+            job_id = conn.execute(
+                insert(Job).values(
+                    kind=kind, label=label, status="queued", user_id=user_id, created_at=_now(),
+                    holder=self.holder, heartbeat_at=time.time(),
+                )
+            ).inserted_primary_key[0]
+        executor = self.executor
+        with self._lock:
+            self._active.add(job_id)
+        executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: int, fn, args, kwargs):
+        ctx = JobContext(self, job_id)
+        start = time.perf_counter()
+        self._update(job_id, status="running", started_at=_now(), heartbeat_at=time.time())
+        try:
+            result = fn(ctx, *args, **kwargs)
+            status = "failed" if isinstance(result, dict) and result.get("failed") else "done"
+            ctx.flush(status=status, result=result, finished_at=_now())
+            logger.info(f"✅ Job {job_id} {status} in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            ctx.log(traceback.format_exc())
+            ctx.message = f"{type(e).__name__}: {e}"
+            ctx.flush(status="failed", finished_at=_now())
+            logger.error(f"❌ Job {job_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def get(self, job_id: int):
+        with self.bind.connect() as conn:
+            return conn.execute(select(Job.__table__).where(Job.id == job_id)).first()
+
+    def recent(self, limit: int = 20):
+        with self.bind.connect() as conn:
+            return conn.execute(select(Job.__table__).order_by(Job.id.desc()).limit(limit)).all()
+
+    def mark_interrupted(self) -> int:
+        """Jobs still queued/running whose process stopped heartbeating (not this runner's)."""
+        stale = time.time() - JOB_STALE_AFTER
+        with self.bind.begin() as conn:
+            result = conn.execute(
+                update(Job)
+                .where(
+                    Job.status.in_(ACTIVE_STATUSES),
+                    or_(Job.holder.is_(None), Job.holder != self.holder),
+                    or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale),
+                )
+                .values(status="interrupted", finished_at=_now())
+            )
+        return result.rowcount
+
+    async def sweep(self):
+        """Leader loop: mark jobs of workers that died since startup."""
+        while True:
+            await asyncio.sleep(JOB_STALE_AFTER)
+            try:
+                interrupted = await asyncio.to_thread(self.mark_interrupted)
+                if interrupted:
+                    logger.info(f"✅ Marked {interrupted} stale jobs as interrupted.")
+            except Exception as e:
+                logger.error(f"❌ Job sweep failed: {e}")
+
+
+def ensure_job_columns(engine) -> bool:
+    """
+    Startup hook: create_all adds no columns to an existing jobs table, so a
+    database not upgraded with Alembic would lack holder/heartbeat_at.
+    Add them if missing. Returns True if one was added.
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns(Job.__tablename__)}
+    added = False
+    with engine.begin() as conn:
+        for column in (Column("holder", String), Column("heartbeat_at", Float)):
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {Job.__tablename__} ADD COLUMN {column.name} {column_type}")
+            added = True
+    return added
+
+
+job_runner = JobRunner()
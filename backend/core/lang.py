@@ -1,52 +1,208 @@
 # lang.py
+import asyncio
+import contextlib
+import fcntl
 import json
 import os
-from typing import Dict
-from functions import *
-from functools import lru_cache
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
 
-TRANSLATIONS: Dict[str, Dict[str, str]] = {}  # Cache
+from jinja2 import pass_context
+
+# -------------------------------------------------
+# Translations: one catalog per language, read from core/lang/lang_<code>.json
+#
+# Catalogs are compiled once (compile_catalogs() at startup, or on first
+# use) and shared by all requests. Templates translate with the "t"
+# filter; it uses the translator of the request's language, put in the
+# template context by lang_context(), so concurrent requests in
+# different languages never see each other's translator.
+#
+# A key missing from the catalog renders as itself and is collected in
+# memory; translation_flusher appends the collected keys to the language
+# file every LANG_FLUSH_INTERVAL seconds, one write per language, off the
+# event loop. The file is re-read before each write, so keys translated
+# by hand meanwhile are kept; the re-read and write hold an flock on a
+# sidecar lock file, so workers flushing at the same time don't drop each
+# other's keys.
+# -------------------------------------------------
+
+SUPPORTED_LANGUAGES = ["sv"]
+LANG_FLUSH_INTERVAL = float(os.environ.get("LANG_FLUSH_INTERVAL", "5"))
+
+FILE_DIR = Path(__file__).parent / "lang"
+
+
+def catalog_path(lang_code: str) -> Path:
+    return FILE_DIR / f"lang_{lang_code}.json"
+
+
+@contextlib.contextmanager
+def catalog_lock(lang_code: str):
+    """Exclusive lock (all processes) on lang_<code>.json.lock while rewriting the catalog."""
+    with open(catalog_path(lang_code).with_suffix(".json.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-FILE_DIR = "core/lang/"
 
 def load_translation(lang_code: str) -> Dict[str, str]:
-    print(f"Loading translation for {lang_code}")  # <-- debug print
-    """Load or initialize the translation dictionary for a given language code."""
-    file_path = FILE_DIR + f"lang_{lang_code}.json"
-    if lang_code not in TRANSLATIONS or True:
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                TRANSLATIONS[lang_code] = json.load(f)
-        else:
-            TRANSLATIONS[lang_code] = {}
-            print(f"Cant find or create language file {lang_code}")  # <-- debug print
-            
-    return TRANSLATIONS[lang_code]
-
-def save_translation(lang_code: str):
-    print(f"Saving translation for {lang_code}")  # <-- debug print
-    """Save the current state of a language file."""
-    file_path = FILE_DIR + f"lang_{lang_code}.json"
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(TRANSLATIONS[lang_code], f, indent=2, ensure_ascii=False)
-
-
-def get_language():
-    lang_code = "sv"
-    return lang_code
-
-def get_translator(lang_code): 
+    """Read a language file; {} if it does not exist."""
+    file_path = catalog_path(lang_code)
+    if not file_path.exists():
+        print(f"⚠️ Can't find language file {file_path}")
+        return {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Catalog:
+    """The messages of one language and the keys found missing since the last flush."""
+
+    def __init__(self, lang_code: str):
+        self.lang_code = lang_code
+        self.messages: Dict[str, str] = load_translation(lang_code)
+        self.missing: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def gettext(self, text: str) -> str:
+        if text in self.messages:
+            return self.messages[text]
+        with self.lock:
+            if text not in self.messages:
+                # falls back to the key from now on, written to the file on the next flush
+                self.messages[text] = text
+                self.missing.add(text)
+        return text
+
+    def flush(self) -> int:
+        """Append the missing keys to the language file; returns how many were written."""
+        with self.lock:
+            missing, self.missing = self.missing, set()
+        if not missing:
+            return 0
+        file_path = catalog_path(self.lang_code)
+        try:
+            with catalog_lock(self.lang_code):
+                messages = load_translation(self.lang_code)
+                added = [text for text in sorted(missing) if text not in messages]
+                for text in added:
+                    messages[text] = text
+                if added:
+                    tmp_path = file_path.with_suffix(".json.tmp")
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(messages, f, indent=2, ensure_ascii=False)
+                    os.replace(tmp_path, file_path)
+            return len(added)
+        except Exception:
+            with self.lock:
+                self.missing |= missing   # retried on the next flush
+            raise
+
+
+CATALOGS: Dict[str, Catalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def compile_catalogs(lang_codes=SUPPORTED_LANGUAGES) -> int:
+    """Load the catalogs of the given languages (startup); returns the number of messages."""
+    return sum(len(get_catalog(lang_code).messages) for lang_code in lang_codes)
+
+
+def get_catalog(lang_code: Optional[str]) -> Catalog:
+    """The compiled catalog of lang_code; unsupported languages get the default one."""
+    if lang_code not in SUPPORTED_LANGUAGES:
+        lang_code = SUPPORTED_LANGUAGES[0]
+    catalog = CATALOGS.get(lang_code)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = CATALOGS.get(lang_code)
+            if catalog is None:
+                catalog = CATALOGS[lang_code] = Catalog(lang_code)
+    return catalog
+
+
+def get_translator(lang_code: Optional[str]) -> Callable[[str], str]:
     """Return a translator function for use in templates or logic."""
-    translations = load_translation(lang_code)
-
-    def translator(text: str) -> str:
-        if text in translations:
-            return translations[text]
-        else:
-            print("fallback")
-            # Add fallback and save
-            translations[text] = text
-            save_translation(lang_code)
-            return text
-    return translator
+    return get_catalog(lang_code).gettext
+
+
+def flush_missing() -> int:
+    """Write the missing keys of every catalog; returns how many were written."""
+    written = 0
+    for catalog in list(CATALOGS.values()):
+        try:
+            written += catalog.flush()
+        except Exception as e:
+            print(f"❌ Saving translation {catalog.lang_code} failed: {e}")
+    return written
+
+
+# -----------------------------
+# Templates
+# -----------------------------
+def request_language(request) -> Optional[str]:
+    """The language LanguageMiddleware picked for the request (session or Accept-Language)."""
+    if request is None:
+        return None
+    if "lang_code" in request.scope:
+        return request.scope["lang_code"]
+    if "session" not in request.scope:
+        return None
+    return request.session.get("lang_code")
+
+
+def lang_context(request) -> dict:
+    """Context processor: the request's language and translator."""
+    lang_code = request_language(request)
+    return {"lang_code": lang_code, "translate": get_translator(lang_code)}
+
+
+@pass_context
+def translate_filter(context, text: str) -> str:
+    """The "t" filter: {{ "Customers" | t }}"""
+    translate = context.get("translate")
+    if translate is None:
+        # rendered without TemplateResponse (e.g. the invoice PDF)
+        translate = get_translator(request_language(context.get("request")))
+    return translate(text)
+
+
+# -----------------------------
+# Missing keys flush
+# -----------------------------
+class TranslationFlusher:
+    """Writes the collected missing keys every interval (every worker, for its own keys)."""
+
+    def __init__(self, interval: float = LANG_FLUSH_INTERVAL):
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flush loop on the running loop (no-op if running)."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the loop and write what is left (shutdown)."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.to_thread(flush_missing)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            written = await asyncio.to_thread(flush_missing)
+            if written:
+                print(f"✅ Saved {written} new translation keys")
+
 
+translation_flusher = TranslationFlusher()
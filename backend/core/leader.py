@@ -0,0 +1,184 @@
+# core/leader.py
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from core.database import ASYNC_DATABASE_URL, async_write_lock, create_async_db_engine
+from core.models.models import Lease
+
+# -------------------------------------------------
+# Leader election: one worker runs the background loops
+#
+# Workers (uvicorn workers, containers on the same database) compete for a
+# lease row in the leases table. The holder renews it every
+# LEADER_RENEW_INTERVAL; a lease not renewed for LEADER_LEASE_TTL seconds
+# may be taken by any other worker (failover). A worker that cannot renew
+# steps down one renew interval before its lease runs out, so two leaders
+# never overlap; a renewal still blocked at that point is abandoned.
+# A clean shutdown releases the lease at once.
+#
+# Background loops register a start (sync, on the loop) and a stop (async)
+# with add(), or a coroutine function with add_loop(); they run only while
+# this worker is the leader.
+# With several workers, pushes from the leader reach sockets held by other
+# workers only through a cross-process broker (BROKER, core.broker).
+# -------------------------------------------------
+
+LEADER_LEASE_TTL = float(os.environ.get("LEADER_LEASE_TTL", "15"))
+LEADER_RENEW_INTERVAL = float(os.environ.get("LEADER_RENEW_INTERVAL", "5"))
+LEASE_NAME = "background"
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        name: str = LEASE_NAME,
+        ttl: float = LEADER_LEASE_TTL,
+        renew_interval: float = LEADER_RENEW_INTERVAL,
+        url: str = ASYNC_DATABASE_URL,
+    ):
+        if renew_interval * 2 > ttl:
+            raise ValueError("LEADER_RENEW_INTERVAL must be at most half of LEADER_LEASE_TTL")
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.url = url
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.renewed_at = 0.0          # wall clock of the last successful (re)acquire
+        self.loops: List[Tuple[Callable[[], Any], Callable[[], Awaitable[Any]]]] = []
+        self.engine = None
+        self.task: Optional[asyncio.Task] = None
+
+    # -----------------------------
+    # Background loops
+    # -----------------------------
+    def add(self, start: Callable[[], Any], stop: Callable[[], Awaitable[Any]]):
+        """Run start() on election, await stop() when leadership ends."""
+        self.loops.append((start, stop))
+
+    def add_loop(self, loop_fn: Callable[[], Awaitable[None]]):
+        """Run loop_fn() as a task while leader."""
+        tasks: List[asyncio.Task] = []
+
+        def start():
+            tasks.append(asyncio.create_task(loop_fn()))
+
+        async def stop():
+            while tasks:
+                task = tasks.pop()
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        self.add(start, stop)
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self):
+        """Start competing for the lease on the running loop (no-op if running)."""
+        if self.engine is None:
+            # own pool: renewals must never wait behind request connections
+            self.engine = create_async_db_engine(self.url)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the loops and release the lease (shutdown)."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.is_leader:
+            await self._step_down()
+            try:
+                await self._release()
+            except Exception as e:
+                print(f"Lease release failed: {e}")
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def _run(self):
+        while True:
+            try:
+                # a renewal stuck behind the write lock / busy_timeout must not outlive
+                # the lease: give up where a failed renewal would step down anyway
+                timeout = self.renewed_at + self.ttl - self.renew_interval - time.time() if self.is_leader else self.ttl
+                held = await asyncio.wait_for(self._acquire(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                print("⚠️ Lease renewal timed out")
+                held = False
+            except Exception as e:
+                print(f"Lease renewal failed: {e}")
+                held = self.is_leader and time.time() < self.renewed_at + self.ttl - self.renew_interval
+
+            if held and not self.is_leader:
+                self.is_leader = True
+                print(f"✅ Leader: {self.holder}")
+                for start, _ in self.loops:
+                    start()
+            elif not held and self.is_leader:
+                print(f"⚠️ Leadership lost: {self.holder}")
+                await self._step_down()
+
+            await asyncio.sleep(self.renew_interval)
+
+    async def _step_down(self):
+        self.is_leader = False
+        for _, stop in reversed(self.loops):
+            try:
+                await stop()
+            except Exception as e:
+                print(f"Background loop stop failed: {e}")
+
+    # -----------------------------
+    # Lease row
+    # -----------------------------
+    async def _acquire(self) -> bool:
+        """Take or renew the lease; True if this worker holds it."""
+        async with async_write_lock():
+            now = time.time()   # after the wait for the lock: the lease runs from here
+            async with self.engine.begin() as conn:
+                result = await conn.execute(
+                    update(Lease)
+                    .where(Lease.name == self.name, or_(Lease.holder == self.holder, Lease.expires_at < now))
+                    .values(holder=self.holder, expires_at=now + self.ttl)
+                )
+                held = result.rowcount == 1
+            if not held:
+                try:
+                    async with self.engine.begin() as conn:
+                        await conn.execute(
+                            insert(Lease).values(name=self.name, holder=self.holder, expires_at=now + self.ttl)
+                        )
+                    held = True
+                except IntegrityError:
+                    held = False   # held by another worker
+        if held:
+            self.renewed_at = now
+        return held
+
+    async def _release(self):
+        async with async_write_lock():
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    update(Lease)
+                    .where(Lease.name == self.name, Lease.holder == self.holder)
+                    .values(expires_at=0)
+                )
+
+
+leader = LeaderElection()
@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker# Base class for models
-from sqlalchemy import Column, Integer, DateTime, String, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, DateTime, Float, String, ForeignKey, JSON, Boolean, Text
 from sqlalchemy import JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import sqltypes as satypes
@@ -116,6 +116,54 @@ class User(BaseMixin, Base):
     def set_password(self, password: str):
         self.password_hash = pwd_context.hash(password)
 
+class WebSession(Base):
+    """Server-side session data (core.sessions); the cookie only holds the signed id."""
+    __tablename__ = "web_sessions"
+    id = Column(String, primary_key=True)
+    data = Column(Text, nullable=False, default="{}")
+    expires_at = Column(Integer, nullable=False, index=True)  # unix seconds
+
+class CacheVersion(Base):
+    """Version stamp per reference data set (core.refcache), bumped in the writing transaction."""
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class Job(Base):
+    """Background job (core.jobs): status, progress and captured output."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)           # "import", "script", ...
+    label = Column(String, nullable=False, default="")
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, done, failed, interrupted
+    done = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)          # None = unknown
+    message = Column(String, nullable=True)
+    output = Column(Text, nullable=False, default="")
+    result = Column(JSON, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    holder = Column(String, nullable=True)          # JobRunner.holder of the process running it
+    heartbeat_at = Column(Float, nullable=True)     # time.time(), refreshed while queued/running
+
+class BrokerMessage(Base):
+    """Pub/sub message for the database broker (core.broker), pruned after BROKER_RETENTION."""
+    __tablename__ = "broker_messages"
+    __table_args__ = {"sqlite_autoincrement": True}   # ids never reused: subscribers read id > last seen
+    id = Column(Integer, primary_key=True)
+    channel = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(Float, nullable=False)       # time.time(), for pruning
+
+class Lease(Base):
+    """Leader lease (core.leader): held by one worker until expires_at (time.time())."""
+    __tablename__ = "leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(Float, nullable=False)
+
 class UserUpdate(BaseModel):
     caller_id: Optional[int] = None
     extra: Optional[Dict[str, Any]] = None
@@ -0,0 +1,149 @@
+# core/refcache.py
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Set, Tuple
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from core.database import is_app_session
+from core.models.models import CacheVersion
+
+# -------------------------------------------------
+# Reference data cache
+#
+# Small, rarely changing sets (callers, products) are loaded once per
+# process and served from memory. Each set has a version row in
+# cache_versions that is bumped inside the transaction that writes one of
+# its models, so:
+#   - this process drops the set right after the commit (after_commit), and
+#   - other worker processes notice the new version on their next check,
+#     at most REFCACHE_CHECK_INTERVAL seconds later (one tiny SELECT).
+# Writers that bypass the ORM (raw SQL, sqlite3 shell) are covered by
+# REFCACHE_MAX_AGE only.
+# Cached values must be plain data (Row tuples, dicts), never ORM objects,
+# since they are shared between sessions and threads.
+# -------------------------------------------------
+
+REFCACHE_CHECK_INTERVAL = float(os.environ.get("REFCACHE_CHECK_INTERVAL", "1"))
+REFCACHE_MAX_AGE = float(os.environ.get("REFCACHE_MAX_AGE", "300"))
+
+
+class ReferenceCache:
+    def __init__(self, check_interval: float = REFCACHE_CHECK_INTERVAL, max_age: float = REFCACHE_MAX_AGE):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.loaders: Dict[str, Callable[[Session], Any]] = {}
+        self.names_by_model: Dict[type, Set[str]] = {}
+        self.entries: Dict[str, Tuple[int, float, Any]] = {}   # name -> (version, loaded_at, value)
+        self.versions: Dict[str, int] = {}              # last seen in cache_versions
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[Session], Any], *models):
+        """loader(db) builds the set; a write to any of models invalidates it."""
+        self.loaders[name] = loader
+        self.watch(name, *models)
+
+    def watch(self, name: str, *models):
+        """A version row only, for caches kept elsewhere: a write to any of models bumps it."""
+        for model in models:
+            self.names_by_model.setdefault(model, set()).add(name)
+
+    def version(self, db: Session, name: str) -> int:
+        """Last seen version of name, re-read at most every check_interval."""
+        self._check_versions(db)
+        return self.versions.get(name, 0)
+
+    def get(self, db: Session, name: str):
+        self._check_versions(db)
+        version = self.versions.get(name, 0)
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self.max_age:
+            return entry[2]
+
+        value = self.loaders[name](db)
+        with self.lock:
+            self.entries[name] = (version, time.monotonic(), value)
+        return value
+
+    def _check_versions(self, db: Session):
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return
+        versions = dict(db.execute(select(CacheVersion.name, CacheVersion.version)).all())
+        with self.lock:
+            self.versions = versions
+            self.checked_at = time.monotonic()
+
+    def invalidate(self, names: Iterable[str]):
+        """Drop sets locally and re-read the versions on the next get()."""
+        with self.lock:
+            for name in names:
+                self.entries.pop(name, None)
+            self.checked_at = 0.0
+
+    def names_for(self, model) -> Set[str]:
+        return self.names_by_model.get(model, set())
+
+
+reference_cache = ReferenceCache()
+
+
+def bump_versions(connection, names: Iterable[str]):
+    """Increment the version rows (created on first use) on the writing transaction's connection."""
+    for name in sorted(names):
+        result = connection.execute(
+            update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(CacheVersion).values(name=name, version=1))
+
+
+# -------------------------------------------------
+# Session hooks: bump at flush (same transaction), drop locally at commit
+# -------------------------------------------------
+PENDING_KEY = "refcache_names"
+
+
+def _mark(session, names: Set[str]):
+    pending = session.info.setdefault(PENDING_KEY, set())
+    new = names - pending
+    if new:
+        pending.update(new)
+        bump_versions(session.connection(), new)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_reference_writes(session, flush_context):
+    if not reference_cache.names_by_model or not is_app_session(session):
+        return
+    # a Caller is "dirty" whenever a customer is (re)assigned to it (backref
+    # collection); only its own columns matter here
+    changed = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    names = set()
+    for obj in list(session.new) + changed + list(session.deleted):
+        names |= reference_cache.names_for(type(obj))
+    if names:
+        _mark(session, names)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _watch_bulk_reference_writes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        names = reference_cache.names_for(state.bind_mapper.class_)
+        if names and is_app_session(state.session):
+            _mark(state.session, names)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_reference_sets(session):
+    names = session.info.pop(PENDING_KEY, None)
+    if names:
+        reference_cache.invalidate(names)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_reference_writes(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
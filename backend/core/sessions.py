@@ -0,0 +1,276 @@
+# core/sessions.py
+import json
+import os
+import secrets
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from itsdangerous import BadSignature, TimestampSigner
+from sqlalchemy import delete, insert, select, update
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.broker import broker
+from core.database import async_engine, async_write_lock
+from core.models.models import WebSession
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# Server-side sessions
+#
+# Drop-in for starlette's SessionMiddleware: request.session is the same dict,
+# but the cookie only carries a signed random session id. The data lives in
+# the web_sessions table with a small in-process LRU in front, so a request
+# normally costs one dict lookup and is only written back when it changed.
+#
+# Several workers: a save or delete publishes the session id on
+# SESSION_CHANNEL (core.broker) and the other workers drop their cached
+# copy, so a logout takes effect everywhere. LRU entries also expire after
+# SESSION_CACHE_TTL seconds, in case a message is missed. A save only
+# overwrites the row if it still holds the data this request started from
+# (compare-and-set). Otherwise this request's changes are merged into the
+# stored data, so concurrent requests on different workers don't undo each
+# other's filters or selections.
+#
+# rotate_session(request) gives the session a new id when the response is
+# sent (login), so an id handed out before authentication is never reused.
+# Writes take core.database.async_write_lock, like the app's other async writers.
+# -------------------------------------------------
+
+SESSION_MAX_AGE = int(os.environ.get("SESSION_MAX_AGE", str(14 * 24 * 3600)))
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.environ.get("SESSION_CACHE_TTL", "5"))
+SESSION_PURGE_INTERVAL = 3600
+SESSION_CHANNEL = "sessions"
+SAVE_ATTEMPTS = 5
+
+
+# -------------------------------------------------
+# Compact id selections
+# -------------------------------------------------
+def encode_id_ranges(ids: Iterable[int]) -> List[List[int]]:
+    """[1, 2, 3, 7, 9, 10] -> [[1, 3], [7, 7], [9, 10]] (sorted, deduplicated)."""
+    ranges: List[List[int]] = []
+    for i in sorted(set(int(i) for i in ids)):
+        if ranges and ranges[-1][1] == i - 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+def decode_id_ranges(ranges) -> List[int]:
+    return [i for start, end in ranges or [] for i in range(start, end + 1)]
+
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+class SessionStore:
+    """web_sessions table behind an LRU of serialized session data."""
+
+    def __init__(self, engine=async_engine, max_age: int = SESSION_MAX_AGE,
+                 cache_size: int = SESSION_CACHE_SIZE, cache_ttl: float = SESSION_CACHE_TTL):
+        self.engine = engine
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # session id -> (data json, expires_at, cached_at)
+        self.cache: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self.last_purge = 0.0
+        self.worker = secrets.token_hex(8)   # skips this worker's own messages
+        self.listening = False
+
+    async def listen(self):
+        """Drop sessions other workers wrote (no-op with the in-process broker or when listening)."""
+        if self.listening or broker.name == "local":
+            return
+        self.listening = True
+        await broker.subscribe(SESSION_CHANNEL, self._on_message)
+
+    async def _on_message(self, message: dict):
+        if message.get("worker") != self.worker:
+            self.cache.pop(message.get("id"), None)
+
+    async def _publish(self, session_id: str):
+        if broker.name != "local":
+            try:
+                await broker.publish(SESSION_CHANNEL, {"id": session_id, "worker": self.worker})
+            except Exception as e:
+                logger.error(f"❌ Session invalidation publish failed: {e}")
+
+    def _remember(self, session_id: str, data: str, expires_at: int):
+        self.cache[session_id] = (data, expires_at, time.monotonic())
+        self.cache.move_to_end(session_id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def load(self, session_id: str) -> Optional[Tuple[str, int]]:
+        """(data json, expires_at) or None if unknown/expired."""
+        cached = self.cache.get(session_id)
+        if cached and time.monotonic() - cached[2] < self.cache_ttl:
+            self.cache.move_to_end(session_id)
+            data, expires_at, _ = cached
+        else:
+            async with self.engine.connect() as conn:
+                row = (await conn.execute(
+                    select(WebSession.data, WebSession.expires_at).where(WebSession.id == session_id)
+                )).first()
+            if row is None:
+                self.cache.pop(session_id, None)
+                return None
+            data, expires_at = row
+            self._remember(session_id, data, expires_at)
+
+        if expires_at < time.time():
+            return None
+        return data, expires_at
+
+    async def save(self, session_id: str, data: str, original: Optional[str] = None) -> int:
+        """
+        Insert (original None: a new session), or update if the row still holds
+        original. When another request changed it meanwhile, this request's
+        changes (original -> data) are merged into the stored data; a session
+        deleted meanwhile (logout on another worker) stays deleted.
+        Returns the new expires_at.
+        """
+        expires_at = int(time.time()) + self.max_age
+        for _ in range(SAVE_ATTEMPTS):
+            async with async_write_lock(), self.engine.begin() as conn:
+                if original is None:
+                    await conn.execute(insert(WebSession).values(id=session_id, data=data, expires_at=expires_at))
+                    break
+                result = await conn.execute(
+                    update(WebSession)
+                    .where(WebSession.id == session_id, WebSession.data == original)
+                    .values(data=data, expires_at=expires_at)
+                )
+                if result.rowcount == 1:
+                    break
+                current = (await conn.execute(
+                    select(WebSession.data).where(WebSession.id == session_id)
+                )).scalar()
+            if current is None:
+                self.cache.pop(session_id, None)
+                return expires_at
+            data, original = merge_session(current, data, original), current
+        else:
+            raise RuntimeError("Session kept changing during save")
+        self._remember(session_id, data, expires_at)
+        await self._publish(session_id)
+
+        if time.monotonic() - self.last_purge > SESSION_PURGE_INTERVAL:
+            await self.purge_expired()
+        return expires_at
+
+    async def delete(self, session_id: str):
+        self.cache.pop(session_id, None)
+        async with async_write_lock(), self.engine.begin() as conn:
+            await conn.execute(delete(WebSession).where(WebSession.id == session_id))
+        await self._publish(session_id)
+
+    async def purge_expired(self) -> int:
+        self.last_purge = time.monotonic()
+        async with async_write_lock(), self.engine.begin() as conn:
+            result = await conn.execute(delete(WebSession).where(WebSession.expires_at < int(time.time())))
+        if result.rowcount:
+            logger.info(f"✅ Purged {result.rowcount} expired sessions.")
+        return result.rowcount
+
+
+def merge_session(current: str, data: str, original: str) -> str:
+    """Apply the keys a request changed (original -> data) to the stored current data."""
+    before, after, merged = json.loads(original), json.loads(data), json.loads(current)
+    for key in before.keys() - after.keys():
+        merged.pop(key, None)
+    for key, value in after.items():
+        if key not in before or before[key] != value:
+            merged[key] = value
+    return json.dumps(merged, separators=(",", ":"), default=str)
+
+
+def rotate_session(request: HTTPConnection):
+    """Give the session a new id when the response is sent (call at login)."""
+    request.scope["session_rotate"] = True
+
+
+# -------------------------------------------------
+# Middleware
+# -------------------------------------------------
+class ServerSessionMiddleware:
+    """
+    Same interface as starlette.middleware.sessions.SessionMiddleware
+    (secret_key, session_cookie, max_age, same_site, https_only).
+    """
+
+    def __init__(self, app: ASGIApp, secret_key: str, session_cookie: str = "session",
+                 max_age: int = SESSION_MAX_AGE, path: str = "/", same_site: str = "lax",
+                 https_only: bool = False, store: Optional[SessionStore] = None):
+        self.app = app
+        self.signer = TimestampSigner(str(secret_key))
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.store = store or SessionStore(max_age=max_age)
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    def _cookie(self, value: str, max_age: int) -> str:
+        return f"{self.session_cookie}={value}; path={self.path}; Max-Age={max_age}; {self.security_flags}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        await self.store.listen()
+        connection = HTTPConnection(scope)
+        session_id: Optional[str] = None
+        stored, expires_at = "{}", 0
+
+        cookie = connection.cookies.get(self.session_cookie)
+        if cookie:
+            try:
+                session_id = self.signer.unsign(cookie.encode(), max_age=self.max_age).decode()
+            except BadSignature:
+                session_id = None
+        if session_id:
+            loaded = await self.store.load(session_id)
+            if loaded is None:
+                session_id = None
+            else:
+                stored, expires_at = loaded
+
+        scope["session"] = json.loads(stored)
+
+        async def send_wrapper(message: Message):
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                session: Dict = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session and scope.get("session_rotate") and session_id is not None:
+                    # login: the data moves to a new id, the old one is dropped
+                    await self.store.delete(session_id)
+                    session_id = None
+                if session:
+                    data = json.dumps(session, separators=(",", ":"), default=str)
+                    new = session_id is None
+                    # Write when changed, or to slide the expiry once half of it is used
+                    if new or data != stored or expires_at - time.time() < self.max_age / 2:
+                        if new:
+                            session_id = secrets.token_urlsafe(32)
+                        await self.store.save(session_id, data, None if new else stored)
+                        signed = self.signer.sign(session_id.encode()).decode()
+                        headers.append("Set-Cookie", self._cookie(signed, self.max_age))
+                elif session_id is not None:
+                    # session.clear(): drop the row and the cookie
+                    await self.store.delete(session_id)
+                    headers.append("Set-Cookie", self._cookie("null", 0) + "; expires=Thu, 01 Jan 1970 00:00:00 GMT")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,219 @@
+# core/write_queue.py
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.database import ASYNC_DATABASE_URL, async_write_lock, create_async_db_engine
+
+# -------------------------------------------------
+# Group commit write queue (opt-in: WRITE_QUEUE=1)
+#
+# A write unit is an async fn(db) -> result that runs its statements on db
+# and does not commit. With the queue on, request handlers hand their unit
+# to one writer task, which runs the queued units in one transaction and
+# commits them together: one fsync and one trip through the SQLite write
+# lock per batch. A batch closes after WRITE_QUEUE_BATCH_MS or
+# WRITE_QUEUE_BATCH_SIZE units. Each handler awaits its own future.
+# If a unit raises, the batch is rolled back and its units are re-run one
+# transaction each, so only the failing unit gets the error.
+#
+# With the queue off, run_write() runs the unit on the request's own
+# session and commits (behind core.database.async_write_lock).
+# Units must only use the db they are given: ORM objects loaded by the
+# request's session are brought in with `await db.merge(obj)`.
+# The writer has its own engine: waiting handlers hold their request's
+# pooled connection, and the writer must never queue behind them.
+# -------------------------------------------------
+
+WRITE_QUEUE = os.environ.get("WRITE_QUEUE", "0") == "1"
+WRITE_QUEUE_BATCH_MS = float(os.environ.get("WRITE_QUEUE_BATCH_MS", "5"))
+WRITE_QUEUE_BATCH_SIZE = int(os.environ.get("WRITE_QUEUE_BATCH_SIZE", "100"))
+
+# Batches kept for the metrics percentiles
+METRICS_WINDOW = 1000
+
+WriteUnit = Callable[[AsyncSession], Awaitable[Any]]
+
+# Queued by stop(): the writer commits what came before it and exits
+STOP = None
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        enabled: bool = WRITE_QUEUE,
+        batch_ms: float = WRITE_QUEUE_BATCH_MS,
+        batch_size: int = WRITE_QUEUE_BATCH_SIZE,
+        session_factory=None,
+    ):
+        self.enabled = enabled
+        self.batch_ms = batch_ms
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self.engine = None          # the writer's own engine, when it made one
+        self.queue: asyncio.Queue | None = None
+        self.task: asyncio.Task | None = None
+
+        # metrics
+        self.waiting = 0            # direct mode: handlers waiting for the write lock
+        self.units = 0
+        self.batches = 0
+        self.failed_units = 0
+        self.split_batches = 0      # batches re-run unit by unit after an error
+        self.batch_sizes: deque = deque(maxlen=METRICS_WINDOW)
+        self.commit_ms: deque = deque(maxlen=METRICS_WINDOW)
+
+    # -----------------------------
+    # Writer task
+    # -----------------------------
+    def start(self):
+        """Start the writer task on the running loop (no-op if running)."""
+        if self.task is None or self.task.done():
+            if self.session_factory is None:
+                self.engine = create_async_db_engine(ASYNC_DATABASE_URL)
+                self.session_factory = async_sessionmaker(
+                    self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+                )
+            self.queue = asyncio.Queue()
+            self.task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Commit what is queued (and the batch in progress), then stop the writer."""
+        if self.task is None:
+            return
+        self.queue.put_nowait(STOP)
+        await self.task
+        self.task = None
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = self.session_factory = None
+
+    async def submit(self, unit: WriteUnit):
+        """Queue a unit and wait for its result (or its exception)."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((unit, future))
+        return await future
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.batch_ms / 1000
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    item = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+
+    async def _commit(self, batch: List[Tuple[WriteUnit, asyncio.Future]]):
+        start = time.perf_counter()
+        try:
+            async with async_write_lock():
+                async with self.session_factory() as db:
+                    results = [await unit(db) for unit, _ in batch]
+                    await db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                self.split_batches += 1
+                for item in batch:
+                    await self._commit([item])
+                return
+            self.failed_units += 1
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self._record(len(batch), time.perf_counter() - start)
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # the request may have been cancelled meanwhile
+                future.set_result(result)
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def _record(self, units: int, seconds: float):
+        self.units += units
+        self.batches += 1
+        self.batch_sizes.append(units)
+        self.commit_ms.append(seconds * 1000)
+
+    def metrics(self) -> dict:
+        """Queue depth, batch sizes and commit latency (last METRICS_WINDOW batches)."""
+        sizes = sorted(self.batch_sizes)
+        latencies = sorted(self.commit_ms)
+
+        def percentile(values, p):
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2) if values else None
+
+        return {
+            "mode": "queue" if self.enabled else "direct",
+            "queue_depth": self.queue.qsize() if self.enabled and self.queue is not None else self.waiting,
+            "units": self.units,
+            "batches": self.batches,
+            "failed_units": self.failed_units,
+            "split_batches": self.split_batches,
+            "batch_size": {
+                "avg": round(statistics.fmean(sizes), 2) if sizes else None,
+                "p50": percentile(sizes, 0.5),
+                "max": sizes[-1] if sizes else None,
+            },
+            "commit_ms": {
+                "p50": percentile(latencies, 0.5),
+                "p99": percentile(latencies, 0.99),
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+        }
+
+
+write_queue = WriteQueue()
+
+
+async def run_write(db: AsyncSession, unit: WriteUnit):
+    """
+    Run a write unit and commit it: through the writer task when the
+    queue is on, otherwise on db (the request's session).
+    """
+    if write_queue.enabled:
+        return await write_queue.submit(unit)
+
+    write_queue.waiting += 1
+    acquired = False
+    try:
+        async with async_write_lock():
+            acquired = True
+            write_queue.waiting -= 1
+            start = time.perf_counter()
+            try:
+                result = await unit(db)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                write_queue.failed_units += 1
+                raise
+    finally:
+        if not acquired:  # cancelled while waiting for the lock
+            write_queue.waiting -= 1
+    write_queue._record(1, time.perf_counter() - start)
+    return result
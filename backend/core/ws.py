@@ -0,0 +1,179 @@
+# core/ws.py
+import asyncio
+import functools
+import os
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+
+from core.broker import Handler, broker
+from state import user_data
+
+# -------------------------------------------------
+# WebSocket pushes to a user's browser tabs and phone app
+#
+# push() publishes on the user's broker channel ("user:<id>"). Each worker
+# holding sockets of that user is subscribed to the channel and hands the
+# message to its own sockets, so pushes work with several workers.
+#
+# Each socket has a bounded send queue drained by its own writer task.
+# Handing a message over only enqueues it, so one slow tab never delays
+# the user's other tabs or the caller of push(). A socket whose queue is
+# full (WS_QUEUE_SIZE) or whose send takes longer than WS_SEND_TIMEOUT
+# is closed (code 1013, try again later); the browser reconnects and gets
+# the current state as its initial message. Sockets that fail to send are
+# pruned.
+# state.user_data is keyed by the user id as str (the JWT "sub").
+# -------------------------------------------------
+
+WS_QUEUE_SIZE = int(os.environ.get("WS_QUEUE_SIZE", "32"))
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "5"))
+WS_CLOSE_SLOW = 1013
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+async def push(user_id, message: dict) -> Optional[int]:
+    """Send message to every socket of the user, in any worker (see core.broker.publish)."""
+    return await broker.publish(user_channel(user_id), message)
+
+
+class Connection:
+    """One accepted socket: its send queue and writer task."""
+
+    def __init__(self, manager: "ConnectionManager", user_id: str, websocket: WebSocket):
+        self.manager = manager
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.task = asyncio.create_task(self._writer())
+        self.closed = False
+
+    def offer(self, message: dict) -> bool:
+        """Queue a message without waiting; a full queue closes the socket."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.manager.dropped += 1
+            self.manager.closed_slow += 1
+            self.close(WS_CLOSE_SLOW)
+            return False
+
+    def close(self, code: Optional[int] = None):
+        """Stop the writer and unregister; code: also close the socket with it."""
+        if self.closed:
+            return
+        self.closed = True
+        self.manager._remove(self)
+        self.manager.dropped += self.queue.qsize()
+        if asyncio.current_task() is not self.task:
+            self.task.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # already gone
+
+    async def _writer(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_json(message), self.manager.send_timeout)
+            except asyncio.TimeoutError:
+                self.manager.closed_slow += 1
+                self.close(WS_CLOSE_SLOW)
+                return
+            except Exception:
+                # WebSocket is closed
+                self.manager.closed_dead += 1
+                self.close()
+                return
+            self.manager.sent += 1
+
+
+class ConnectionManager:
+    """This worker's sockets per user, subscribed to the users' broker channels."""
+
+    def __init__(self, queue_size: int = WS_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.connections: Dict[str, List[Connection]] = {}
+        self.handlers: Dict[str, Handler] = {}
+
+        # metrics
+        self.sent = 0
+        self.dropped = 0          # messages never sent: queue full or socket closed first
+        self.closed_slow = 0      # sockets closed for a full queue or a send timeout
+        self.closed_dead = 0      # sockets pruned after a failed send
+
+    async def connect(self, user_id: str, websocket: WebSocket) -> Connection:
+        """Register an accepted socket; the first one of the user subscribes this worker."""
+        connection = Connection(self, user_id, websocket)
+        if user_id in self.connections:
+            self.connections[user_id].append(connection)
+            return connection
+
+        self.connections[user_id] = [connection]
+        user_data.setdefault(user_id, {"user_id": user_id})
+        self.handlers[user_id] = functools.partial(self.deliver, user_id)
+        await broker.subscribe(user_channel(user_id), self.handlers[user_id])
+        return connection
+
+    async def disconnect(self, connection: Connection):
+        """Forget a socket; the last one of the user unsubscribes this worker."""
+        connection.close()
+        await self._unsubscribe_if_idle(connection.user_id)
+
+    async def deliver(self, user_id: str, message: dict):
+        """Broker handler: hand the message to this worker's sockets of the user."""
+        if message.get("type") == "customer_info":
+            # kept as the initial value for sockets that open later
+            user_data.setdefault(user_id, {"user_id": user_id}).update(message)
+            message = dict(user_data[user_id])
+
+        for connection in list(self.connections.get(user_id, [])):
+            connection.offer(message)
+        await self._unsubscribe_if_idle(user_id)
+
+    async def stop(self):
+        """Stop every writer (shutdown)."""
+        for connections in list(self.connections.values()):
+            for connection in list(connections):
+                connection.close()
+
+    def _remove(self, connection: Connection):
+        connections = self.connections.get(connection.user_id, [])
+        if connection in connections:
+            connections.remove(connection)
+
+    async def _unsubscribe_if_idle(self, user_id: str):
+        if user_id in self.connections and not self.connections[user_id]:
+            del self.connections[user_id]
+            user_data.pop(user_id, None)
+            await broker.unsubscribe(user_channel(user_id), self.handlers.pop(user_id))
+
+    def metrics(self) -> dict:
+        """Open sockets and send queue gauges of this worker."""
+        depths = [c.queue.qsize() for connections in list(self.connections.values()) for c in list(connections)]
+        return {
+            "users": len(self.connections),
+            "connections": len(depths),
+            "queue_depth": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_size": self.queue_size,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "closed_slow": self.closed_slow,
+            "closed_dead": self.closed_dead,
+        }
+
+
+connections = ConnectionManager()
@@ -8,6 +8,8 @@ DATA_DIR = Path("./data")
 # 
 DEFAULT_TZ = "Europe/Stockholm"
 SHOW_PRODUCTS_X_DAYS = 5;
+CUSTOMERS_PAGE_SIZE = 100  # rows per infinite scroll page in customers/list.html
+CALLS_PAGE_SIZE = 10  # calls per page in the call panel (calls/customer_calls.html)
 
 def load_json(filename):
     path = DATA_DIR / filename
@@ -0,0 +1,322 @@
+import asyncio
+import heapq
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from core.broker import broker
+from core.database import AsyncSessionLocal, is_app_session
+from core.models.models import User
+from core.ws import push
+from models.models import Alarm
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# Alarm reminders: timer heap instead of polling
+#
+# An alarm gets up to two reminders, pushed to the WebSocket of every
+# user of its caller:
+#   first   at alarm.reminder (reminder_sent is NULL)
+#   second  SECOND_REMINDER before alarm.date, if the first went out earlier
+# and none once alarm.date has passed. next_reminder() is the time the next
+# one is due; the scheduler keeps that per alarm in a heap, loaded with one
+# query on ix_alarms_date at start, and sleeps until the earliest.
+#
+# Committed Alarm writes wake it (session hooks below) and only the alarms
+# they touched are re-read: by id for ORM writes, by customer for bulk
+# statements with the "customer_ids" execution option; other bulk writes
+# reload everything. With a cross-process broker the wake-up is published
+# on ALARM_CHANNEL, so alarms saved by another worker are picked up too.
+# A full reload every ALARM_RELOAD_INTERVAL covers writes from scripts.
+#
+# Due reminders go out together: users loaded once for all their callers,
+# reminder_sent written in one UPDATE. A reminder nobody received (no open
+# socket) is retried after ALARM_RETRY, as the old minute scan did.
+# -------------------------------------------------
+
+SECOND_REMINDER = timedelta(minutes=30)
+ALARM_RETRY = timedelta(seconds=60)
+ALARM_RELOAD_INTERVAL = float(os.environ.get("ALARM_RELOAD_INTERVAL", "300"))
+ALARM_CHANNEL = "alarms"
+RELOAD_CHUNK = 500
+
+
+def _utcnow() -> datetime:
+    # DateTime columns come back naive UTC from SQLite
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def next_reminder(date: datetime, reminder: datetime, reminder_sent: Optional[datetime]) -> Optional[datetime]:
+    """When the alarm's next reminder is due, None if it has none left."""
+    date, reminder, reminder_sent = _naive(date), _naive(reminder), _naive(reminder_sent)
+    if reminder_sent is None:
+        due = reminder
+    elif reminder_sent < date - SECOND_REMINDER:
+        due = date - SECOND_REMINDER
+    else:
+        return None
+    return due if due <= date else None
+
+
+class AlarmScheduler:
+    def __init__(self):
+        self.heap: List = []                 # (when, alarm_id, version)
+        self.versions: Dict[int, int] = {}   # alarm_id -> version of its live heap entry
+        self.version = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.task: Optional[asyncio.Task] = None
+        self.event: Optional[asyncio.Event] = None
+
+        # changes from commit hooks (any thread)
+        self.lock = threading.Lock()
+        self.alarm_ids: Set[int] = set()
+        self.customer_ids: Set[int] = set()
+        self.reload = False
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def attach(self):
+        """Publish this worker's alarm writes from the running loop (every worker, leader or not)."""
+        self.loop = asyncio.get_running_loop()
+
+    def start(self):
+        """Start the scheduler task on the running loop (no-op if running)."""
+        self.attach()
+        if self.task is None or self.task.done():
+            self.event = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await broker.unsubscribe(ALARM_CHANNEL, self._on_message)
+
+    # -----------------------------
+    # Wake-ups
+    # -----------------------------
+    def notify(self, alarm_ids: Iterable[int] = (), customer_ids: Iterable[int] = (), reload: bool = False):
+        """Alarms changed (any thread): wake this scheduler and, via the broker, the other workers'."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        message = {"alarm_ids": list(alarm_ids), "customer_ids": list(customer_ids), "reload": reload}
+        if self.task is not None and not self.task.done():
+            self._add_changes(message)
+            self.loop.call_soon_threadsafe(self._wake)
+        if broker.name != "local":
+            asyncio.run_coroutine_threadsafe(broker.publish(ALARM_CHANNEL, message), self.loop)
+
+    async def _on_message(self, message: dict):
+        self._add_changes(message)
+        self._wake()
+
+    def _add_changes(self, message: dict):
+        with self.lock:
+            self.alarm_ids.update(message.get("alarm_ids", []))
+            self.customer_ids.update(message.get("customer_ids", []))
+            self.reload = self.reload or message.get("reload", False)
+
+    def _wake(self):
+        if self.event is not None:
+            self.event.set()
+
+    # -----------------------------
+    # Loop
+    # -----------------------------
+    async def _run(self):
+        await broker.subscribe(ALARM_CHANNEL, self._on_message)
+        await self._load()
+        last_load = self.loop.time()
+        logger.info(f"✅ Alarm scheduler: {len(self.versions)} pending reminders.")
+        while True:
+            timeout = ALARM_RELOAD_INTERVAL - (self.loop.time() - last_load)
+            if self.heap:
+                timeout = min(timeout, (self.heap[0][0] - _utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self.event.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            self.event.clear()
+
+            try:
+                if self.loop.time() - last_load >= ALARM_RELOAD_INTERVAL:
+                    with self.lock:
+                        self.reload = True
+                if await self._apply_changes():
+                    last_load = self.loop.time()
+                await self._send_due()
+            except Exception as e:
+                print("Scheduler error:", e)
+                await asyncio.sleep(1)
+
+    async def _load(self, *criteria):
+        """(Re)schedule alarms matching criteria; no criteria: all alarms not passed yet."""
+        now = _utcnow()
+        if not criteria:
+            self.heap, self.versions = [], {}
+            criteria = (Alarm.date >= now,)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Alarm.id, Alarm.date, Alarm.reminder, Alarm.reminder_sent).where(*criteria)
+            )).all()
+        for row in rows:
+            self._schedule(row.id, next_reminder(row.date, row.reminder, row.reminder_sent))
+        return rows
+
+    async def _apply_changes(self) -> bool:
+        """Re-read changed alarms; True if everything was reloaded."""
+        with self.lock:
+            alarm_ids, self.alarm_ids = self.alarm_ids, set()
+            customer_ids, self.customer_ids = self.customer_ids, set()
+            reload, self.reload = self.reload, False
+        if reload:
+            await self._load()
+            return True
+
+        alarm_ids = list(alarm_ids)
+        for start in range(0, len(alarm_ids), RELOAD_CHUNK):
+            chunk = alarm_ids[start:start + RELOAD_CHUNK]
+            found = {row.id for row in await self._load(Alarm.id.in_(chunk))}
+            for alarm_id in set(chunk) - found:
+                self.versions.pop(alarm_id, None)   # deleted
+        customer_ids = list(customer_ids)
+        for start in range(0, len(customer_ids), RELOAD_CHUNK):
+            await self._load(Alarm.customer_id.in_(customer_ids[start:start + RELOAD_CHUNK]))
+        return False
+
+    def _schedule(self, alarm_id: int, when: Optional[datetime]):
+        if when is None:
+            self.versions.pop(alarm_id, None)
+            return
+        self.version += 1
+        self.versions[alarm_id] = self.version
+        heapq.heappush(self.heap, (when, alarm_id, self.version))
+
+    async def _send_due(self):
+        now = _utcnow()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            when, alarm_id, version = heapq.heappop(self.heap)
+            if self.versions.get(alarm_id) == version:
+                del self.versions[alarm_id]
+                due.append(alarm_id)
+        if not due:
+            return
+
+        async with AsyncSessionLocal() as db:
+            alarms = (await db.execute(
+                select(Alarm).options(selectinload(Alarm.customer)).where(Alarm.id.in_(due))
+            )).scalars().all()
+
+            # Users of every caller with a due alarm, in one query
+            callers = {alarm.caller_id for alarm in alarms}
+            users = defaultdict(list)
+            for user_id, caller_id in (await db.execute(
+                select(User.id, User.caller_id).where(User.caller_id.in_(callers))
+            )).all():
+                users[caller_id].append(user_id)
+
+            sent = []
+            for alarm in alarms:
+                if _naive(alarm.date) < now:
+                    continue   # passed: no more reminders
+                when = next_reminder(alarm.date, alarm.reminder, alarm.reminder_sent)
+                if when is None or when > now:
+                    self._schedule(alarm.id, when)   # changed meanwhile
+                    continue
+
+                payload = {
+                    "type": "alarm",
+                    "customer": f"{alarm.customer.first_name} {alarm.customer.last_name}",
+                    "note": alarm.note,
+                    "date": alarm.date.isoformat(),
+                }
+                received = False
+                for user_id in users[alarm.caller_id]:
+                    logger.info("✅ Send Alarm.")
+                    try:
+                        # None: the broker cannot tell, count it as sent
+                        received = (await push(user_id, payload)) != 0 or received
+                    except Exception as e:
+                        print(f"WebSocket send failed for {user_id}: {e}")
+
+                if received:
+                    sent.append(alarm)
+                else:
+                    self._schedule(alarm.id, now + ALARM_RETRY)
+
+            if sent:
+                await db.execute(
+                    update(Alarm)
+                    .where(Alarm.id.in_([alarm.id for alarm in sent]))
+                    .values(reminder_sent=now)
+                    .execution_options(synchronize_session=False, customer_ids=list({alarm.customer_id for alarm in sent}))
+                )
+                await db.commit()
+                for alarm in sent:
+                    self._schedule(alarm.id, next_reminder(alarm.date, alarm.reminder, now))
+
+
+alarm_scheduler = AlarmScheduler()
+
+
+# -------------------------------------------------
+# Session hooks: collect changed alarms at flush, wake the scheduler at commit
+# -------------------------------------------------
+IDS_KEY = "alarm_ids"
+CUSTOMERS_KEY = "alarm_customers"
+RELOAD_KEY = "alarm_reload"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_alarm_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Alarm):
+            session.info.setdefault(IDS_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _watch_bulk_alarm_writes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        if state.bind_mapper.class_ is not Alarm:
+            return
+        customer_ids = state.execution_options.get("customer_ids")
+        if customer_ids is None:
+            state.session.info[RELOAD_KEY] = True
+        else:
+            state.session.info.setdefault(CUSTOMERS_KEY, set()).update(customer_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_alarm_scheduler(session):
+    alarm_ids = session.info.pop(IDS_KEY, None)
+    customer_ids = session.info.pop(CUSTOMERS_KEY, None)
+    reload = session.info.pop(RELOAD_KEY, False)
+    if not is_app_session(session):
+        return
+    if alarm_ids or customer_ids or reload:
+        alarm_scheduler.notify(alarm_ids or (), customer_ids or (), reload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_alarm_changes(session, previous_transaction):
+    session.info.pop(IDS_KEY, None)
+    session.info.pop(CUSTOMERS_KEY, None)
+    session.info.pop(RELOAD_KEY, None)
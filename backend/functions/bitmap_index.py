@@ -0,0 +1,434 @@
+import threading
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models.models import Customer
+from core.database import SessionLocal, is_app_session
+from core.models.models import CacheVersion
+from core.refcache import REFCACHE_MAX_AGE, bump_versions, reference_cache
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# In-memory bitmap index for the customer filter panel
+#
+# One bitset per (attribute, value); bit n set = customer id n has that value.
+# Bitsets are plain Python ints, AND/OR/NOT are single big-int operations
+# and popcount (int.bit_count) gives facet counts.
+#
+# The index lives in this process. Customer writes through the ORM update it
+# on commit; bulk INSERT/UPDATE/DELETE on customers trigger a rebuild in a thread.
+# While it is not built ("cold") resolve() returns None and callers use SQL.
+#
+# Other workers: a write to an indexed column bumps the "customers" row in
+# cache_versions in the same transaction. sync() rebuilds when the version
+# moved past the one the index is at (checked at most every
+# REFCACHE_CHECK_INTERVAL, core.refcache), or when the index is older than
+# REFCACHE_MAX_AGE, which covers raw SQL writers. This worker's own commits
+# carry the version forward, so they need no rebuild.
+# -------------------------------------------------
+
+BOOLEAN_FIELDS = ["controlled", "code_name"] + [f"filter_{c}" for c in "abcdefgh"]
+INTEGER_FIELDS = ["personality_type", "contributes", "caller_id"]
+LIST_FIELDS = ["categories", "organisations"]
+INDEXED_FIELDS = BOOLEAN_FIELDS + INTEGER_FIELDS + LIST_FIELDS
+INDEX_VERSION = "customers"
+
+
+def _list_values(raw) -> frozenset:
+    """Same normalization as customer_values() / the junction tables."""
+    if raw is None:
+        return frozenset()
+    if isinstance(raw, list):
+        return frozenset(str(v).strip() for v in raw if str(v).strip())
+    return frozenset(v.strip().strip("'\"") for v in str(raw).split(",") if v.strip().strip("'\""))
+
+
+SCALAR_COUNT = len(BOOLEAN_FIELDS) + len(INTEGER_FIELDS)
+
+
+def entry_from_values(values) -> tuple:
+    """
+    Indexed values of one customer, aligned with INDEXED_FIELDS:
+    one value per scalar field, a frozenset per list field.
+    """
+    booleans = len(BOOLEAN_FIELDS)
+    return (
+        # build_filters treats NULL as False
+        tuple([bool(v) for v in values[:booleans]])
+        + tuple(values[booleans:SCALAR_COUNT])
+        + tuple([_list_values(v) for v in values[SCALAR_COUNT:]])
+    )
+
+
+def customer_entry(customer) -> tuple:
+    return entry_from_values([getattr(customer, field) for field in INDEXED_FIELDS])
+
+
+def entry_items(entry: tuple):
+    """(field, value) pairs of an entry."""
+    for pos in range(SCALAR_COUNT):
+        yield INDEXED_FIELDS[pos], entry[pos]
+    for pos in range(SCALAR_COUNT, len(INDEXED_FIELDS)):
+        for value in entry[pos]:
+            yield INDEXED_FIELDS[pos], value
+
+
+# Set bit positions of every byte value, for bit_ids()
+BYTE_BITS = [tuple(i for i in range(8) if byte >> i & 1) for byte in range(256)]
+
+
+def bit_ids(bits: int) -> List[int]:
+    """Customer ids set in a bitset, ascending."""
+    ids = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index << 3
+            ids.extend(base + i for i in BYTE_BITS[byte])
+    return ids
+
+
+def ids_bits(ids) -> int:
+    """Bitset from customer ids (one pass, no repeated big-int copies)."""
+    if not ids:
+        return 0
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+class CustomerBitmapIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = False
+        self.bitmaps: Dict[str, Dict[object, int]] = {}
+        self.entries: Dict[int, tuple] = {}
+        self.all = 0
+        self._building = False
+        self._stale = False
+        self._backlog: List[tuple] = []
+        self.version = 0                  # cache_versions "customers" the index is at
+        self.built_at = 0.0
+        self._version_backlog: List[Tuple[int, int]] = []
+
+    # -----------------------------
+    # Build / maintain
+    # -----------------------------
+    def build(self, db: Session):
+        """Full build from the customers table."""
+        with self.lock:
+            self._building = True
+            self._backlog = []
+            self._version_backlog = []
+
+        start = time.perf_counter()
+        try:
+            # read before the rows: a write in between only costs another rebuild
+            version = db.execute(
+                select(CacheVersion.version).where(CacheVersion.name == INDEX_VERSION)
+            ).scalar() or 0
+            columns = [Customer.id] + [getattr(Customer, f) for f in INDEXED_FIELDS]
+            value_ids = [{} for _ in INDEXED_FIELDS]
+            entries = {}
+
+            for row in db.execute(select(*columns)).yield_per(5000):
+                customer_id = row[0]
+                entry = entry_from_values(row[1:])
+                entries[customer_id] = entry
+                for pos in range(SCALAR_COUNT):
+                    value_ids[pos].setdefault(entry[pos], []).append(customer_id)
+                for pos in range(SCALAR_COUNT, len(INDEXED_FIELDS)):
+                    for value in entry[pos]:
+                        value_ids[pos].setdefault(value, []).append(customer_id)
+
+            bitmaps = {
+                field: {value: ids_bits(ids) for value, ids in value_ids[pos].items()}
+                for pos, field in enumerate(INDEXED_FIELDS)
+            }
+            all_bits = ids_bits(list(entries))
+        except Exception:
+            with self.lock:
+                self._building = False
+            raise
+
+        with self.lock:
+            self.bitmaps, self.entries, self.all = bitmaps, entries, all_bits
+            self.version, self.built_at = version, time.monotonic()
+            # Commits that happened while reading
+            for customer_id, entry in self._backlog:
+                self._apply(customer_id, entry)
+            for versions in self._version_backlog:
+                self._advance(versions)
+            self._backlog = []
+            self._version_backlog = []
+            stale, self._stale = self._stale, False
+            self._building = stale
+            self.ready = not stale
+
+        logger.info(f"✅ Customer bitmap index: {len(entries)} customers in {time.perf_counter() - start:.2f}s")
+        if stale:
+            self.start_build()
+
+    def start_build(self):
+        """Build in a background thread with its own session."""
+        def run():
+            db = SessionLocal()
+            try:
+                self.build(db)
+            except Exception as e:
+                logger.error(f"❌ Customer bitmap index build failed: {e}")
+            finally:
+                db.close()
+
+        threading.Thread(target=run, name="customer-bitmap-index", daemon=True).start()
+
+    def invalidate(self):
+        """Go cold (SQL fallback) and rebuild in the background."""
+        with self.lock:
+            self.ready = False
+            if self._building:
+                # The running build may have read before this change
+                self._stale = True
+                return
+            self._building = True
+        self.start_build()
+
+    def apply(self, changes: Dict[int, Optional[tuple]], versions: Optional[Tuple[int, int]] = None):
+        """
+        Committed changes: customer id -> entry, or None when deleted.
+        versions: (before, after) of the commit's bump in cache_versions.
+        """
+        with self.lock:
+            for customer_id, entry in changes.items():
+                if self._building:
+                    self._backlog.append((customer_id, entry))
+                self._apply(customer_id, entry)
+            if versions is not None:
+                if self._building:
+                    self._version_backlog.append(versions)
+                self._advance(versions)
+
+    def _advance(self, versions: Tuple[int, int]):
+        # only when no other worker's write came in between
+        if self.version == versions[0]:
+            self.version = versions[1]
+
+    def sync(self, db: Session):
+        """Rebuild if another worker changed customers or the index is older than REFCACHE_MAX_AGE."""
+        if not self.ready:
+            return
+        if reference_cache.version(db, INDEX_VERSION) > self.version or time.monotonic() - self.built_at > REFCACHE_MAX_AGE:
+            self.invalidate()
+
+    def _apply(self, customer_id: int, entry: Optional[tuple]):
+        bit = 1 << customer_id
+        old = self.entries.pop(customer_id, None)
+        if old:
+            for field, value in entry_items(old):
+                self.bitmaps[field][value] &= ~bit
+        if entry is None:
+            self.all &= ~bit
+            return
+
+        self.entries[customer_id] = entry
+        self.all |= bit
+        for field, value in entry_items(entry):
+            field_bitmaps = self.bitmaps.setdefault(field, {})
+            field_bitmaps[value] = field_bitmaps.get(value, 0) | bit
+
+    # -----------------------------
+    # Query
+    # -----------------------------
+    def _union(self, field: str, values) -> int:
+        bitmaps = self.bitmaps.get(field, {})
+        bits = 0
+        for value in values:
+            bits |= bitmaps.get(value, 0)
+        return bits
+
+    def _field_bits(self, field: str, value, filter_type: str) -> int:
+        """Bits matching one indexed field of a filter dict (self.all when build_filters would skip it)."""
+        if field in BOOLEAN_FIELDS:
+            if isinstance(value, str):
+                if value.lower() not in ("true", "false"):
+                    return self.all
+                value = value.lower() == "true"
+            return self._union(field, [bool(value)])
+
+        vals = value if isinstance(value, list) else [value]
+
+        if field in INTEGER_FIELDS:
+            ints = []
+            for v in vals:
+                if v in (None, "", []):
+                    continue
+                try:
+                    ints.append(int(v))
+                except (ValueError, TypeError):
+                    continue
+            if not ints or filter_type not in ("exact", "has", "has-all", "has-not"):
+                return self.all
+            matching = self._union(field, ints)
+            if filter_type == "has-not":
+                # SQL NOT IN never matches NULL
+                return self.all & ~matching & ~self._union(field, [None])
+            return matching
+
+        # JSON lists, same normalization as build_filters
+        if isinstance(value, str):
+            vals = [v.strip().strip("'\"") for v in value.split(",") if v.strip()]
+        vals = [str(v) for v in vals if v not in (None, "", [])]
+        if not vals or filter_type not in ("exact", "has", "has-all", "has-not"):
+            return self.all
+
+        bitmaps = self.bitmaps.get(field, {})
+        if filter_type == "has":
+            return self._union(field, vals)
+        if filter_type == "has-not":
+            return self.all & ~self._union(field, vals)
+
+        bits = self.all
+        for v in set(vals):
+            bits &= bitmaps.get(v, 0)
+        if filter_type == "has-all":
+            return bits
+        # exact: all wanted values and nothing else
+        wanted = set(vals)
+        others = self._union(field, [v for v in bitmaps if v not in wanted])
+        return bits & ~others
+
+    def resolve(self, data: dict, caller_id: Optional[int] = None) -> Optional[int]:
+        """
+        Bitset of customers matching a set_filter dict (build_filters semantics),
+        optionally limited to one caller. None when cold or the dict uses
+        fields the index does not cover; use SQL then.
+        """
+        if not self.ready:
+            return None
+
+        with self.lock:
+            bits = self.all
+            if caller_id is not None:
+                bits &= self._union("caller_id", [caller_id])
+
+            for field, value in (data or {}).items():
+                if value in (None, "", []):
+                    continue
+                if field.endswith("_type") and field[:-5] in data:
+                    continue  # filter type of another field
+                if getattr(Customer, field, None) is None:
+                    continue  # build_filters skips unknown keys too
+                if field not in INDEXED_FIELDS:
+                    return None
+
+                filter_type = data.get(f"{field}_type", "like")
+                bits &= self._field_bits(field, value, filter_type)
+
+            return bits
+
+    def facet_counts(self, bits: int) -> Dict[str, Dict[str, int]]:
+        """Customers per value within bits: {field: {value as string: count}}."""
+        with self.lock:
+            counts = {}
+            for field, bitmaps in self.bitmaps.items():
+                field_counts = {}
+                for value, value_bits in bitmaps.items():
+                    if value is None:
+                        continue
+                    key = str(value).lower() if isinstance(value, bool) else str(value)
+                    field_counts[key] = (bits & value_bits).bit_count()
+                counts[field] = field_counts
+            return counts
+
+
+customer_index = CustomerBitmapIndex()
+
+
+# -------------------------------------------------
+# Session hooks: collect customer changes at flush, apply at commit
+# -------------------------------------------------
+PENDING_KEY = "customer_bitmap_changes"
+VERSION_KEY = "customer_bitmap_version"
+REBUILD_KEY = "customer_bitmap_rebuild"
+
+
+def _bump_index_version(session):
+    """Bump cache_versions "customers" once per transaction; remember (before, after)."""
+    if VERSION_KEY in session.info or not is_app_session(session):
+        return
+    connection = session.connection()
+    bump_versions(connection, [INDEX_VERSION])
+    after = connection.execute(
+        select(CacheVersion.version).where(CacheVersion.name == INDEX_VERSION)
+    ).scalar()
+    session.info[VERSION_KEY] = (after - 1, after)
+
+
+def _indexed_change(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_customer_changes(session, flush_context):
+    changes = None
+    bump = False
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Customer) and obj.id is not None:
+            changes = session.info.setdefault(PENDING_KEY, {})
+            changes[obj.id] = customer_entry(obj)
+            bump = bump or obj in session.new or _indexed_change(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Customer) and obj.id is not None:
+            changes = session.info.setdefault(PENDING_KEY, {})
+            changes[obj.id] = None
+            bump = True
+    if bump:
+        _bump_index_version(session)
+
+
+def _touches_index(statement) -> bool:
+    """Whether a bulk UPDATE sets any indexed column (unknown shapes count as yes)."""
+    values = getattr(statement, "_values", None)
+    if not values:
+        return True
+    names = {getattr(key, "key", key) for key in values}
+    return bool(names & set(INDEXED_FIELDS))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _watch_bulk_customer_writes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        if state.bind_mapper.class_ is not Customer:
+            return
+        if state.is_update and not _touches_index(state.statement):
+            return  # e.g. last_call_date
+        state.session.info[REBUILD_KEY] = True
+        _bump_index_version(state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_customer_changes(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    rebuild = session.info.pop(REBUILD_KEY, False)
+    versions = session.info.pop(VERSION_KEY, None)
+    if not is_app_session(session):
+        return
+    if rebuild:
+        customer_index.invalidate()
+    elif changes:
+        customer_index.apply(changes, versions)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_customer_changes(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(REBUILD_KEY, None)
+    session.info.pop(VERSION_KEY, None)
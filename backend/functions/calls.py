@@ -0,0 +1,151 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import desc, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+import data.constants as constants
+from models.models import Alarm, Call, Customer, ProductCustomer
+
+
+async def customer_calls_page(db: AsyncSession, customer_id: int, before: Optional[int] = None, limit: int = constants.CALLS_PAGE_SIZE) -> Tuple[List, Optional[int]]:
+    """
+    One keyset page of the customer's calls, newest first, on ix_calls_customer_id.
+    Returns (rows, next_before): pass next_before as before for the older page,
+    None on the last page. Only the columns the call panel shows.
+    """
+    query = (
+        select(Call.id, Call.status, Call.call_date, Call.note)
+        .where(Call.customer_id == customer_id)
+        .order_by(desc(Call.id))
+        .limit(limit + 1)
+    )
+    if before is not None:
+        query = query.where(Call.id < before)
+    rows = (await db.execute(query)).all()
+
+    next_before = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_before
+
+
+async def customer_workspace(db: AsyncSession, customer_id: int) -> Tuple[Optional[Customer], List, Optional[int]]:
+    """
+    Everything calls/customer_calls.html renders for one customer:
+    the customer with its caller (one joined query) and the first page of
+    calls. Returns (customer, calls, next_before).
+    """
+    result = await db.execute(
+        select(Customer).options(joinedload(Customer.caller)).where(Customer.id == customer_id)
+    )
+    customer = result.scalars().first()
+    if customer is None:
+        return None, [], None
+
+    calls, next_before = await customer_calls_page(db, customer_id)
+    return customer, calls, next_before
+
+
+# -------------------------------------------------
+# save_call upserts: native INSERT ... ON CONFLICT on the unique indexes
+# (uq_alarms_customer_caller_product, uq_product_customers_customer_product)
+# -------------------------------------------------
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def alarm_upsert(dialect: str, customer_id: int, caller_id: int, product_id: Optional[int], date, reminder, note: str):
+    """The caller's alarm for customer/product: created, or moved to the new date and re-armed."""
+    stmt = UPSERT_INSERTS[dialect](Alarm).values(
+        customer_id=customer_id,
+        caller_id=caller_id,
+        product_id=product_id,
+        date=date,
+        reminder=reminder,
+        reminder_sent=None,
+        note=note,
+        extra={},
+    )
+    return (
+        stmt.on_conflict_do_update(
+            index_elements=[Alarm.customer_id, Alarm.caller_id, text("coalesce(product_id, 0)")],  # literal 0, as in the index
+            set_={
+                "date": stmt.excluded.date,
+                "reminder": stmt.excluded.reminder,
+                "reminder_sent": None,
+                "note": stmt.excluded.note,
+            },
+        )
+        # functions.dialer re-reads just this customer
+        .execution_options(customer_ids=[customer_id])
+    )
+
+
+def product_customer_upsert(dialect: str, customer_id: int, product_id: int, status: Optional[int], type_status: Optional[int], now):
+    """
+    The customer's row on a product: only the given statuses change, order_date
+    is set the first time the status becomes 3 (going). New rows start at 0 (no input).
+    """
+    stmt = UPSERT_INSERTS[dialect](ProductCustomer).values(
+        customer_id=customer_id,
+        product_id=product_id,
+        status=0 if status is None else status,
+        type_status=type_status,
+        order_date=now if status == 3 else None,
+        extra={},
+    )
+    values = {}
+    if status is not None:
+        values["status"] = stmt.excluded.status
+        if status == 3:
+            values["order_date"] = func.coalesce(ProductCustomer.order_date, stmt.excluded.order_date)
+    if type_status is not None:
+        values["type_status"] = stmt.excluded.type_status
+    return (
+        stmt.on_conflict_do_update(
+            index_elements=[ProductCustomer.customer_id, ProductCustomer.product_id],
+            set_=values,
+        )
+        # functions.product_status drops just this product's/customer's totals
+        .execution_options(status_keys=[(product_id, customer_id)])
+    )
+
+
+# Duplicates from concurrent saves before the indexes existed: keep the oldest row,
+# the one save_call kept updating (as migration c4f6a8b0d2e5)
+SAVE_CALL_INDEXES = [
+    (
+        ProductCustomer.__table__, "uq_product_customers_customer_product",
+        "DELETE FROM product_customers WHERE id NOT IN "
+        "(SELECT MIN(id) FROM product_customers GROUP BY customer_id, product_id)",
+    ),
+    (
+        Alarm.__table__, "uq_alarms_customer_caller_product",
+        "DELETE FROM alarms WHERE id NOT IN "
+        "(SELECT MIN(id) FROM alarms GROUP BY customer_id, caller_id, coalesce(product_id, 0))",
+    ),
+]
+
+
+INDEX_EXISTS = {
+    "sqlite": "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name",
+    "postgresql": "SELECT 1 FROM pg_indexes WHERE indexname = :name",
+}
+
+
+def ensure_save_call_indexes(engine) -> bool:
+    """
+    Startup hook: create_all adds no indexes to existing tables, so a database
+    not upgraded with Alembic would lack the indexes the upserts above need.
+    Dedupe and create them if missing. Returns True if one was created.
+    """
+    # by name: reflection skips the expression index
+    index_exists = text(INDEX_EXISTS[engine.dialect.name])
+    created = False
+    with engine.begin() as conn:
+        for table, name, dedupe in SAVE_CALL_INDEXES:
+            if conn.execute(index_exists, {"name": name}).first():
+                continue
+            conn.execute(text(dedupe))
+            next(index for index in table.indexes if index.name == name).create(conn)
+            created = True
+    return created
@@ -2,14 +2,19 @@
 
 from sqlalchemy.orm import Session, declarative_base
 from typing import List, Optional
-from models.models import Customer, Caller, Call
+from models.models import Customer, Caller, Call, CustomerCategory, CustomerOrganisation, CustomerTag
+from core.models.models import Tag
+from functions.bitmap_index import customer_index, bit_ids
 from sqlalchemy.orm import Session, joinedload
 from core.models.base import Base
 from fastapi import Request
 from pydantic import BaseModel, Field
-from core.functions.helpers import build_filters
+from core.functions.helpers import build_filters, encode_cursor, decode_cursor
+from core.sessions import encode_id_ranges, decode_id_ranges
+from sqlalchemy import and_, or_, tuple_, select, update, func, insert
 from typing import List, Optional
 import datetime
+import data.constants as constants
 
 class SelectedIDs(BaseModel):
     ids: List[int] = Field(..., alias="selected_ids")
@@ -20,12 +25,12 @@ def get_selected_ids(request: Request, selected_ids: Optional[SelectedIDs]) -> L
     """
 
     if selected_ids is not None:
-        # Save to session if POSTed
-        request.session["selected_ids"] = selected_ids.ids
+        # Save to session if POSTed, as id ranges to keep big selections small
+        request.session["selected_ids"] = encode_id_ranges(selected_ids.ids)
         return selected_ids.ids
 
     # Otherwise, pull from session
-    return request.session.get("selected_ids", [])
+    return decode_id_ranges(request.session.get("selected_ids", []))
 
 
 def get_customers(db: Session, user, ids: List[int]) -> List[Customer]:
@@ -67,84 +72,250 @@ def assign_customers_caller(db: Session, ids: List[int], caller_id: int):
     db.commit()
     return updated_rows
 
+def customer_list_order():
+    """Sort order of the customer list; id makes it unique for keyset paging."""
+    return (
+        Customer.first_name.collate("NOCASE").asc(),
+        Customer.last_name.collate("NOCASE").asc(),
+        Customer.id.asc(),
+    )
+
+
+def customer_cursor(customer) -> str:
+    """Cursor pointing just after this customer in customer_list_order()."""
+    return encode_cursor([customer.first_name, customer.last_name, customer.id])
+
+
+def after_customer_cursor(values):
+    """
+    Keyset condition: rows sorted after the cursor values.
+    The leading first_name >= term lets SQLite seek in ix_customers_name_nocase,
+    the row value comparison alone would scan.
+    """
+    first_name, last_name, customer_id = values
+    first = Customer.first_name.collate("NOCASE")
+    last = Customer.last_name.collate("NOCASE")
+    return and_(
+        first >= first_name,
+        tuple_(first, last, Customer.id) > tuple_(first_name, last_name, customer_id),
+    )
+
+
+# -------------------------------------------------
+# Junction tables for JSON/CSV list columns
+# -------------------------------------------------
+def tag_ids(names):
+    return select(Tag.id).where(Tag.name.in_(names))
+
+# field -> (junction model, value lookup), passed to build_filters
+CUSTOMER_JUNCTIONS = {
+    "categories": (CustomerCategory, None),
+    "organisations": (CustomerOrganisation, None),
+    "tags": (CustomerTag, tag_ids),
+}
+
+
+def customer_values(raw) -> set:
+    """Values of a JSON list or CSV column as a set of strings."""
+    if raw is None:
+        return set()
+    if isinstance(raw, list):
+        return {str(v).strip() for v in raw if str(v).strip()}
+    return {v.strip().strip("'\"") for v in str(raw).split(",") if v.strip().strip("'\"")}
+
+
+def _sync_links(links, wanted: dict, make):
+    """links: relationship list; wanted: value_id -> value; make: value -> new link."""
+    current = {link.value_id: link for link in links}
+    for value_id, link in current.items():
+        if value_id not in wanted:
+            links.remove(link)
+    for value_id, value in wanted.items():
+        if value_id not in current:
+            links.append(make(value))
+
+
+def sync_customer_values(db, customer):
+    """
+    Write-through: mirror customer.categories / organisations / tags
+    into the junction tables. Call before commit on every customer write.
+    """
+    categories = customer_values(customer.categories)
+    _sync_links(customer.category_values, {v: v for v in categories}, lambda v: CustomerCategory(value_id=v))
+
+    organisations = customer_values(customer.organisations)
+    _sync_links(customer.organisation_values, {v: v for v in organisations}, lambda v: CustomerOrganisation(value_id=v))
+
+    # Tags share the Tag vocabulary used by the tag autocomplete
+    names = customer_values(customer.tags)
+    tags = {t.name: t for t in db.query(Tag).filter(Tag.name.in_(names))} if names else {}
+    for name in names - tags.keys():
+        tags[name] = Tag(name=name)
+        db.add(tags[name])
+    if any(t.id is None for t in tags.values()):
+        db.flush()
+    _sync_links(customer.tag_values, {t.id: t for t in tags.values()}, lambda t: CustomerTag(tag=t))
+
+
+
+def ensure_customer_values(engine) -> int:
+    """
+    Startup hook: fill the junction tables from the JSON columns when they
+    are empty (created by create_all on a database that was never upgraded
+    with migration c4e8a1d3f5b7). Returns the number of links written.
+    """
+    with engine.begin() as conn:
+        for model in (CustomerCategory, CustomerOrganisation, CustomerTag):
+            if conn.execute(select(model.customer_id).limit(1)).first():
+                return 0
+
+        categories, organisations, tag_names = [], [], {}
+        for customer_id, cats, orgs, tags in conn.execute(
+            select(Customer.id, Customer.categories, Customer.organisations, Customer.tags)
+        ):
+            categories += [{"customer_id": customer_id, "value_id": v} for v in customer_values(cats)]
+            organisations += [{"customer_id": customer_id, "value_id": v} for v in customer_values(orgs)]
+            tag_names[customer_id] = customer_values(tags)
+
+        # Tags share the Tag vocabulary used by the tag autocomplete
+        all_names = set().union(*tag_names.values())
+        known = {name for (name,) in conn.execute(select(Tag.name))}
+        if all_names - known:
+            conn.execute(insert(Tag), [{"name": name} for name in sorted(all_names - known)])
+        ids = {name: id for id, name in conn.execute(select(Tag.id, Tag.name))}
+        tags = [
+            {"customer_id": customer_id, "value_id": ids[name]}
+            for customer_id, names in tag_names.items()
+            for name in names
+        ]
+
+        for model, rows in ((CustomerCategory, categories), (CustomerOrganisation, organisations), (CustomerTag, tags)):
+            if rows:
+                conn.execute(insert(model), rows)
+        return len(categories) + len(organisations) + len(tags)
+
+def user_customer_criteria(request, user, dialect: str = "sqlite") -> list:
+    """WHERE criteria for the customers visible to the user, narrowed by the session filter."""
+    criteria = []
+    if user.admin != 1:
+        criteria.append(Customer.caller_id == user.caller_id)
+
+    filter_dict = request.session.get("customer_filters", {})
+    criteria += build_filters(filter_dict, Customer, dialect, CUSTOMER_JUNCTIONS) or []
+    return criteria
+
+
+def user_customers_query(db, request, user):
+    """Customers visible to the user, narrowed by the session filter."""
+    # caller is rendered per row in customers/list.html
+    query = db.query(Customer).options(joinedload(Customer.caller))
+
+    criteria = user_customer_criteria(request, user, db.bind.dialect.name)
+    if criteria:
+        query = query.filter(*criteria)
+
+    return query
+
+
 def get_user_customers(db, request, user):
  #   calculate_last_call(db)
-    query = db.query(Customer)
+    query = user_customers_query(db, request, user)
 
-    if user.admin != 1:
-        query = query.filter(Customer.caller_id == user.caller_id)
+    return query.order_by(*customer_list_order()).all()
+
+
+def get_user_customers_page(db, request, user, cursor: str | None = None, limit: int = constants.CUSTOMERS_PAGE_SIZE):
+    """
+    One keyset page of the customer list.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = user_customers_query(db, request, user).order_by(*customer_list_order())
+
+    position = decode_cursor(cursor)
+    if position:
+        query = query.filter(after_customer_cursor(position))
+
+    rows = query.limit(limit + 1).all()
 
+    next_cursor = customer_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def resolve_user_customers(db, request, user) -> Optional[int]:
+    """
+    The list filter resolved on the bitmap index, as a bitset of customer ids.
+    None when the index is cold or the filter needs SQL.
+    """
+    customer_index.sync(db)
     filter_dict = request.session.get("customer_filters", {})
-    filters = build_filters(filter_dict, Customer)
 
-    sql_filters, exact_filters = get_exact_vals(filters)
+    if user.admin != 1:
+        if user.caller_id is None:
+            return 0
+        return customer_index.resolve(filter_dict, caller_id=user.caller_id)
 
-    if sql_filters:
-        query = query.filter(*sql_filters)
+    return customer_index.resolve(filter_dict)
 
-    query = query.order_by(
-        Customer.first_name.collate("NOCASE").asc(),
-        Customer.last_name.collate("NOCASE").asc()
+
+def get_user_customer_ids(db, request, user) -> List[int]:
+    """Ids of every customer matching the list filter, across all pages."""
+    bits = resolve_user_customers(db, request, user)
+    if bits is not None:
+        return bit_ids(bits)
+
+    query = user_customers_query(db, request, user)
+
+    return [row.id for row in query.with_entities(Customer.id)]
+
+
+def get_user_customer_facets(db, request, user) -> Optional[dict]:
+    """Per-value customer counts for the filter panel, None while the index is cold."""
+    bits = resolve_user_customers(db, request, user)
+    if bits is None:
+        return None
+    return customer_index.facet_counts(bits)
+
+
+# Call statuses that count as reaching the customer (answered / external)
+LAST_CALL_STATUSES = [1, 3]
+
+
+def last_call_date_expr():
+    """Correlated MAX(call_date) of the customer's answered calls."""
+    return (
+        select(func.max(Call.call_date))
+        .where(Call.customer_id == Customer.id, Call.status.in_(LAST_CALL_STATUSES))
+        .scalar_subquery()
     )
-    rows = query.all()
-
-    # Apply Python-side "exact" matching
-    if exact_filters:
-        rows = exact_vals(rows, exact_filters)
-
-    return rows
-
-
-def get_exact_vals(filters):
-    """Separate SQLAlchemy filters from Python-side exact match filters."""
-    exact_filters = [f for f in filters if isinstance(f, dict) and "exact_vals" in f]
-    sql_filters = [f for f in filters if not (isinstance(f, dict) and "exact_vals" in f)]
-    return sql_filters, exact_filters
-
-def exact_vals(rows, exact_filters):
-    results = []
-    for row in rows:
-        include = True
-        for f in exact_filters:
-            colname = f["column"]
-            expected_vals = set(f["exact_vals"])
-            raw_val = getattr(row, colname, None)
-
-            if raw_val is None:
-                include = False
-                break
-
-            # Normalize actual values (works for CSV or JSON)
-            if isinstance(raw_val, list):
-                actual_vals = set(str(v) for v in raw_val)
-            else:
-                actual_vals = set(v.strip() for v in str(raw_val).split(",") if v.strip())
-
-            if actual_vals != expected_vals:
-                include = False
-                break
-
-        if include:
-            results.append(row)
-    return results
-
-def calculate_last_call(db: Session):
-    customers = db.query(Customer).all()
-
-    for customer in customers:
-        last_call = (
-            db.query(Call)
-            .filter(Call.customer_id == customer.id)
-            .filter(Call.status.in_([1, 3]))  # successful or answered calls
-            .order_by(Call.call_date.desc())
-            .first()
-        )
 
-        # Ensure `extra` exists and is a dict
-        if customer.extra is None:
-            customer.extra = {}
 
-        if last_call:
-            customer.last_call_date = last_call.call_date
+def calculate_last_call(db: Session, customer_ids: Optional[List[int]] = None) -> int:
+    """
+    Recompute Customer.last_call_date in one UPDATE (all customers, or customer_ids).
+    Customers without answered calls keep their value. Returns updated row count.
+    """
+    called = select(Call.customer_id).where(Call.status.in_(LAST_CALL_STATUSES))
+    if customer_ids is not None:
+        called = called.where(Call.customer_id.in_(customer_ids))
+
+    result = db.execute(
+        update(Customer)
+        .where(Customer.id.in_(called))
+        .values(last_call_date=last_call_date_expr())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
 
-    db.commit()
\ No newline at end of file
+def touch_last_call_date(customer_id: int, call_date):
+    """UPDATE statement moving last_call_date forward to call_date (never back)."""
+    return (
+        update(Customer)
+        .where(
+            Customer.id == customer_id,
+            or_(Customer.last_call_date.is_(None), Customer.last_call_date < call_date),
+        )
+        .values(last_call_date=call_date)
+        .execution_options(synchronize_session=False, customer_ids=[customer_id])
+    )
@@ -0,0 +1,328 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+
+from core.database import is_app_session
+from core.models.models import CacheVersion
+from core.refcache import REFCACHE_MAX_AGE, bump_versions, reference_cache
+from models.models import Alarm, Call, Customer, Product, ProductCustomer
+
+# -------------------------------------------------
+# Dialer queue: whom each caller should ring next
+#
+# One heap per caller (the customers with that caller_id) ordered by
+# (tier, when, customer_id):
+#   tier 0  a callback alarm is due, no successful call and no attempt since
+#           (when = alarm date)
+#   tier 1  undecided on an open product, ProductCustomer status 0/2 (when = last attempt)
+#   tier 2  everyone else (when = last attempt)
+# where the last attempt is the newest call of any status, so inside a tier
+# the customer not rung for longest comes first, never rung before all, and
+# an unanswered call sends the customer to the back like a successful one.
+# Alarms that are not due yet wait in a second heap and move up when they
+# fall due.
+#
+# Entries are never removed in place: a changed customer gets a new
+# version and the old entry is skipped when it surfaces (lazy deletion),
+# so next() and updates are O(log n). A caller's heap is built on first
+# use. The session hooks below mark the customers a commit touched; the
+# next next() re-reads only those.
+#
+# Other workers: a write to a watched model bumps the "dialer" row in
+# cache_versions in the same transaction. next() drops every heap when the
+# version moved past the one the queue is at (checked at most every
+# REFCACHE_CHECK_INTERVAL, core.refcache), and rebuilds a caller's heap
+# older than REFCACHE_MAX_AGE, which covers raw SQL writers. This worker's
+# own commits carry the version forward, so they need no rebuild.
+# -------------------------------------------------
+
+OPEN_PRODUCT_STATUSES = (0, 2)  # no input, maybe
+TIER_ALARM, TIER_OPEN_PRODUCT, TIER_OTHER = 0, 1, 2
+NEVER = datetime.min
+REFRESH_CHUNK = 500
+QUEUE_VERSION = "dialer"
+
+
+def _utcnow() -> datetime:
+    # DateTime columns come back naive UTC from SQLite
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=None) if value is not None and value.tzinfo else value
+
+
+def dialer_rows(db: Session, *criteria) -> List:
+    """(id, caller_id, last_call_date, last_attempt, alarm_date, open_product) per customer."""
+    now = _utcnow()
+    alarm_date = (
+        select(func.min(Alarm.date))
+        .where(
+            Alarm.customer_id == Customer.id,
+            or_(Customer.last_call_date.is_(None), Alarm.date > Customer.last_call_date),
+        )
+        .correlate(Customer)
+        .scalar_subquery()
+    )
+    # newest call of any status, on ix_calls_customer_date
+    last_attempt = (
+        select(func.max(Call.call_date))
+        .where(Call.customer_id == Customer.id)
+        .correlate(Customer)
+        .scalar_subquery()
+    )
+    open_product = (
+        select(ProductCustomer.id)
+        .join(Product, Product.id == ProductCustomer.product_id)
+        .where(
+            ProductCustomer.customer_id == Customer.id,
+            ProductCustomer.status.in_(OPEN_PRODUCT_STATUSES),
+            or_(Product.end_date.is_(None), Product.end_date >= now),
+        )
+        .correlate(Customer)
+        .exists()
+    )
+    return db.execute(
+        select(
+            Customer.id,
+            Customer.caller_id,
+            Customer.last_call_date,
+            last_attempt.label("last_attempt"),
+            alarm_date.label("alarm_date"),
+            open_product.label("open_product"),
+        ).where(*criteria)
+    ).all()
+
+
+class DialerQueue:
+    def __init__(self):
+        self.heaps: Dict[int, list] = {}                 # caller_id -> [(tier, when, customer_id, version)]
+        self.alarms: Dict[int, list] = {}                # caller_id -> [(alarm_date, customer_id, version)]
+        self.entries: Dict[int, Tuple[int, int]] = {}    # customer_id -> (caller_id, version)
+        self.alarm_versions: Dict[int, int] = {}         # customer_id -> version of its alarms entry
+        self.built_at: Dict[int, float] = {}             # caller_id -> time.monotonic() of the build
+        self.version = 0
+        self.queue_version = 0                           # cache_versions "dialer" the heaps are at (dirty_lock)
+        self.lock = threading.Lock()                     # heaps, held while (re)loading
+
+        self.dirty: Set[int] = set()
+        self.dirty_lock = threading.Lock()               # taken by commit hooks, never held for I/O
+        self.building = 0
+        self.stale = False                               # reset requested by a bulk write
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def next(self, db: Session, caller_id: int, now: Optional[datetime] = None) -> Optional[int]:
+        """
+        Pop the customer the caller should ring next. The customer goes to the
+        back of tier 2 until a saved call (or other write) re-reads it.
+        """
+        now = now or _utcnow()
+        with self.lock:
+            self._apply_changes(db)
+            if time.monotonic() - self.built_at.get(caller_id, 0.0) > REFCACHE_MAX_AGE:
+                self._build(db, caller_id)
+            heap, alarms = self.heaps[caller_id], self.alarms[caller_id]
+
+            while alarms and alarms[0][0] <= now:
+                alarm_date, customer_id, version = heapq.heappop(alarms)
+                if self.alarm_versions.get(customer_id) == version:
+                    del self.alarm_versions[customer_id]
+                    self._push(caller_id, customer_id, TIER_ALARM, alarm_date)
+
+            while heap:
+                tier, when, customer_id, version = heapq.heappop(heap)
+                if self.entries.get(customer_id) == (caller_id, version):
+                    self._push(caller_id, customer_id, TIER_OTHER, now)
+                    return customer_id
+            return None
+
+    # -----------------------------
+    # Maintenance
+    # -----------------------------
+    def mark(self, customer_ids: Iterable[int], versions: Optional[Tuple[int, int]] = None):
+        """
+        Customers changed by a commit: re-read on the next next().
+        versions: (before, after) of the commit's bump in cache_versions.
+        """
+        with self.dirty_lock:
+            if self.heaps or self.building:
+                self.dirty.update(customer_ids)
+            # only when no other worker's write came in between
+            if versions is not None and self.queue_version == versions[0]:
+                self.queue_version = versions[1]
+
+    def reset(self):
+        """Drop every heap (bulk writes): rebuilt per caller on next use."""
+        with self.dirty_lock:
+            self.stale = True
+            self.dirty.clear()
+
+    def _apply_changes(self, db: Session):
+        version = reference_cache.version(db, QUEUE_VERSION)
+        with self.dirty_lock:
+            if version > self.queue_version:
+                stale, self.queue_version = True, version   # another worker's write
+            else:
+                stale = self.stale
+            self.stale = False
+            dirty, self.dirty = self.dirty, set()
+        if stale:
+            self.heaps.clear()
+            self.alarms.clear()
+            self.entries.clear()
+            self.alarm_versions.clear()
+            self.built_at.clear()
+            return
+        dirty = [customer_id for customer_id in dirty if customer_id is not None]
+        now = _utcnow()
+        for start in range(0, len(dirty), REFRESH_CHUNK):
+            chunk = dirty[start:start + REFRESH_CHUNK]
+            rows = dialer_rows(db, Customer.id.in_(chunk))
+            for customer_id in set(chunk) - {row.id for row in rows}:
+                self._drop(customer_id)   # deleted
+            for row in rows:
+                if row.caller_id in self.heaps:
+                    self._add(row, now)
+                else:
+                    self._drop(row.id)    # moved to a caller not built yet
+
+    def _build(self, db: Session, caller_id: int):
+        with self.dirty_lock:
+            self.building += 1
+        try:
+            rows = dialer_rows(db, Customer.caller_id == caller_id)
+            for customer_id, (entry_caller_id, _) in list(self.entries.items()):
+                if entry_caller_id == caller_id:
+                    self._drop(customer_id)   # rebuilt after REFCACHE_MAX_AGE
+            self.heaps[caller_id] = []
+            self.alarms[caller_id] = []
+            now = _utcnow()
+            for row in rows:
+                self._add(row, now, heapify=False)
+            heapq.heapify(self.heaps[caller_id])
+            heapq.heapify(self.alarms[caller_id])
+            self.built_at[caller_id] = time.monotonic()
+        finally:
+            # commits during the load stay marked (mark() only skips when nothing is built)
+            with self.dirty_lock:
+                self.building -= 1
+
+    def _add(self, row, now: datetime, heapify: bool = True):
+        last_attempt = _naive(row.last_attempt) or NEVER
+        alarm_date = _naive(row.alarm_date)
+        if alarm_date is not None and last_attempt >= alarm_date:
+            alarm_date = None   # rung since the callback fell due: back to the normal order
+        if alarm_date is not None and alarm_date <= now:
+            entry = (TIER_ALARM, alarm_date)
+        else:
+            entry = (TIER_OPEN_PRODUCT if row.open_product else TIER_OTHER, last_attempt)
+        version = self._push(row.caller_id, row.id, *entry, heapify=heapify)
+        if alarm_date is not None and alarm_date > now:
+            self.alarm_versions[row.id] = version
+            item = (alarm_date, row.id, version)
+            if heapify:
+                heapq.heappush(self.alarms[row.caller_id], item)
+            else:
+                self.alarms[row.caller_id].append(item)
+        else:
+            self.alarm_versions.pop(row.id, None)
+
+    def _drop(self, customer_id: int):
+        self.entries.pop(customer_id, None)
+        self.alarm_versions.pop(customer_id, None)
+
+    def _push(self, caller_id: int, customer_id: int, tier: int, when: datetime, heapify: bool = True) -> int:
+        self.version += 1
+        self.entries[customer_id] = (caller_id, self.version)
+        item = (tier, when, customer_id, self.version)
+        if heapify:
+            heapq.heappush(self.heaps[caller_id], item)
+        else:
+            self.heaps[caller_id].append(item)
+        return self.version
+
+
+dialer_queue = DialerQueue()
+
+
+# -------------------------------------------------
+# Session hooks: collect touched customers at flush, mark them at commit
+# Bulk statements name theirs with the "customer_ids" execution option
+# (ProductCustomer upserts: "status_keys"); others reset every heap.
+# -------------------------------------------------
+PENDING_KEY = "dialer_customers"
+RESET_KEY = "dialer_reset"
+VERSION_KEY = "dialer_version"
+WATCHED = (Customer, Call, Alarm, ProductCustomer, Product)
+
+
+def _bump_queue_version(session):
+    """Bump cache_versions "dialer" once per transaction; remember (before, after)."""
+    if VERSION_KEY in session.info or not is_app_session(session):
+        return
+    connection = session.connection()
+    bump_versions(connection, [QUEUE_VERSION])
+    after = connection.execute(
+        select(CacheVersion.version).where(CacheVersion.name == QUEUE_VERSION)
+    ).scalar()
+    session.info[VERSION_KEY] = (after - 1, after)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dialer_changes(session, flush_context):
+    bump = False
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Customer):
+            session.info.setdefault(PENDING_KEY, set()).add(obj.id)
+        elif isinstance(obj, (Call, Alarm, ProductCustomer)):
+            session.info.setdefault(PENDING_KEY, set()).add(obj.customer_id)
+        elif isinstance(obj, Product):
+            session.info[RESET_KEY] = True   # end_date decides which statuses are open
+        else:
+            continue
+        bump = True
+    if bump:
+        _bump_queue_version(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _watch_bulk_dialer_writes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        if state.bind_mapper.class_ not in WATCHED:
+            return
+        customer_ids = state.execution_options.get("customer_ids")
+        if customer_ids is None and "status_keys" in state.execution_options:
+            customer_ids = [customer_id for _, customer_id in state.execution_options["status_keys"]]
+        if customer_ids is None:
+            state.session.info[RESET_KEY] = True
+        else:
+            state.session.info.setdefault(PENDING_KEY, set()).update(customer_ids)
+        _bump_queue_version(state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_dialer_changes(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    reset = session.info.pop(RESET_KEY, False)
+    versions = session.info.pop(VERSION_KEY, None)
+    if not is_app_session(session):
+        return
+    if reset:
+        dialer_queue.reset()
+    if changes or versions:
+        dialer_queue.mark(changes or (), versions)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_dialer_changes(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(RESET_KEY, None)
+    session.info.pop(VERSION_KEY, None)
@@ -0,0 +1,136 @@
+import csv
+import datetime
+import io
+import json
+from typing import Iterator, List, Optional
+
+from sqlalchemy import JSON, Date, DateTime, select
+
+from core.database import engine
+from models.models import Call, Caller, Customer, Product, ProductCustomer
+
+# -------------------------------------------------
+# Streaming exports (CSV / NDJSON)
+#
+# Rows are fetched EXPORT_BATCH_SIZE at a time (yield_per) from a dedicated
+# connection and encoded batch by batch, so memory stays flat whatever the
+# row count. The generators are sync; StreamingResponse iterates them in the
+# thread pool.
+# -------------------------------------------------
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+# -----------------------------
+# Export sets
+# -----------------------------
+def customers_export(criteria: Optional[list] = None):
+    """All customer columns plus caller_name, narrowed by criteria (see user_customer_criteria)."""
+    query = (
+        select(*Customer.__table__.columns, Caller.name.label("caller_name"))
+        .outerjoin(Caller, Caller.id == Customer.caller_id)
+        .order_by(Customer.id)
+    )
+    if criteria:
+        query = query.where(*criteria)
+    return query
+
+
+def calls_export(date_from: Optional[datetime.date] = None, date_to: Optional[datetime.date] = None):
+    """Calls with caller and customer names, date_to inclusive."""
+    query = (
+        select(
+            *Call.__table__.columns,
+            Caller.name.label("caller_name"),
+            Customer.first_name,
+            Customer.last_name,
+            Customer.phone,
+        )
+        .outerjoin(Caller, Caller.id == Call.caller_id)
+        .outerjoin(Customer, Customer.id == Call.customer_id)
+        .order_by(Call.call_date, Call.id)
+    )
+    if date_from:
+        query = query.where(Call.call_date >= datetime.datetime.combine(date_from, datetime.time.min))
+    if date_to:
+        query = query.where(Call.call_date < datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min))
+    return query
+
+
+def product_customers_export(product_id: Optional[int] = None):
+    """Product participants (ProductCustomer) with customer and product names."""
+    query = (
+        select(
+            *ProductCustomer.__table__.columns,
+            Product.name.label("product_name"),
+            Customer.first_name,
+            Customer.last_name,
+            Customer.phone,
+            Customer.email,
+        )
+        .join(Customer, Customer.id == ProductCustomer.customer_id)
+        .outerjoin(Product, Product.id == ProductCustomer.product_id)
+        .order_by(ProductCustomer.product_id, ProductCustomer.id)
+    )
+    if product_id is not None:
+        query = query.where(ProductCustomer.product_id == product_id)
+    return query
+
+
+# -----------------------------
+# Encoding
+# -----------------------------
+def _csv_converters(query) -> list:
+    """(index, function) for the columns csv.writer can't write as-is (None is written as "")."""
+    converters = []
+    for i, column in enumerate(query.selected_columns):
+        if isinstance(column.type, JSON):
+            converters.append((i, lambda v: json.dumps(v, ensure_ascii=False)))
+        elif isinstance(column.type, (DateTime, Date)):
+            converters.append((i, lambda v: v.isoformat()))
+    return converters
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_export(query, fmt: str = "csv", bind=engine, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Yield the query result encoded as CSV (with header) or NDJSON, one chunk per batch."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}")
+
+    with bind.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(query)
+        keys: List[str] = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if fmt == "csv":
+            writer.writerow(keys)
+            converters = _csv_converters(query)
+
+        for rows in result.partitions():
+            if fmt == "csv":
+                for row in rows:
+                    values = list(row)
+                    for i, convert in converters:
+                        if values[i] is not None:
+                            values[i] = convert(values[i])
+                    writer.writerow(values)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=_json_default))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
@@ -0,0 +1,255 @@
+import csv
+import io
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from models.models import Customer, Caller, CustomerCategory, CustomerOrganisation, CustomerTag
+from core.models.models import Tag
+from core.functions.helpers import formatPhoneNr
+from core.database import SessionLocal
+from functions.customers import customer_values
+
+# -------------------------------------------------
+# Streaming CSV customer import
+#
+# Rows are read one at a time from a file-like object and inserted in chunks:
+# one executemany INSERT ... RETURNING id per chunk plus the junction rows,
+# one transaction per chunk, so the SQLite write lock is released in between.
+# Duplicates are detected against a prefetched set of normalized phones
+# (existing customers and earlier rows of the same file).
+# -------------------------------------------------
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+# -----------------------------
+# Row parsing
+# -----------------------------
+def _parse_bool(value) -> bool:
+    """Convert various truthy strings to bool."""
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return str(value).strip().lower() in ["true", "1", "yes", "y", "t"]
+
+
+def _parse_int(value) -> Optional[int]:
+    try:
+        return int(value or 0) or None
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_tags(value) -> List[str]:
+    """Comma-separated tags"""
+    if not value:
+        return []
+    return [v.strip().strip('"').strip("'") for v in value.split(",") if v.strip()]
+
+
+def _parse_id_list(value) -> List[str]:
+    """
+    CSV field -> list of string ids.
+    Accepts a JSON array ('["1","2"]' or '[1,2]'), '1,2,3', a single id, or empty.
+    """
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+
+    s = str(value).strip()
+    if not s:
+        return []
+    try:
+        parsed = json.loads(s)
+        if isinstance(parsed, (list, tuple)):
+            return [str(v).strip() for v in parsed if str(v).strip()]
+        elif parsed is not None:
+            return [str(parsed).strip()]
+        return []
+    except Exception:
+        return [p.strip() for p in s.split(",") if p.strip()]
+
+
+def parse_customer_row(row: dict) -> dict:
+    """Customer column values from one CSV row (without caller_id)."""
+    return {
+        "user_id": row.get("user_id") or "",
+        "first_name": (row.get("first_name") or "").strip(),
+        "last_name": (row.get("last_name") or "").strip(),
+        "code_name": _parse_bool(row.get("code_name")),
+        "email": row.get("email"),
+        "phone": formatPhoneNr(row.get("phone")),
+        "description_phone": row.get("description_phone"),
+        "location": row.get("location"),
+        "contributes": _parse_int(row.get("contributes")),
+        "comment": row.get("comment"),
+        "sub_caller": row.get("sub_caller"),
+        "organisations": _parse_id_list(row.get("organisations")),
+        "categories": _parse_id_list(row.get("categories")),
+        "personality_type": _parse_int(row.get("personality_type")),
+        "controlled": _parse_bool(row.get("controlled")),
+        "filter_a": _parse_bool(row.get("filter_a")),
+        "filter_b": _parse_bool(row.get("filter_b")),
+        "filter_c": _parse_bool(row.get("filter_c")),
+        "filter_d": _parse_bool(row.get("filter_d")),
+        "filter_e": _parse_bool(row.get("filter_e")),
+        "filter_f": _parse_bool(row.get("filter_f")),
+        "filter_g": _parse_bool(row.get("filter_g")),
+        "filter_h": _parse_bool(row.get("filter_h")),
+        "tags": _parse_tags(row.get("tags")),
+        "extra": {},
+    }
+
+
+# -----------------------------
+# Bulk lookups
+# -----------------------------
+def existing_phones(db: Session) -> set:
+    """Normalized phones of all customers, one query."""
+    return {formatPhoneNr(p) for p in db.execute(select(Customer.phone).where(Customer.phone.isnot(None))).scalars()}
+
+
+def resolve_callers(db: Session, names: Iterable[str], callers: Dict[str, int]) -> Dict[str, int]:
+    """Add ids of names missing from callers (name -> id), creating callers as needed."""
+    missing = sorted(set(names) - callers.keys())
+    if missing:
+        db.execute(insert(Caller), [{"name": name} for name in missing])
+        callers.update({name: id for id, name in db.execute(select(Caller.id, Caller.name).where(Caller.name.in_(missing)))})
+    return callers
+
+
+def resolve_tags(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Tag name -> id, creating missing tags."""
+    names = set(names)
+    if not names:
+        return {}
+    tags = {name: id for id, name in db.execute(select(Tag.id, Tag.name).where(Tag.name.in_(names)))}
+    missing = sorted(names - tags.keys())
+    if missing:
+        db.execute(insert(Tag), [{"name": name} for name in missing])
+        tags.update({name: id for id, name in db.execute(select(Tag.id, Tag.name).where(Tag.name.in_(missing)))})
+    return tags
+
+
+# -----------------------------
+# Import
+# -----------------------------
+def _insert_chunk(db: Session, chunk: List[dict], caller_names: List[Optional[str]], callers: Dict[str, int]):
+    resolve_callers(db, [n for n in caller_names if n], callers)
+    for values, name in zip(chunk, caller_names):
+        values["caller_id"] = callers.get(name) if name else None
+
+    # render_nulls: keep the chunk one executemany batch instead of splitting it by which columns are None
+    ids = db.execute(
+        insert(Customer).returning(Customer.id, sort_by_parameter_order=True).execution_options(render_nulls=True),
+        chunk,
+    ).scalars().all()
+
+    # Junction tables, same values sync_customer_values() writes
+    categories, organisations, tag_links = [], [], []
+    for customer_id, values in zip(ids, chunk):
+        categories += [{"customer_id": customer_id, "value_id": v} for v in customer_values(values["categories"])]
+        organisations += [{"customer_id": customer_id, "value_id": v} for v in customer_values(values["organisations"])]
+        tag_links += [(customer_id, name) for name in customer_values(values["tags"])]
+
+    tags = resolve_tags(db, (name for _, name in tag_links))
+    if categories:
+        db.execute(insert(CustomerCategory), categories)
+    if organisations:
+        db.execute(insert(CustomerOrganisation), organisations)
+    if tag_links:
+        db.execute(insert(CustomerTag), [{"customer_id": c, "value_id": tags[name]} for c, name in tag_links])
+
+    db.commit()
+
+
+def import_customers_csv(
+    db: Session,
+    stream,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Import customers from a text stream with a CSV header row.
+    progress(rows, added) is called after every chunk.
+    Returns {"rows", "added", "duplicates" (phones), "skipped", "seconds", "rows_per_second"}.
+    """
+    start = time.perf_counter()
+    phones = existing_phones(db)
+    callers = {name: id for id, name in db.execute(select(Caller.id, Caller.name))}
+
+    rows = added = skipped = 0
+    duplicates: List[str] = []
+    chunk: List[dict] = []
+    caller_names: List[Optional[str]] = []
+
+    for row in csv.DictReader(stream):
+        rows += 1
+        phone = formatPhoneNr(row.get("phone"))
+        if not phone:
+            skipped += 1
+            continue
+        if phone in phones:
+            duplicates.append(phone)
+            continue
+        phones.add(phone)
+
+        chunk.append(parse_customer_row(row))
+        caller_names.append((row.get("caller_name") or "").strip() or None)
+
+        if len(chunk) >= chunk_size:
+            _insert_chunk(db, chunk, caller_names, callers)
+            added += len(chunk)
+            chunk, caller_names = [], []
+            if progress:
+                progress(rows, added)
+
+    if chunk:
+        _insert_chunk(db, chunk, caller_names, callers)
+        added += len(chunk)
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "added": added,
+        "duplicates": duplicates,
+        "skipped": skipped,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0,
+    }
+
+
+# -----------------------------
+# Background job (core.jobs)
+# -----------------------------
+MAX_LISTED_DUPLICATES = 100  # the job result lists at most this many duplicate phones
+
+
+def import_customers_job(ctx, path: str) -> dict:
+    """Import a CSV file saved by the upload route, then delete it. Progress is in bytes read."""
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as raw:
+            size = os.fstat(raw.fileno()).st_size
+            stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+            def report(rows, added):
+                ctx.progress(raw.tell(), size, f"{rows} rows, {added} added")
+
+            result = import_customers_csv(db, stream, progress=report)
+        ctx.progress(size, size, f"{result['rows']} rows, {result['added']} added")
+    finally:
+        db.close()
+        os.remove(path)
+
+    duplicates = result.pop("duplicates")
+    result["duplicates"] = len(duplicates)
+    result["duplicate_phones"] = duplicates[:MAX_LISTED_DUPLICATES]
+    return result
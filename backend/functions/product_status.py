@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from core.refcache import reference_cache
+from models.models import Customer, Product, ProductCustomer
+
+# -------------------------------------------------
+# Product/customer status totals
+#
+# One GROUP BY status per product (or customer) instead of loading every
+# ProductCustomer row and counting in Python. Totals are cached per product
+# and per customer; a committed ProductCustomer change drops the two
+# entries it touches (session hooks below, so save_call and any other
+# writer are covered). Bulk statements name their rows with the
+# "status_keys" execution option, otherwise the whole cache is dropped.
+#
+# Other workers: every ProductCustomer write also bumps the
+# "product_status" row in cache_versions (core.refcache), and cached
+# totals of an older version are recomputed, so a write in one worker
+# reaches the others within REFCACHE_CHECK_INTERVAL. Raw SQL writers are
+# covered by REFCACHE_MAX_AGE.
+# -------------------------------------------------
+
+STATUS_ROWS_PAGE_SIZE = 100
+TOTALS_CACHE_SIZE = 10000
+STATUS_VERSION = "product_status"
+
+reference_cache.watch(STATUS_VERSION, ProductCustomer)
+
+_cache: "OrderedDict[Tuple[str, int], Tuple[int, float, Dict[str, int]]]" = OrderedDict()  # key -> (version, loaded_at, totals)
+_lock = threading.Lock()
+_generation = 0  # bumped on every invalidation, so a slow read never caches stale totals
+
+
+def empty_totals() -> Dict[str, int]:
+    return {"s1": 0, "s2": 0, "s3": 0, "s4": 0, "s5": 0, "s6": 0, "s7": 0, "all": 0}
+
+
+def _status_totals(db: Session, key: Tuple[str, int]) -> Dict[str, int]:
+    version = reference_cache.version(db, STATUS_VERSION)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1] < reference_cache.max_age:
+            _cache.move_to_end(key)
+            return dict(entry[2])
+        generation = _generation
+
+    kind, id = key
+    column = ProductCustomer.product_id if kind == "product" else ProductCustomer.customer_id
+    rows = db.execute(
+        select(ProductCustomer.status, func.count())
+        .join(Customer, Customer.id == ProductCustomer.customer_id)
+        .where(column == id)
+        .group_by(ProductCustomer.status)
+    ).all()
+
+    totals = empty_totals()
+    for status, count in rows:
+        totals["all"] += count
+        if f"s{status}" in totals:
+            totals[f"s{status}"] = count
+
+    with _lock:
+        if generation != _generation:
+            return dict(totals)
+        _cache[key] = (version, time.monotonic(), totals)
+        _cache.move_to_end(key)
+        while len(_cache) > TOTALS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(totals)
+
+
+def product_status_totals(db: Session, product_id: int) -> Dict[str, int]:
+    """{"s1".."s7", "all"} for one product."""
+    return _status_totals(db, ("product", int(product_id)))
+
+
+def customer_status_totals(db: Session, customer_id: int) -> Dict[str, int]:
+    """{"s1".."s7", "all"} for one customer."""
+    return _status_totals(db, ("customer", int(customer_id)))
+
+
+def invalidate_status_totals(product_id: Optional[int] = None, customer_id: Optional[int] = None):
+    global _generation
+    with _lock:
+        _generation += 1
+        if product_id is not None:
+            _cache.pop(("product", int(product_id)), None)
+        if customer_id is not None:
+            _cache.pop(("customer", int(customer_id)), None)
+
+
+def clear_status_totals():
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
+
+
+# -------------------------------------------------
+# Row listing: only the columns the info tables show, keyset on ProductCustomer.id
+# -------------------------------------------------
+def product_status_rows(
+    db: Session,
+    product_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    status: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: int = STATUS_ROWS_PAGE_SIZE,
+):
+    """
+    One page of ProductCustomer rows for a product or a customer.
+    Returns (rows, next_after); next_after is None on the last page.
+    """
+    query = (
+        select(
+            ProductCustomer.id,
+            ProductCustomer.status,
+            ProductCustomer.type_status,
+            ProductCustomer.customer_id,
+            Customer.first_name,
+            Customer.last_name,
+            Customer.caller_id,
+            Product.name.label("product_name"),
+        )
+        .join(Customer, Customer.id == ProductCustomer.customer_id)
+        .outerjoin(Product, Product.id == ProductCustomer.product_id)
+        .order_by(ProductCustomer.id)
+        .limit(limit + 1)
+    )
+    if product_id is not None:
+        query = query.where(ProductCustomer.product_id == product_id)
+    if customer_id is not None:
+        query = query.where(ProductCustomer.customer_id == customer_id)
+    if status:
+        query = query.where(ProductCustomer.status == status)
+    if after is not None:
+        query = query.where(ProductCustomer.id > after)
+
+    rows: List = db.execute(query).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+# -------------------------------------------------
+# Session hooks: collect touched product/customer ids at flush, drop at commit
+# -------------------------------------------------
+PENDING_KEY = "product_status_changes"
+CLEAR_KEY = "product_status_clear"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_status_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ProductCustomer):
+            session.info.setdefault(PENDING_KEY, set()).add((obj.product_id, obj.customer_id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _watch_bulk_status_writes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        if state.bind_mapper.class_ is not ProductCustomer:
+            return
+        keys = state.execution_options.get("status_keys")
+        if keys is None:
+            state.session.info[CLEAR_KEY] = True
+        else:
+            state.session.info.setdefault(PENDING_KEY, set()).update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_status_totals(session):
+    changes = session.info.pop(PENDING_KEY, ())
+    if session.info.pop(CLEAR_KEY, False):
+        clear_status_totals()
+        return
+    for product_id, customer_id in changes:
+        invalidate_status_totals(product_id, customer_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_status_changes(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(CLEAR_KEY, None)
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import data.constants as constants
+from core.refcache import reference_cache
+from models.models import Caller, Product
+
+# -------------------------------------------------
+# Cached reference sets (core.refcache)
+# Rows, not ORM objects: templates read caller.id / caller.name, product.name, ...
+# -------------------------------------------------
+
+
+def _load_callers(db: Session):
+    return db.execute(select(*Caller.__table__.columns).order_by(Caller.id)).all()
+
+
+def _load_products(db: Session):
+    return db.execute(select(*Product.__table__.columns).order_by(Product.id)).all()
+
+
+reference_cache.register("callers", _load_callers, Caller)
+reference_cache.register("products", _load_products, Product)
+
+
+def get_callers(db: Session) -> List:
+    """All callers (id order)."""
+    return reference_cache.get(db, "callers")
+
+
+def get_products(db: Session) -> List:
+    """All products (id order)."""
+    return reference_cache.get(db, "products")
+
+
+def get_active_products(db: Session) -> List:
+    """Products that ended at most SHOW_PRODUCTS_X_DAYS ago (the calls dashboard list)."""
+    # end_date is stored naive UTC, compare the same way SQLite did
+    start = (datetime.now(timezone.utc) - timedelta(days=constants.SHOW_PRODUCTS_X_DAYS)).replace(tzinfo=None)
+    return [p for p in get_products(db) if p.end_date is not None and p.end_date >= start]
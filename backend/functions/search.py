@@ -0,0 +1,186 @@
+import re
+from typing import List
+from sqlalchemy import text, literal_column, select, or_
+from models.models import Customer
+from functions.customers import user_customers_query
+import data.constants as constants
+
+# -------------------------------------------------
+# Customer full-text search (SQLite FTS5)
+#
+# customers_fts is a standalone FTS5 table keyed on rowid = customers.id,
+# kept in sync by triggers so every write path (ORM, imports, raw SQL) is covered.
+# The phone column holds the digits plus the national/international variant,
+# so "070 123", "+4670123" and "4670123" all prefix-match the same number.
+# -------------------------------------------------
+
+COUNTRY_CODE = "46"
+
+
+def _digits_sql(column: str) -> str:
+    sql = column
+    for ch in ("+", " ", "-", "(", ")", "/", "."):
+        sql = f"replace({sql}, '{ch}', '')"
+    return f"coalesce({sql}, '')"
+
+
+def _phone_sql(column: str) -> str:
+    """SQL expression: digits of the phone number plus its alternate prefix form."""
+    digits = _digits_sql(column)
+    return (
+        f"{digits} || ' ' || CASE"
+        f" WHEN {digits} LIKE '{COUNTRY_CODE}%' THEN '0' || substr({digits}, {len(COUNTRY_CODE) + 1})"
+        f" WHEN {digits} LIKE '0%' THEN '{COUNTRY_CODE}' || substr({digits}, 2)"
+        f" ELSE '' END"
+    )
+
+
+def _row_sql(prefix: str) -> str:
+    """Values for one customers_fts row taken from customers (or NEW./OLD.)."""
+    return (
+        f"{prefix}id, "
+        f"coalesce({prefix}first_name, '') || ' ' || coalesce({prefix}last_name, ''), "
+        f"coalesce({prefix}email, ''), "
+        f"{_phone_sql(prefix + 'phone')}, "
+        f"coalesce({prefix}location, ''), "
+        f"coalesce({prefix}comment, '')"
+    )
+
+
+FTS_COLUMNS = "rowid, name, email, phone, location, comment"
+
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+        name, email, phone, location, comment,
+        prefix = '2 3 4'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN
+        INSERT INTO customers_fts ({FTS_COLUMNS}) VALUES ({_row_sql('NEW.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS customers_fts_update AFTER UPDATE OF
+        first_name, last_name, email, phone, location, comment ON customers BEGIN
+        DELETE FROM customers_fts WHERE rowid = OLD.id;
+        INSERT INTO customers_fts ({FTS_COLUMNS}) VALUES ({_row_sql('NEW.')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS customers_fts_delete AFTER DELETE ON customers BEGIN
+        DELETE FROM customers_fts WHERE rowid = OLD.id;
+    END
+    """,
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS customers_fts_insert",
+    "DROP TRIGGER IF EXISTS customers_fts_update",
+    "DROP TRIGGER IF EXISTS customers_fts_delete",
+    "DROP TABLE IF EXISTS customers_fts",
+]
+
+
+def create_search_index(conn):
+    """Create the FTS table and triggers (idempotent)."""
+    for sql in CREATE_SEARCH_INDEX:
+        conn.execute(text(sql))
+
+
+def drop_search_index(conn):
+    for sql in DROP_SEARCH_INDEX:
+        conn.execute(text(sql))
+
+
+def rebuild_search_index(conn) -> int:
+    """Refill customers_fts from customers. Returns number of indexed customers."""
+    conn.execute(text("DELETE FROM customers_fts"))
+    conn.execute(text(
+        f"INSERT INTO customers_fts ({FTS_COLUMNS}) SELECT {_row_sql('')} FROM customers"
+    ))
+    return conn.execute(text("SELECT count(*) FROM customers_fts")).scalar()
+
+
+def ensure_search_index(engine) -> bool:
+    """
+    Startup hook: create the index if missing and fill it once.
+    Returns True if the index was (re)built.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'"
+        )).first()
+        create_search_index(conn)
+        if exists:
+            return False
+        rebuild_search_index(conn)
+        return True
+
+
+# -------------------------------------------------
+# Query side
+# -------------------------------------------------
+PHONE_QUERY = re.compile(r"^[\d\s+\-()/.]+$")
+
+
+def build_match_query(q: str) -> str | None:
+    """
+    Turn the search box text into an FTS5 MATCH expression.
+    Every word is a prefix term; a phone-like query searches the phone column by digits.
+    """
+    q = (q or "").strip()
+    if not q:
+        return None
+
+    if PHONE_QUERY.match(q):
+        digits = re.sub(r"\D", "", q)
+        if digits:
+            return f'phone : "{digits}"*'
+
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_customers(db, request, user, q: str, limit: int = constants.CUSTOMERS_PAGE_SIZE) -> List[Customer]:
+    """
+    Customers matching q, best match first (bm25),
+    restricted to what the user may see and the active list filter.
+    """
+    query = user_customers_query(db, request, user)
+
+    if db.bind.dialect.name == "sqlite":
+        match = build_match_query(q)
+        if match is None:
+            return []
+
+        fts = (
+            select(literal_column("rowid").label("id"), literal_column("rank").label("rank"))
+            .select_from(text("customers_fts"))
+            .where(text("customers_fts MATCH :match").bindparams(match=match))
+            .subquery()
+        )
+        query = query.join(fts, fts.c.id == Customer.id).order_by(fts.c.rank, Customer.id)
+    else:
+        # No FTS5: plain substring search
+        words = re.findall(r"\w+", q or "")
+        if not words:
+            return []
+        for w in words:
+            pattern = f"%{w}%"
+            query = query.filter(or_(
+                Customer.first_name.ilike(pattern),
+                Customer.last_name.ilike(pattern),
+                Customer.email.ilike(pattern),
+                Customer.phone.ilike(pattern),
+                Customer.location.ilike(pattern),
+            ))
+        query = query.order_by(Customer.first_name, Customer.last_name, Customer.id)
+
+    return query.limit(limit).all()
@@ -23,6 +23,7 @@ from fastapi.responses import HTMLResponse, Response
 
 from starlette.types import ASGIApp, Scope, Receive, Send
 from starlette.middleware.sessions import SessionMiddleware
+from core.sessions import ServerSessionMiddleware, rotate_session
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
@@ -35,10 +36,14 @@ from models.models import Alarm, Customer, Product
 
 from core.database import engine
 from core.auth import get_current_user
-from core.database import get_db, init_admin_user
+from core.database import get_db, get_async_db, init_admin_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import relationship, Session
 
-from core.lang import get_translator
+from core.lang import SUPPORTED_LANGUAGES, compile_catalogs, translation_flusher
 
 
 import logging
@@ -49,86 +54,40 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from core.functions.helpers import local_to_utc, utc_to_local
+from core.functions.helpers import local_to_utc, utc_to_local, recency_shade
 
 
 from core.models.models import BaseMixin, Update, User
-from threading import Lock
 # core/scheduler.py
 import asyncio
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from models.models import Alarm
-from core.database import SessionLocal
+from core.database import AsyncSessionLocal, DB_PROFILE, DB_OPTIMIZE_INTERVAL, optimize_database
+from functions.search import ensure_search_index
+from functions.calls import ensure_save_call_indexes
+from functions.customers import ensure_customer_values
+from functions.bitmap_index import customer_index
+from core.jobs import ensure_job_columns, job_runner
+from core.write_queue import write_queue
+from core.broker import broker
+from core.ws import connections
+from functions.alarms import alarm_scheduler
+from core.leader import leader
 from sqlalchemy import func, or_, and_
 from fastapi.responses import RedirectResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 
-async def alarm_scheduler():
-    logger.info("✅ Alarm.")
-    """Periodically check for alarms and send them via WebSocket."""
+async def maintenance_scheduler():
+    """Periodically refresh SQLite planner statistics (PRAGMA optimize)."""
     while True:
-        await asyncio.sleep(60)  # adjust interval as needed
-
-        db: Session = SessionLocal()
-        now = datetime.now(timezone.utc)
-        logger.info(f"Scheduler running at {now.isoformat()} utc")
+        await asyncio.sleep(DB_OPTIMIZE_INTERVAL)
         try:
-            due_alarms = (
-                db.query(Alarm)
-                .filter(Alarm.date >= now)  # product not passed
-                .filter(
-                    or_(
-                        # First reminder: send only if reminder time reached and not yet sent
-                        and_(
-                            Alarm.reminder <= now,           # current time reached reminder
-                            Alarm.reminder_sent.is_(None)    # first reminder not sent
-                        ),
-
-                        # Second reminder: 30 minutes before event, only if first reminder sent
-                        and_(
-                            Alarm.date - timedelta(minutes=30) <= now,     # 30 min before event
-                            Alarm.reminder_sent.isnot(None),               # first reminder already sent
-                            Alarm.reminder_sent < (Alarm.date - timedelta(minutes=30))  # second reminder not sent yet
-                        )
-                    )
-                )
-                .all()
-            )
-
-            for alarm in due_alarms:
-
-                caller_id = alarm.caller_id
-                users = db.query(User).filter(User.caller_id == caller_id).all()
-
-                for user in users:
-
-                    if not user:
-                        continue
-                
-                    logger.info("✅ Send Alarm.")
-
-                    payload = {
-                        "type": "alarm",
-                        "customer": f"{alarm.customer.first_name} {alarm.customer.last_name}",
-                        "note": alarm.note,
-                        "date": alarm.date.isoformat(),
-                    }
-
-                    for ws in active_connections.get(str(user.id), []):
-                        try:
-                            await ws.send_json(payload)
-                            alarm.reminder_sent = now
-                            db.commit()
-                        except Exception as e:
-                            print(f"WebSocket send failed for {user.id}: {e}")
-
-
+            await asyncio.to_thread(optimize_database)
+            logger.info("✅ PRAGMA optimize done.")
         except Exception as e:
-            print("Scheduler error:", e)
-        finally:
-            db.close()
+            print("Maintenance error:", e)
 
 
 
@@ -140,24 +99,12 @@ SESSION_SECRET = "super-secret-key"
 JWT_SECRET_KEY = "supersecret-jwt-key" # dublicated in calls.py TODO
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1
-SUPPORTED_LANGUAGES = ["sv"]
 
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-_translators_cache = {}
-_cache_lock = Lock()
-
-def get_translator_cached(lang_code: str):
-    """Return a translator for lang_code, caching it globally."""
-    # Use lock for thread safety
-    with _cache_lock:
-        if lang_code not in _translators_cache:
-            _translators_cache[lang_code] = get_translator(lang_code)
-        return _translators_cache[lang_code]
-
 # --- FastAPI app setup ---
 app = FastAPI(title="HTMX + Alpine.js Prototype", debug=True)
 
@@ -195,10 +142,9 @@ class LanguageMiddleware:
             if not lang_code:
                 accept_language = request.headers.get("accept-language", "")
                 lang_code = get_best_language_match(accept_language, SUPPORTED_LANGUAGES)
-                request.session["lang_code"] = lang_code
-
-            # Load translator from cache (thread-safe)
-            templates.env.filters["t"] = get_translator_cached(lang_code)
+            # per request, not in the session: a cookieless request must not create a session row
+            scope["lang_code"] = lang_code
+            # templates translate with this language through lang_context (core.lang)
 
         await self.app(scope, receive, send)
 
@@ -206,8 +152,9 @@ class LanguageMiddleware:
 app.add_middleware(LanguageMiddleware)
 
 
+# Session data lives server side (web_sessions), the cookie only holds the id
 app.add_middleware(
-    SessionMiddleware,
+    ServerSessionMiddleware,
     secret_key=SESSION_SECRET,
     session_cookie="session",
     https_only=True,
@@ -239,8 +186,53 @@ def on_startup():
     # Create all tables
     Base.metadata.create_all(bind=engine)
     init_admin_user()
+    if ensure_job_columns(engine):
+        logger.info("✅ Added jobs holder/heartbeat columns.")
+    interrupted = job_runner.mark_interrupted()
+    if interrupted:
+        logger.info(f"✅ Marked {interrupted} unfinished jobs as interrupted.")
+    if ensure_search_index(engine):
+        logger.info("✅ Built customer search index.")
+    if ensure_save_call_indexes(engine):
+        logger.info("✅ Created save_call unique indexes.")
+    backfilled = ensure_customer_values(engine)
+    if backfilled:
+        logger.info(f"✅ Filled customer value tables ({backfilled} links).")
+    customer_index.start_build()
     logger.info("✅ Set up Alarms.")
-    asyncio.create_task(alarm_scheduler())
+    alarm_scheduler.attach()
+    leader.add(alarm_scheduler.start, alarm_scheduler.stop)
+    leader.add_loop(job_runner.sweep)
+
+    if DB_PROFILE != "default":
+        logger.info(f"✅ Storage profile '{DB_PROFILE}', optimize every {DB_OPTIMIZE_INTERVAL}s.")
+        leader.add_loop(maintenance_scheduler)
+
+    broker.start()
+    logger.info(f"✅ Broker: {broker.name}.")
+
+    if write_queue.enabled:
+        write_queue.start()
+        logger.info(f"✅ Write queue: group commit every {write_queue.batch_ms} ms / {write_queue.batch_size} units.")
+
+    logger.info(f"✅ Compiled {compile_catalogs()} translations.")
+    translation_flusher.start()
+
+    if TEMPLATE_MODE == "production":
+        logger.info(f"✅ Precompiled {precompile_templates()} templates.")
+
+    # Background loops above run only on the elected worker
+    leader.start()
+    logger.info(f"✅ Leader election as {leader.holder}, lease {leader.ttl}s.")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await leader.stop()
+    await write_queue.stop()
+    await connections.stop()
+    await broker.stop()
+    await translation_flusher.stop()
 
 from pathlib import Path
 
@@ -255,8 +247,7 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 
 # Jinja2 templates (HTML pages/fragments)
-from templates import templates
-from state import user_data, active_connections
+from templates import templates, TEMPLATE_MODE, precompile_templates
 
 # --- Routers ---
 # Routers should be defined in /routers/*.py and included here.
@@ -281,6 +272,7 @@ from fastapi.responses import RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 
 templates.env.filters["date"] = utc_to_local
+templates.env.filters["recency_shade"] = recency_shade
 templates.env.globals["now"] = lambda: datetime.now(timezone.utc)
 templates.env.globals["timedelta"] = timedelta
 
@@ -334,7 +326,7 @@ async def login_get(request: Request):
 
 # --- Routes ---
 @app.post("/login")
-async def login_post(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+async def login_post(request: Request, username: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
 
     lang_code = request.cookies.get("lang_code")
     if not lang_code:
@@ -348,11 +340,14 @@ async def login_post(request: Request, username: str = Form(...), password: str
 #            _translators_cache[lang_code] = get_translator(lang)
 #        templates.env.filters["t"] = get_translator_cached(lang)
 
-    user = db.query(User).filter(User.username == username).first()
-    if user and user.verify_password(password):
+    result = await db.execute(select(User).filter(User.username == username))
+    user = result.scalars().first()
+    # bcrypt is deliberately slow, keep it off the event loop
+    if user and await run_in_threadpool(user.verify_password, password):
         request.session["authenticated"] = True
         request.session["admin"] = user.admin
         request.session["user"] = user.id
+        rotate_session(request)  # new id: the pre-login one may be known to others
         return RedirectResponse(url="/", status_code=303)
 
     return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
@@ -374,7 +369,6 @@ def get_ws_token(request: Request):
 async def logout(request: Request):
 
     request.session.clear()
-    _translators_cache.clear()
 
     return templates.TemplateResponse(
         "login.html",
@@ -414,13 +408,6 @@ async def create_user(
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request, user = Depends(get_current_user)):
 
-    lang_code = request.cookies.get("lang_code")
-    if not lang_code:
-        accept_language = request.headers.get("accept-language", "")
-        lang_code = get_best_language_match(accept_language, SUPPORTED_LANGUAGES)
-
-    templates.env.filters["t"] = get_translator_cached(lang_code)
-
     user = request.session.get("user")  # optional, might be None
     if user:
         # Already logged in → redirect to dashboard
@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker# Base class for models
-from sqlalchemy import Column, Integer, DateTime, String, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, DateTime, String, ForeignKey, JSON, Boolean, Index, func
 from sqlalchemy import JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import sqltypes as satypes
@@ -45,6 +45,15 @@ class Alarm(BaseMixin, Base):
     note = Column(String, nullable=True)
     extra = Column(MutableDict.as_mutable(JSON), default=dict)
 
+# One alarm per caller, customer and product (NULL product counted as one): save_call upserts on it
+Index(
+    "uq_alarms_customer_caller_product",
+    Alarm.customer_id, Alarm.caller_id, func.coalesce(Alarm.product_id, 0),
+    unique=True,
+)
+# Alarm scheduler start-up load: alarms not passed yet (functions.alarms)
+Index("ix_alarms_date", Alarm.date)
+
 
 # -------------------------------------------------
 # Customer Model (SQLAlchemy ORM)
@@ -84,6 +93,51 @@ class Customer(BaseMixin, Base):
     tags = Column(JSON, default=[])
     extra = Column(MutableDict.as_mutable(JSON), default=dict)
 
+    # Indexed copies of categories / organisations / tags, see sync_customer_values()
+    category_values = relationship("CustomerCategory", cascade="all, delete-orphan")
+    organisation_values = relationship("CustomerOrganisation", cascade="all, delete-orphan")
+    tag_values = relationship("CustomerTag", cascade="all, delete-orphan")
+
+# Customer list sort order (+ id as tiebreaker), used for keyset pagination
+Index(
+    "ix_customers_name_nocase",
+    Customer.first_name.collate("NOCASE"),
+    Customer.last_name.collate("NOCASE"),
+    Customer.id,
+)
+
+# -------------------------------------------------
+# Customer value junction tables
+# One row per customer and value, (value_id, customer_id) index serves filters
+# -------------------------------------------------
+class CustomerCategory(Base):
+    __tablename__ = "customer_categories"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    value_id = Column(String, primary_key=True)  # item id from categories.json, e.g. "i1"
+
+    __table_args__ = (Index("ix_customer_categories_value", "value_id", "customer_id"),)
+
+
+class CustomerOrganisation(Base):
+    __tablename__ = "customer_organisations"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    value_id = Column(String, primary_key=True)  # id from organisations.json, as string
+
+    __table_args__ = (Index("ix_customer_organisations_value", "value_id", "customer_id"),)
+
+
+class CustomerTag(Base):
+    __tablename__ = "customer_tags"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    value_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    tag = relationship("Tag")
+
+    __table_args__ = (Index("ix_customer_tags_value", "value_id", "customer_id"),)
+
+
 class CustomerUpdate(BaseModel):
     first_name: str
     last_name: str
@@ -246,6 +300,11 @@ class Call(BaseMixin, Base):
     note = Column(String, nullable=False)
     extra = Column(MutableDict.as_mutable(JSON), default=dict)
 
+# Per-customer call lookups: MAX(call_date) for last_call_date, call history
+Index("ix_calls_customer_date", Call.customer_id, Call.call_date, Call.status)
+# Call panel keyset pages: newest calls of a customer by id
+Index("ix_calls_customer_id", Call.customer_id, Call.id)
+
 
 class CallUpdate(BaseModel):
     id: Optional[str] = None
@@ -275,6 +334,12 @@ class ProductCustomer(BaseMixin, Base):
     order_date = Column(DateTime, nullable=True)
     extra = Column(MutableDict.as_mutable(JSON), default=dict)
 
+# One row per customer and product: save_call upserts on it
+Index("uq_product_customers_customer_product", ProductCustomer.customer_id, ProductCustomer.product_id, unique=True)
+# Status totals (GROUP BY status) and keyset listing per product / per customer
+Index("ix_product_customers_product_status", ProductCustomer.product_id, ProductCustomer.status, ProductCustomer.id)
+Index("ix_product_customers_customer_status", ProductCustomer.customer_id, ProductCustomer.status, ProductCustomer.id)
+
 #
 
 class Caller(BaseMixin, Base):
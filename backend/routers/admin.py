@@ -3,6 +3,18 @@ from io import StringIO
 from fastapi import UploadFile, Form, File
 from models.models import Customer, Call, Product, Caller
 from core.functions.helpers import formatPhoneNr
+from functions.importer import import_customers_job
+from core.jobs import job_runner, ACTIVE_STATUSES
+from core.write_queue import write_queue
+from core.ws import connections
+from functions.export import EXPORT_FORMATS, stream_export, customers_export, calls_export, product_customers_export
+from functions.customers import user_customer_criteria
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import os
+import tempfile
+import threading
+import shutil
 import json
 from typing import List, Union
 
@@ -27,7 +39,8 @@ from pydantic import BaseModel, Field
 
 from datetime import datetime
 
-from core.database import get_db   
+from core.database import get_db, get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from templates import templates
 from core.database import engine
 from core.models.base import Base
@@ -38,6 +51,9 @@ import subprocess
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Seconds a script job may run before it is killed and the job failed
+JOB_SCRIPT_TIMEOUT = float(os.environ.get("JOB_SCRIPT_TIMEOUT", "600"))
+
 
 # Whitelist of scripts admins can run
 ALLOWED_SCRIPTS = {
@@ -45,6 +61,8 @@ ALLOWED_SCRIPTS = {
     "stats": "/app/backend/scripts/generate_stats.py",
 #    "test_data": "/app/backend/scripts/generate_test_data.py",
     "inspect_db": "/app/backend/scripts/inspect_db.py",    
+    "rebuild_search_index": "/app/backend/scripts/rebuild_search_index.py",
+    "recompute_last_call": "/app/backend/scripts/recompute_last_call.py",
 }
 
 SCRIPT_EXAMPLES = {
@@ -66,6 +84,14 @@ SCRIPT_EXAMPLES = {
     ],
     "inspect_db": [
         "--database DATABASE [--limit LIMIT] [--filter FILTER]Visa databasdump<br>" 
+    ],
+    "rebuild_search_index": [
+        "Bygg om sökindexet för kunder<br>",
+        "Skapa om söktabell och triggers och bygg om<br>--recreate"
+    ],
+    "recompute_last_call": [
+        "Räkna om senaste samtalsdatum för alla kunder<br>--all",
+        "Räkna om för en kund<br>--customer 12"
     ]
 }
 
@@ -103,12 +129,72 @@ def clean_output(raw_output: str) -> str:
     return "\n".join(cleaned).strip()
 
 
+def script_job(ctx, script_name: str, args: str) -> dict:
+    """Run a whitelisted script (background job), streaming its output lines."""
+    arg_list = shlex.split(args) if args.strip() else ["--help"]
+    command = ["python", ALLOWED_SCRIPTS[script_name]] + arg_list
+
+    ctx.log(f"Running {script_name} {args}\n")
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,   # an interactive prompt gets EOF instead of waiting
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    # Kill a hung script: it would hold a job worker (and its heartbeat) forever
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(JOB_SCRIPT_TIMEOUT, kill)
+    timer.start()
+    last_line = ""
+    lines = 0
+    try:
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            if line.strip():
+                last_line = line
+            if clean_output(line):
+                ctx.log(line)
+            lines += 1
+            ctx.progress(lines)
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+    ctx.log(f"\n[exit code: {returncode}]")
+
+    result = {"exit_code": returncode, "failed": returncode != 0}
+    if timed_out.is_set():
+        ctx.message = f"Timed out after {JOB_SCRIPT_TIMEOUT:g}s"
+        ctx.log(f"[{ctx.message}]")
+        result["timed_out"] = True
+    # --- Detect JSON message from script ---
+    try:
+        info = json.loads(last_line)
+        if isinstance(info, dict) and info.get("html_created"):
+            result["output_path"] = info.get("output_path", "/static/output.html")
+    except json.JSONDecodeError:
+        pass
+    return result
+
+
+def job_response(request: Request, job_id: int):
+    return templates.TemplateResponse(
+        "admin/job_status.html",
+        {"request": request, "job": job_runner.get(job_id), "active_statuses": ACTIVE_STATUSES},
+    )
+
+
 @router.post("/script", response_class=HTMLResponse)
 async def run_admin_script(
     request: Request,
     script_name: str = Form(...),
     args: str = Form(""),
-    db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
     if user.admin <= 0:
@@ -117,47 +203,47 @@ async def run_admin_script(
     if script_name not in ALLOWED_SCRIPTS:
         return HTMLResponse("Invalid script", status_code=400)
 
-    script_path = ALLOWED_SCRIPTS[script_name]
-
-    try:
-        arg_list = shlex.split(args) if args.strip() else ["--help"]
-        command = ["python", script_path] + arg_list
-
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=20,
-        )
-
-        raw_output = (result.stdout or "") + (result.stderr or "")
-        output = f"Running {script_name} {args}\n\n"
-        output += clean_output(raw_output)
-        output += f"\n\n[exit code: {result.returncode}]"
+    # Runs in the background, the response polls /admin/jobs/{id}
+    job_id = await run_in_threadpool(
+        job_runner.submit, "script", f"{script_name} {args}".strip(), script_job, script_name, args, user_id=user.id
+    )
+    return job_response(request, job_id)
 
-    except Exception as e:
-        output = f"Running {script_name} {args}\n\n"
-        output += f"⚠️ Error running script: {e}"
 
+# -----------------------------
+# Background jobs (core.jobs)
+# -----------------------------
+@router.get("/jobs", response_class=HTMLResponse, name="admin_jobs")
+async def admin_jobs(request: Request, user=Depends(get_current_user)):
+    if user.admin <= 0:
+        return HTMLResponse("Access denied", status_code=403)
 
-    html_output = None
+    jobs = await run_in_threadpool(job_runner.recent)
+    return templates.TemplateResponse("admin/jobs.html", {"request": request, "jobs": jobs})
 
-    # --- Detect JSON message from script ---
-    try:
-        last_line = raw_output.strip().splitlines()[-1]
-        info = json.loads(last_line)
-        if info.get("html_created"):
-            output_path = info.get("output_path", "/static/output.html")
-            html_output = f'<iframe src="{output_path}" class="w-full h-[600px] border rounded-xl mt-4" style="height:100vh"></iframe>'
-    except json.JSONDecodeError:
-        print("Error")
 
+@router.get("/jobs/{job_id}", response_class=HTMLResponse, name="admin_job_status")
+def admin_job_status(request: Request, job_id: int, user=Depends(get_current_user)):
+    job = job_runner.get(job_id)
+    if job is None:
+        return HTMLResponse("Job not found", status_code=404)
+    if user.admin <= 0 and job.user_id != user.id:
+        return HTMLResponse("Access denied", status_code=403)
     return templates.TemplateResponse(
-        "admin/script_output.html",
-        {"request": request, "output": output, "html_output": html_output, "scripts": ALLOWED_SCRIPTS, "script_examples": SCRIPT_EXAMPLES},
+        "admin/job_status.html", {"request": request, "job": job, "active_statuses": ACTIVE_STATUSES}
     )
 
 
+# -----------------------------
+# Runtime metrics (JSON)
+# -----------------------------
+@router.get("/metrics", name="admin_metrics")
+def admin_metrics(user=Depends(get_current_user)):
+    if user.admin <= 0:
+        return JSONResponse({"detail": "Access denied"}, status_code=403)
+    return JSONResponse({"write_queue": write_queue.metrics(), "websockets": connections.metrics()})
+
+
 # -----------------------------
 # List Dashboard (HTMX fragment)
 # -----------------------------
@@ -175,123 +261,6 @@ def admin_dashboard(
     )
 
 
-import json
-
-def create_customer_from_row(row: dict, db):
-    """
-    Create a new Customer instance from a row dict.
-    Safely handles missing, boolean, and JSON fields.
-    """
-
-    def _parse_json_field(value):
-        """Parse JSON-like fields (list or dict), return default if invalid."""
-        import json
-        if not value:
-            return []
-        if isinstance(value, (list, dict)):
-            return value
-        try:
-            return json.loads(value)
-        except Exception:
-            return []
-
-    def _parse_bool(value):
-        """Convert various truthy strings to bool."""
-        if isinstance(value, bool):
-            return value
-        if value is None:
-            return False
-        return str(value).strip().lower() in ["true", "1", "yes", "y", "t"]
-
-    def _parse_tags(value):
-        """Comma-separated tags"""
-        if not value:
-            return []
-        return [v.strip().strip('"').strip("'") for v in value.split(",") if v.strip()]
-
-    def _parse_id_list(value):
-        """
-        Parse CSV field into a list of string IDs.
-        Accepts:
-        - JSON array: '["1","2","3"]' or '[1,2,3]'
-        - Comma-separated list: '1,2,3'
-        - Single ID: '5'
-        - Empty/None -> []
-        Returns: list of strings, e.g. ["1", "2", "3"]
-        """
-        if not value:
-            return []
-
-        # Already a list or tuple
-        if isinstance(value, (list, tuple)):
-            return [str(v).strip() for v in value if str(v).strip()]
-
-        s = str(value).strip()
-        if not s:
-            return []
-
-        # Try JSON decode
-        try:
-            parsed = json.loads(s)
-            if isinstance(parsed, (list, tuple)):
-                return [str(v).strip() for v in parsed if str(v).strip()]
-            elif parsed is not None:
-                return [str(parsed).strip()]
-            return []
-        except Exception:
-            # Fallback to comma-separated list
-            parts = [p.strip() for p in s.split(",") if p.strip()]
-            return [str(p) for p in parts]
-            
-# --- Caller handling ---
-    caller = None
-    caller_name = row.get("caller_name")
-    if caller_name:
-        caller_name = caller_name.strip()
-        if caller_name:
-            caller = db.query(Caller).filter(Caller.name == caller_name).first()
-            if not caller:
-                caller = Caller(name=caller_name)
-                db.add(caller)
-                db.commit()
-                db.refresh(caller)
-
-    new_customer = Customer(
-        user_id=row.get("user_id") or "",
-        first_name=row.get("first_name", "").strip(),
-        last_name=row.get("last_name", "").strip(),
-        code_name=_parse_bool(row.get("code_name")),
-        email=row.get("email"),
-        phone=formatPhoneNr(row.get("phone")),
-        description_phone=row.get("description_phone"),
-        location=row.get("location"),
-        contributes=int(row.get("contributes") or 0) or None,
-        previous_caller=_parse_json_field(row.get("previous_caller")),
-        previous_categories=_parse_json_field(row.get("previous_categories")),
-        comment=row.get("comment"),
-        sub_caller=row.get("sub_caller"),
-        organisations=_parse_id_list(row.get("organisations")),
-        filters=_parse_id_list(row.get("filters")),
-        categories=_parse_id_list(row.get("categories")),
-        personality_type=int(row.get("personality_type") or 0) or None,
-        controlled=_parse_bool(row.get("controlled")),
-        filter_a=_parse_bool(row.get("filter_a")),
-        filter_b=_parse_bool(row.get("filter_b")),
-        filter_c=_parse_bool(row.get("filter_c")),
-        filter_d=_parse_bool(row.get("filter_d")),
-        filter_e=_parse_bool(row.get("filter_e")),
-        filter_f=_parse_bool(row.get("filter_f")),
-        filter_g=_parse_bool(row.get("filter_g")),
-        filter_h=_parse_bool(row.get("filter_h")),
-        tags=_parse_tags(row.get("tags")),
-        extra=row.get("extra") if isinstance(row.get("extra"), dict) else {},
-         # --- Caller link ---
-        caller_id=caller.id if caller else None,
-        caller=caller,        
-    )
-
-    return new_customer
-
 @router.get("/import", response_class=HTMLResponse, name="admin_import")
 def admin_import(
     request: Request,
@@ -306,53 +275,80 @@ async def import_customers(
     request: Request,
     csv_text: str = Form(""),
     csv_file: UploadFile = File(None),
-    db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    content = ""
-
-    # 1️⃣ Read content from either upload or text
-    if csv_file:
-        content = (await csv_file.read()).decode("utf-8")
-    elif csv_text.strip():
-        content = csv_text.strip()
-    else:
-        return templates.TemplateResponse(
-            "partials/message.html",
-            {"request": request, "message": "No CSV data provided."},
-        )
+    if not (csv_file and csv_file.filename) and not csv_text.strip():
+        return HTMLResponse("<p>No CSV data provided.</p>")
+
+    def start_import() -> int:
+        # The upload is gone after the response, keep a copy for the job (deleted when done)
+        fd, path = tempfile.mkstemp(prefix="import-", suffix=".csv")
+        with os.fdopen(fd, "wb") as f:
+            if csv_file and csv_file.filename:
+                shutil.copyfileobj(csv_file.file, f)
+            else:
+                f.write(csv_text.strip().encode("utf-8"))
+        label = csv_file.filename if csv_file and csv_file.filename else "pasted CSV"
+        return job_runner.submit("import", label, import_customers_job, path, user_id=user.id)
+
+    job_id = await run_in_threadpool(start_import)
+    return job_response(request, job_id)
 
-    # 2️⃣ Parse CSV
-    reader = csv.DictReader(StringIO(content))
-    added, duplicates = [], []
-
-    for row in reader:
-        phone = formatPhoneNr(row.get("phone", ""))
-        if not phone:
-            continue
-
-        existing = db.query(Customer).filter(Customer.phone == phone).first()
-        if existing:
-            duplicates.append(phone)
-            continue
+# -----------------------------
+# Streaming export (CSV / NDJSON)
+# -----------------------------
+@router.get("/export", response_class=HTMLResponse, name="admin_export")
+def admin_export(
+    request: Request,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    products = db.execute(select(Product.id, Product.name).order_by(Product.name)).all()
+    return templates.TemplateResponse(
+        "admin/export.html",
+        {"request": request, "products": products, "formats": EXPORT_FORMATS,
+         "customer_filters": request.session.get("customer_filters", {})},
+    )
 
-        # Create new customer record
-        new_customer = create_customer_from_row(row, db)
 
-        db.add(new_customer)
-        added.append(phone)
+@router.get("/export/{entity}", name="admin_export_entity")
+def export_entity(
+    request: Request,
+    entity: str,
+    format: str = Query("csv"),
+    date_from: str = Query(""),   # YYYY-MM-DD, empty = open range (plain form fields)
+    date_to: str = Query(""),
+    product_id: str = Query(""),
+    user=Depends(get_current_user),
+):
+    if user.admin <= 0:
+        return HTMLResponse("Access denied", status_code=403)
+    if format not in EXPORT_FORMATS:
+        return HTMLResponse("Invalid format", status_code=400)
+    try:
+        date_from = date.fromisoformat(date_from) if date_from else None
+        date_to = date.fromisoformat(date_to) if date_to else None
+        product_id = int(product_id) if product_id else None
+    except ValueError:
+        return HTMLResponse("Invalid date or product", status_code=400)
+
+    if entity == "customers":
+        # Same customers as the list: session filter from /customers/set_filter
+        query = customers_export(user_customer_criteria(request, user, engine.dialect.name))
+    elif entity == "calls":
+        query = calls_export(date_from, date_to)
+    elif entity == "product_customers":
+        query = product_customers_export(product_id)
+    else:
+        return HTMLResponse("Unknown export", status_code=404)
 
-    db.commit()
+    filename = f"{entity}-{datetime.now().strftime('%Y%m%d-%H%M')}.{format}"
+    return StreamingResponse(
+        stream_export(query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    # 3️⃣ Return summary (render partial)
-    summary_html = f"""
-    <div class='p-2 bg-gray-100 rounded'>
-      <p><strong>Added:</strong> {len(added)} customers</p>
-      <p><strong>Duplicates skipped:</strong> {len(duplicates)}</p>
-      {("<p>Duplicate phones:</p><ul>" + "".join(f"<li>{p}</li>" for p in duplicates) + "</ul>") if duplicates else ""}
-    </div>
-    """
-    return HTMLResponse(summary_html)
 
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
@@ -15,6 +15,7 @@ from templates import templates
 from models.models import Customer, Call, Product, Caller
 from core.functions.helpers import render
 from functions.customers import get_selected_ids, get_customers, get_user_customers, SelectedIDs
+from functions.reference import get_callers
 
 
 router = APIRouter(prefix="/calls", tags=["calls"])
@@ -31,7 +32,7 @@ def create_caller(name: str, db: Session = Depends(get_db)):
 # List Callers
 @router.get("/admin/callers")
 def list_callers(db: Session = Depends(get_db)):
-    return db.query(Caller).all()
+    return [caller._asdict() for caller in get_callers(db)]
 
 # Delete Caller
 @router.delete("/admin/callers/{caller_id}")
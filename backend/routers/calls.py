@@ -3,7 +3,10 @@
 from fastapi import APIRouter, Depends, Request, Form, Query, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
 from datetime import datetime, timedelta
 from typing import List, Optional
 from pydantic import BaseModel, Field
@@ -11,7 +14,8 @@ from datetime import datetime, timezone
 import zoneinfo
 import data.constants as constants
 
-from core.database import get_db
+from core.database import get_db, get_async_db
+from core.write_queue import run_write
 from templates import templates
 from core.functions.helpers import local_to_utc, utc_to_local
 
@@ -19,9 +23,13 @@ from core.functions.helpers import local_to_utc, utc_to_local
 from models.models import Customer, Call, Product, ProductCustomer, Caller, Alarm
 from core.functions.helpers import render
 from functions.customers import get_selected_ids, get_customers, SelectedIDs
+from functions.customers import LAST_CALL_STATUSES, touch_last_call_date
+from functions.calls import customer_workspace, customer_calls_page, alarm_upsert, product_customer_upsert
+from functions.reference import get_products, get_active_products
+from functions.dialer import dialer_queue
 
 import data.constants as constants
-from core.auth import get_current_user
+from core.auth import get_current_user, get_current_user_async
 
 
 
@@ -49,16 +57,8 @@ def call_center_dashboard(
 #    query = db.query(Call)
 #    calls = query.all()
 
-    # list all that has not ended now() - 30 days
-
-    product_date_filter_start = datetime.now(timezone.utc) - timedelta(days=constants.SHOW_PRODUCTS_X_DAYS)
-
-    query = db.query(Product)
-    if product_date_filter_start:
-        query = query.where(Product.end_date >= product_date_filter_start)
-    products = db.execute(query).scalars().all()
-
-    products = query.all()
+    # list all that has not ended now() - SHOW_PRODUCTS_X_DAYS days (cached reference set)
+    products = get_active_products(db)
 
     return render(
         "calls/dashboard.html",
@@ -94,8 +94,7 @@ def call_poducts_list(
     user = Depends(get_current_user)
 ):
     
-    query = db.query(Product)
-    products = query.all()
+    products = get_products(db)
 
     return render(
         "calls/products_list.html",
@@ -108,50 +107,31 @@ def call_poducts_list(
 # -----------------------------
 
 from sqlalchemy import desc
-from state import user_data, active_connections
+from state import user_data
+from core.ws import push, connections
 from core.models.models import BaseMixin, Update, User
 
 @router.get("/customer_data", name="customer_data", response_class=HTMLResponse, response_model=None)
 async def customer_data(
     request: Request,
     customer_id: int = Query(default=0),
-    db = Depends(get_db),
-    user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
 ):
     
     user_id = user.id
 
-    customer = db.query(Customer).filter(Customer.id == int(customer_id)).first()
+    customer, calls, next_before = await customer_workspace(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
     # !Websocket Server to frontend 
-    user_data.setdefault(user_id, {})["type"] = "customer_info"
-    user_data.setdefault(user_id, {})["name"] = customer.first_name + " " + customer.last_name
-    user_data.setdefault(user_id, {})["number"] = customer.phone
-    # Broadcast name and number to all connected Websockets frontend
-    to_remove = []
-    for ws in active_connections.get(str(user_id), []):
-        try:
-            await ws.send_json(user_data[user_id])
-        except RuntimeError:
-            to_remove.append(ws)
-    for ws in to_remove:
-        active_connections[user_id].remove(ws)
-
-    customer = (
-        db.query(Customer)
-        .filter(Customer.id == customer_id)
-        .first()
-    )
-    
-    callers = (
-        db.query(Caller)
-        .all()
-    )    
-
-    # Limit to 50 calls
-    calls = db.query(Call).filter(Call.customer_id == int(customer_id)).order_by(desc(Call.id)).limit(50).all()
+    # Broadcast name and number to all connected Websockets frontend (any worker)
+    await push(user_id, {
+        "type": "customer_info",
+        "name": customer.first_name + " " + customer.last_name,
+        "number": customer.phone,
+    })
 
     return templates.TemplateResponse(
         "calls/customer_calls.html",
@@ -162,36 +142,13 @@ async def customer_data(
             "organisations_map": constants.organisations_map, 
             "filters_map": constants.filters_map, 
             "personalities_map": constants.personalities_map, 
-            "callers": callers,
-            "customer": customer,
-            "calls": calls
+            "calls": calls,
+            "customer_id": customer.id,
+            "next_before": next_before,
         }
     )
 
 
-# -----------------------------
-# List Calls (HTMX fragment)
-# -----------------------------
-
-
-@router.get("/customer/{customer_id}", response_class=HTMLResponse)
-def customer_calls(
-    request: Request,
-    customer_id: str,
-    list: str | None = Query(default=None),
-    db: Session = Depends(get_db)
-):
-
-    # Capture all query parameters as a dict
-    query_params = dict(request.query_params)
-
-    calls = db.query(Call).filter(Call.caller_id == int(customer_id)).all()
-
-    return templates.TemplateResponse(
-        "calls/call_log.html",
-        {"request": request, "calls": calls},
-    )
-
 @router.get("/", response_class=HTMLResponse, name="products_list")
 def products_list(
     request: Request,
@@ -222,6 +179,47 @@ def number(
     )
 
 
+@router.get("/next", name="next_customer")
+async def next_customer(
+    request: Request,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """
+    Next customer to ring from the caller's dialer queue (functions.dialer),
+    shown on calls/number.html and every other socket of the user.
+    """
+    if user.caller_id is None:
+        return JSONResponse(status_code=400, content={"detail": "User is not a caller"})
+
+    def pop():
+        while True:
+            customer_id = dialer_queue.next(db, user.caller_id)
+            customer = db.get(Customer, customer_id) if customer_id is not None else None
+            if customer is None or customer.caller_id == user.caller_id:
+                return customer_id, customer
+            # moved to another caller by a write the queue has not seen: re-read it, pop again
+            dialer_queue.mark([customer_id])
+
+    customer_id, customer = await run_in_threadpool(pop)
+    if customer_id is None:
+        return JSONResponse(content={"detail": "No customers"})
+    if customer is None:
+        # deleted since the queue read it
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    await push(user.id, {
+        "type": "customer_info",
+        "name": customer.first_name + " " + customer.last_name,
+        "number": customer.phone,
+    })
+    return JSONResponse(content={
+        "customer_id": customer.id,
+        "first_name": customer.first_name,
+        "last_name": customer.last_name,
+        "phone": customer.phone,
+    })
+
 
 # ---------------------------
 # Call Details
@@ -272,125 +270,45 @@ async def save_call(
     request: Request,
     update_data: Update,
     comment: str | None = Query(None),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
 ):
-    
-    product_id = update_data.product_id
+    """
+    Save the customer comment, alarm, product status and call in one
+    transaction (one commit, or part of a group commit with WRITE_QUEUE=1).
+    Alarm and ProductCustomer are native upserts.
+    """
+    dialect = db.bind.dialect.name
+    now = datetime.now(timezone.utc)
+
+    customer_id = update_data.customer_id
+    product_id = getattr(update_data, "product_id", None) or None  # "" = no product
     product_status = getattr(update_data, "product_status", None)
     product_type_status = getattr(update_data, "product_type_status", None)
-    customer_id = update_data.customer_id
     status = getattr(update_data, "status", None)
     call_id = getattr(update_data, "call_id", None)
-
-
-    # update customer comment
     customer_comment = getattr(update_data, "customer_comment", None)
-    customer = db.query(Customer).filter_by(
-        id=customer_id
-    ).first()
-    customer.comment = customer_comment
-
-    if (status == "1" or status == "3"): #1 and 3 is hardcoded for answer/extrnal
-        # Ensure extra is a dict
-        if customer.extra is None:
-            customer.extra = {}
-        customer.last_call_date = datetime.now(timezone.utc)
 
-    db.commit()
-    db.refresh(customer)
-
-    # save Alarm if product_alarm_date
     product_alarm_date = getattr(update_data, "product_alarm_date", None)
     alarm_note = getattr(update_data, "alarm_note", "")
-
     if product_alarm_date:
         try:
-#            naive_dt = datetime.strptime(product_alarm_date, "%Y-%m-%dT%H:%M")
-#            product_alarm_date = naive_dt.astimezone(timezone.utc)            
-
             product_alarm_date = local_to_utc(product_alarm_date)
-
         except ValueError:
-            product_alarm_date = datetime.now(timezone.utc)
-
+            product_alarm_date = now
         event_alarm_reminder_minutes = int(getattr(update_data, "event_alarm_reminder", 30))
         event_alarm_reminder = product_alarm_date - timedelta(minutes=event_alarm_reminder_minutes)
 
-        # Try to find existing alarm for this user & customer
-        alarm = (
-            db.query(Alarm)
-            .filter_by(customer_id=customer_id, caller_id=user.caller_id, product_id=product_id)
-            .first()
-        )
-
-        if not alarm:
-            alarm = Alarm(customer_id=customer_id, caller_id=user.caller_id)
-            db.add(alarm)
-        else:
-            print(f"Alarm found: {alarm.id}")
-
-        # Update shared fields
-        alarm.date = product_alarm_date
-        alarm.reminder = event_alarm_reminder
-        alarm.reminder_sent =  None
-        alarm.note = alarm_note
-        alarm.extra = alarm.extra or {}
-        alarm.product_id = product_id
-
-        try:
-            db.commit()
-            db.refresh(alarm)
-            print(f"Alarm saved successfully: {alarm.id}")
-        except Exception as e:
-            db.rollback()
-            print("Failed to save alarm:", e)
-
-
-
-    # Get the CustomerProduct match
-    product_customer = db.query(ProductCustomer).filter_by(
-        customer_id=customer_id, product_id=product_id
-    ).first()
-
-    # Check if product_customer exists
-    if (product_id and (product_status or product_type_status)):
-        if not product_customer:
-            print("No existing ProductCustomer found. Creating a new one.")
-            product_customer = ProductCustomer(
-                customer_id=customer_id,
-                product_id=product_id
-            )
-        else:
-            print("Found existing ProductCustomer:", product_customer)
-
-        # Update status
-        if product_status:
-            product_customer.status = product_status
-            if (product_status == "3" and product_customer.order_date == None):
-                product_customer.order_date = datetime.now(timezone.utc)
-                print ("order_date set")
-        if product_type_status:
-            product_customer.type_status = product_type_status
-        print("Setting ProductCustomer.type_status =", product_type_status)
-
-        # Add to DB and commit
-        db.add(product_customer)
-        try:
-            db.commit()
-        except Exception as e:
-            db.rollback()
-
-    # Try to fetch existing call by ID if provided
-    existing_call = None
-    if isinstance(call_id, str):
-        existing_call = db.query(Call).filter_by(id=call_id).first()
-
-    if (status):
-        # Use existing call or create new one
+    # Reads and validation first, so the write lock is held only for the writes
+    call = None
+    if status:
+        # existing call by ID, or a new one
+        existing_call = None
+        if isinstance(call_id, str) and call_id:
+            result = await db.execute(select(Call).filter_by(id=call_id))
+            existing_call = result.scalars().first()
         call = existing_call or Call()
 
-        # Populate DB model dynamically
         try:
             call = populate(update_data.model_dump(exclude_unset=True), call, CallUpdate)
         except ValidationError as e:
@@ -398,9 +316,8 @@ async def save_call(
 
         # Set call_date for new calls
         if not existing_call:
-            call.call_date = datetime.now(timezone.utc)
+            call.call_date = now
             call.id = None  # let DB auto-generate if using Integer PK
-            db.add(call)
 
         # set caller_id from logged in user
         call.caller_id = user.caller_id
@@ -408,15 +325,52 @@ async def save_call(
         if (not call.note):
             call.note=""
 
-        try:
-            db.commit()
-            db.refresh(call)
-        except IntegrityError:
-            db.rollback()
-            raise
-
-    if (status):
-        responce = JSONResponse(content={"detail": "Saved", "call_id": call.id})
+    async def write(db: AsyncSession):
+        """All of the save in one transaction (core.write_queue commits it)."""
+        # update customer comment
+        result = await db.execute(
+            update(Customer)
+            .where(Customer.id == customer_id)
+            .values(comment=customer_comment)
+            .execution_options(synchronize_session=False, customer_ids=[customer_id])
+        )
+        if result.rowcount == 0:
+            return None
+
+        # alarm for this caller, customer and product
+        if product_alarm_date:
+            if user.caller_id is None:
+                print("⚠️ Alarm not saved: user has no caller")
+            else:
+                await db.execute(alarm_upsert(
+                    dialect, customer_id, user.caller_id, product_id,
+                    product_alarm_date, event_alarm_reminder, alarm_note,
+                ))
+
+        # the customer's status on the product
+        if product_id and (product_status or product_type_status):
+            await db.execute(product_customer_upsert(
+                dialect, customer_id, int(product_id),
+                int(product_status) if product_status else None,
+                int(product_type_status) if product_type_status else None,
+                now,
+            ))
+
+        saved_call = None
+        if call is not None:
+            saved_call = await db.merge(call)
+            # Answered/external call: move customer.last_call_date forward in the same commit
+            if saved_call.status in LAST_CALL_STATUSES:
+                await db.execute(touch_last_call_date(saved_call.customer_id, saved_call.call_date))
+            await db.flush()  # saved_call.id
+        return {"call_id": saved_call.id if saved_call is not None else None}
+
+    saved = await run_write(db, write)
+    if saved is None:
+        return JSONResponse(content={"detail": "Customer not found"}, status_code=404)
+
+    if saved["call_id"] is not None:
+        responce = JSONResponse(content={"detail": "Saved", "call_id": saved["call_id"]})
     else:
         responce = JSONResponse(content={"detail": "Saved"})
 
@@ -483,22 +437,24 @@ def call_info(call_id: int, request: Request, db: Session = Depends(get_db)):
 
 # ---------------------------
 # Customer Call Log Fragment
+# Older calls for the call panel ("Load older"), one keyset page
 # ---------------------------
-@router.get("/customer/{customer_id}/calls", response_class=HTMLResponse)
-def customer_call_log(customer_id: int, request: Request, db: Session = Depends(get_db)):
+@router.get("/customer/{customer_id}/calls", response_class=HTMLResponse, name="customer_calls_page")
+async def customer_call_log(
+    customer_id: int,
+    request: Request,
+    before: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async),
+):
     """
-    Return HTMX fragment with a customer's call history.
+    Return HTMX fragment with the customer's calls older than call id `before`.
     """
-    calls = (
-        db.query(models.Call)
-        .filter(models.Call.customer_id == customer_id)
-        .order_by(models.Call.timestamp.desc())
-        .all()
-    )
+    calls, next_before = await customer_calls_page(db, customer_id, before)
 
     return templates.TemplateResponse(
-        "calls/fragments/customer_calls.html",
-        {"request": request, "calls": calls, "customer_id": customer_id},
+        "calls/call_page.html",
+        {"request": request, "calls": calls, "customer_id": customer_id, "next_before": next_before},
     )
 
 
@@ -597,14 +553,10 @@ async def websocket_endpoint(websocket: WebSocket):
     print("User ID", user_id)
 
 
-    if user_id not in active_connections:
-        active_connections[user_id] = []
-        user_data[user_id] = {"user_id": user_id}
-
-    active_connections[user_id].append(websocket)
+    connection = await connections.connect(user_id, websocket)
 
     # Send initial value
-    await websocket.send_json(user_data[user_id])
+    connection.offer(dict(user_data[user_id]))
 
     # Server !websocket relay messages
     try:
@@ -619,14 +571,8 @@ async def websocket_endpoint(websocket: WebSocket):
             if (type == "call"):
                 # clicked the call button on frintend (not uses anymore)
                 number = payload.get("number")
-                for ws in active_connections.get(user_id, []):
-                    try:
-                        print("Sending to web sockets")
-                        await ws.send_json({ "type": "call", "number": number })
-
-                    except RuntimeError:
-                        # WebSocket is closed, mark for removal
-                        to_remove.append(ws)                        
+                print("Sending to web sockets")
+                await push(user_id, { "type": "call", "number": number })
             elif (type == "sms"):
 
                 sms_type = payload.get("sms_type")
@@ -640,18 +586,11 @@ async def websocket_endpoint(websocket: WebSocket):
                     data = { "type": "sms", "message": message }
                     print(f"Multiple SMS")                
 
-                for ws in active_connections.get(user_id, []):
-                    try:
-                        print("Sending to web sockets")
-                        await ws.send_json(data)
-
-                    except RuntimeError:
-                        # WebSocket is closed, mark for removal
-                        to_remove.append(ws) 
+                print("Sending to web sockets")
+                await push(user_id, data)
 
 
     except WebSocketDisconnect:
-        active_connections[user_id].remove(websocket)
-        if not active_connections[user_id]:
-            del active_connections[user_id]
-            del user_data[user_id]
+        pass
+    finally:
+        await connections.disconnect(connection)
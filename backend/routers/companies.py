@@ -16,6 +16,7 @@ from templates import templates
 import data.constants as constants
 from models.models import Company, CompanyUpdate, Caller
 from core.functions.helpers import populate, build_filters
+from functions.reference import get_callers
 
 from models.models import Update
 
@@ -60,8 +61,7 @@ def company_new(
 
     company = Company.empty()
 
-    query = db.query(Caller)
-    callers = query.all()
+    callers = get_callers(db)
 
     return templates.TemplateResponse(
         "companies/edit.html",
@@ -170,10 +170,7 @@ def company_detail(
     else:
         company = Company.empty()
 
-    callers = (
-        db.query(Caller)
-        .all()
-    )
+    callers = get_callers(db)
 
     company.caller_id = int(company.caller_id) if company.caller_id is not None else None
 
@@ -227,10 +224,7 @@ def company_filter(
     db: Session = Depends(get_db)
 ):
         
-    callers = (
-        db.query(Caller)
-        .all()
-    )
+    callers = get_callers(db)
 
     filter_dict = {}
 #    filters = build_filters(data_dict, Company)
@@ -267,7 +261,7 @@ async def set_filter(
     # later you can re-run build_filters(request.session["company_filters"], Company)
 
     query = db.query(Company)
-    filters = build_filters(data_dict, Company)
+    filters = build_filters(data_dict, Company, db.bind.dialect.name)
     if filters:
         query = query.filter(*filters)
     companies = query.all()
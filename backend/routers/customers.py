@@ -6,7 +6,9 @@ from functions.customers import get_selected_ids, get_customers, SelectedIDs
 
 from fastapi import FastAPI, Request, Form, status
 from sqlalchemy import Column, Integer, String, JSON
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 from pydantic import BaseModel, Field
 
@@ -14,7 +16,8 @@ from typing import List, Optional, Dict, Any
 from typing import Any, Union, Optional, get_origin, get_args
 
 from core.models.base import Base
-from core.database import get_db
+from core.database import get_db, get_async_db
+from core.write_queue import run_write
 from core.functions.helpers import render
 from templates import templates
 
@@ -24,11 +27,15 @@ from models.models import Customer, CustomerUpdate, Caller, ProductCustomer
 from core.functions.helpers import populate, build_filters
 
 from models.models import Update
-from core.auth import get_current_user
+from core.auth import get_current_user, get_current_user_async
 from core.models.models import BaseMixin, Update, User
 
-from functions.customers import get_user_customers
+from functions.customers import get_user_customers, get_user_customers_page, get_user_customer_ids, sync_customer_values
+from functions.customers import get_user_customer_facets
+from functions.search import search_customers
+from functions.product_status import product_status_rows, customer_status_totals
 from functions.customers import get_selected_ids, assign_customers_caller, SelectedIDs
+from functions.reference import get_callers
 
 
 
@@ -64,19 +71,78 @@ def customers_list(
     db: Session = Depends(get_db),
     user = Depends(get_current_user),
 ):
-    customers = get_user_customers(db, request, user)
-    callers = db.query(Caller).all()
+    customers, next_cursor = get_user_customers_page(db, request, user)
+    callers = get_callers(db)
 
     return templates.TemplateResponse(
         "customers/list.html",
         {"request": request, 
          "customers": customers,
+         "next_cursor": next_cursor,
          "is_admin": user.admin,
          "callers": callers,
 
         }
     )
 
+# -------------------------------------------------
+# Next page of the customer list (infinite scroll)
+# Returns rows only, swapped in place of the sentinel row
+# -------------------------------------------------
+@router.get("/page", response_class=HTMLResponse, name="customers_page")
+def customers_page(
+    request: Request,
+    cursor: str | None = Query(default=None),
+    offset: int = Query(default=0),
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user),
+):
+    customers, next_cursor = get_user_customers_page(db, request, user, cursor)
+
+    return templates.TemplateResponse(
+        "customers/list_rows.html",
+        {"request": request, 
+         "customers": customers,
+         "next_cursor": next_cursor,
+         "offset": offset,
+        }
+    )
+
+# -------------------------------------------------
+# Search box in list.html, ranked full-text matches
+# Empty query returns the first list page again
+# -------------------------------------------------
+@router.get("/search", response_class=HTMLResponse, name="customers_search")
+def customers_search(
+    request: Request,
+    q: str = Query(default=""),
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user),
+):
+    next_cursor = None
+    if q.strip():
+        customers = search_customers(db, request, user, q)
+    else:
+        customers, next_cursor = get_user_customers_page(db, request, user)
+
+    return templates.TemplateResponse(
+        "customers/list_rows.html",
+        {"request": request, 
+         "customers": customers,
+         "next_cursor": next_cursor,
+         "offset": 0,
+        }
+    )
+
+@router.get("/ids", name="customers_ids")
+def customers_ids(
+    request: Request,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user),
+):
+    """All ids in the filtered list, for select visible across pages."""
+    return JSONResponse(content=get_user_customer_ids(db, request, user))
+
 @router.post("/data", name="customers_data")
 def customers_data(
     request: Request,
@@ -145,8 +211,8 @@ def validation_error(errors: list):
 async def upsert_customer(
     request: Request,
     update_data: Update,
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
 ):
 
     # Determine if this is an update or create
@@ -156,7 +222,8 @@ async def upsert_customer(
             id_int = int(id)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid Customer ID")
-        data_record = db.query(Customer).filter(Customer.id == id_int).first()
+        result = await db.execute(select(Customer).filter(Customer.id == id_int))
+        data_record = result.scalars().first()
         if not data_record:
             raise HTTPException(status_code=404, detail="Customer not found")
     else:
@@ -184,10 +251,12 @@ async def upsert_customer(
     data_record = populate(data_dict, data_record, CustomerUpdate)
     # --- Handle relationships AFTER populate ---
     if isinstance(caller_id, int):
-        caller_instance = db.get(Caller, int(caller_id))
+        caller_instance = await db.get(Caller, int(caller_id))
         if not caller_instance:
             raise HTTPException(status_code=404, detail="Caller not found")
-        data_record.caller = caller_instance  # assign the actual SQLAlchemy object
+        # the id only: the write unit merges data_record into its own session,
+        # and a Caller of this session would drag it along Caller.customers
+        data_record.caller_id = caller_instance.id
 
 
     # Normalize CSV: remove extra spaces and surrounding quotes
@@ -202,7 +271,8 @@ async def upsert_customer(
 
     # Duplicate email
     if (data_record.email):
-        duplicate_email = db.query(Customer).filter(Customer.id != id, Customer.email == data_record.email).first()
+        result = await db.execute(select(Customer).filter(Customer.id != id, Customer.email == data_record.email))
+        duplicate_email = result.scalars().first()
         if duplicate_email:
             errors.append({
                 "loc": ["body", "email"],
@@ -212,7 +282,8 @@ async def upsert_customer(
     
     # Duplicate phone
     if (data_record.phone):
-        duplicate_phone = db.query(Customer).filter(Customer.id != id, Customer.phone == data_record.phone).first()
+        result = await db.execute(select(Customer).filter(Customer.id != id, Customer.phone == data_record.phone))
+        duplicate_phone = result.scalars().first()
         if duplicate_phone:
             errors.append({
                 "loc": ["body", "phone"],
@@ -221,11 +292,12 @@ async def upsert_customer(
             })
     
     # Duplicate first + last name
-    duplicate_name = db.query(Customer).filter(
+    result = await db.execute(select(Customer).filter(
         Customer.id != id,
         Customer.first_name == data_record.first_name,
         Customer.last_name == data_record.last_name
-    ).first()
+    ))
+    duplicate_name = result.scalars().first()
     if duplicate_name:
         errors.append({
             "loc": ["body", "first_name", "last_name"],
@@ -237,18 +309,22 @@ async def upsert_customer(
     if errors:
         return JSONResponse(status_code=422, content={"detail": errors})
 
-    db.add(data_record)
-    db.commit()
-    db.refresh(data_record)
+    async def write(db: AsyncSession):
+        record = await db.merge(data_record)
+        # Keep the filter junction tables in step with the JSON columns
+        await db.run_sync(lambda sync_db: sync_customer_values(sync_db, record))
+
+    await run_write(db, write)
 
     # Render updated list (HTMX swap)
-    customers = get_user_customers(db, request, user)
+    customers, next_cursor = await db.run_sync(lambda sync_db: get_user_customers_page(sync_db, request, user))
     
     response =  templates.TemplateResponse(
         "customers/list.html",
         {
             "request": request, 
             "customers": customers,
+            "next_cursor": next_cursor,
             "detail": "Updated"},
     )
 
@@ -264,6 +340,7 @@ def customer_detail(
     user = Depends(get_current_user),
     list: str | None = Query(default=None),
     status_filter: int | None = Query(default=None),
+    after: int | None = Query(default=None),
     db: Session = Depends(get_db)
 ):
     
@@ -282,59 +359,39 @@ def customer_detail(
         customer = Customer.empty()
         customer.caller_id = user.caller_id
 
-    callers = db.query(Caller).all()
+    callers = get_callers(db)
 
     customer.caller_id = int(customer.caller_id) if customer.caller_id is not None else None
 
     if list == "short":
+        if status_filter is None:
+            status_filter = 0
 
-    # Query product customers
-        query = db.query(ProductCustomer).join(Customer).filter(ProductCustomer.customer_id == customer_id)
-        product_customers = query.all()
-
-        # Calculate totals per status
-        totals = {"s1":0, "s2":0, "s3":0, "s4":0, "s5":0, "s6":0, "s7":0, "all":0}
-        for ec in product_customers:
-            totals["all"] += 1
-            if ec.status == 2:
-                totals["s2"] += 1
-            elif ec.status == 1:
-                totals["s1"] += 1
-            elif ec.status == 3:
-                totals["s3"] += 1
-            elif ec.status == 4:
-                totals["s4"] += 1
-            elif ec.status == 5:
-                totals["s5"] += 1
-            elif ec.status == 6:
-                totals["s6"] += 1
-            elif ec.status == 7:
-                totals["s7"] += 1
+        product_customers, next_after = product_status_rows(
+            db, customer_id=int(customer_id), status=status_filter, after=after
+        )
+        context = {
+            "request": request, 
+            "customer": customer, 
+            "customer_id": customer_id, 
+            "categories_map": constants.categories_map,
+            "organisations_map": constants.organisations_map, 
+            "filters_map": constants.filters_map, 
+            "personalities_map": constants.personalities_map, 
+            "callers": callers,
+            "product_customers": product_customers,
+            "next_after": next_after,
+            "status_filter": status_filter
+        }
 
-        
-        if status_filter is not None:
-            query = query.filter(ProductCustomer.status == status_filter)
-        else:
-            status_filter = 0
-        product_customers = query.all()
+        # Next page of rows (infinite scroll)
+        if after is not None:
+            return templates.TemplateResponse("customers/info_rows.html", context)
+
+        context["totals"] = customer_status_totals(db, int(customer_id))
 
         # Render short template
-        return templates.TemplateResponse(
-            "customers/info.html",
-            {
-                "request": request, 
-                "customer": customer, 
-                "customer_id": customer_id, 
-                "categories_map": constants.categories_map,
-                "organisations_map": constants.organisations_map, 
-                "filters_map": constants.filters_map, 
-                "personalities_map": constants.personalities_map, 
-                "callers": callers,
-                "product_customers": product_customers,
-                "totals": totals,
-                "status_filter": status_filter
-            }
-        )
+        return templates.TemplateResponse("customers/info.html", context)
     else:
         # Render full template
         return templates.TemplateResponse(
@@ -371,15 +428,15 @@ def delete_customer(customer_id: str, db: Session = Depends(get_db), user = Depe
 @router.get("/filter", response_class=HTMLResponse)
 def customer_filter(
     request: Request,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user),
 ):
         
-    callers = (
-        db.query(Caller)
-        .all()
-    )
+    callers = get_callers(db)
 
     filter_dict = request.session.get("customer_filters", {})
+    # Counts per option within the current filter (bitmap index)
+    facets = get_user_customer_facets(db, request, user)
 
     return templates.TemplateResponse(
         "customers/filter.html",
@@ -391,6 +448,7 @@ def customer_filter(
             "c_filters": constants.filters, 
             "personalities": constants.personalities, 
             "callers": callers,
+            "facets": facets,
         }
     )
 
@@ -400,19 +458,19 @@ from sqlalchemy import or_, and_
 async def set_filter(
     request: Request,
     update_data: Update,
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async),
 ):
     data_dict = update_data.model_dump()
 
     # save filters definition (not SQLAlchemy objects) in session
     request.session["customer_filters"] = data_dict 
 
-    customers = get_user_customers(db, request, user)
-    callers = db.query(Caller).all()
+    customers, next_cursor = await db.run_sync(lambda sync_db: get_user_customers_page(sync_db, request, user))
+    callers = await db.run_sync(get_callers)
 
     return templates.TemplateResponse(
         "customers/list.html",
-        {"request": request, "customers": customers, "callers": callers
+        {"request": request, "customers": customers, "next_cursor": next_cursor, "callers": callers
         }
     )
@@ -29,6 +29,8 @@ from core.models.base import Base
 from models.models import Product, ProductUpdate, ProductCustomer, Customer
 from models.models import Update
 from core.functions.helpers import populate, local_to_utc
+from functions.product_status import product_status_rows, product_status_totals
+from functions.reference import get_products
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -84,6 +86,7 @@ def product_detail(
     user = Depends(get_current_user),
     list: str | None = Query(default=None),
     status_filter: int | None = Query(default=None),
+    after: int | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
     
@@ -92,50 +95,32 @@ def product_detail(
         product = Product().empty()
 
     if list == "short":
-
-    # Query product customers
-        query = db.query(ProductCustomer).join(Customer).filter(ProductCustomer.product_id == product_id)
-        product_customers = query.all()
-
-        totals = {"s1":0, "s2":0, "s3":0, "s4":0, "s5":0, "s6":0, "s7":0, "all":0}
-        for ec in product_customers:
-            totals["all"] += 1
-            if ec.status == 2:
-                totals["s2"] += 1
-            elif ec.status == 1:
-                totals["s1"] += 1
-            elif ec.status == 3:
-                totals["s3"] += 1
-            elif ec.status == 4:
-                totals["s4"] += 1
-            elif ec.status == 5:
-                totals["s5"] += 1
-            elif ec.status == 6:
-                totals["s6"] += 1
-            elif ec.status == 7:
-                totals["s7"] += 1
-        
-        if status_filter is not None:
-            query = query.filter(ProductCustomer.status == status_filter)        
-        else:
+        if status_filter is None:
             status_filter = 0
-        product_customers = query.all()
 
-        # Render short template
-        return templates.TemplateResponse(
-            "products/info.html",
-            {
-                "request": request, 
-                "product": product, 
-                "product_customers": product_customers,
-                "totals": totals,
-                "status_filter": status_filter,
-                "user": user,
-                "products_map": constants.products_map,
-                "products_json": constants.products,
-                "filters_map": constants.filters_map
-            }
+        product_customers, next_after = product_status_rows(
+            db, product_id=product_id, status=status_filter, after=after
         )
+        context = {
+            "request": request,
+            "product": product,
+            "product_customers": product_customers,
+            "next_after": next_after,
+            "status_filter": status_filter,
+            "user": user,
+            "products_map": constants.products_map,
+            "products_json": constants.products,
+            "filters_map": constants.filters_map
+        }
+
+        # Next page of rows (infinite scroll)
+        if after is not None:
+            return templates.TemplateResponse("products/info_rows.html", context)
+
+        context["totals"] = product_status_totals(db, product_id)
+
+        # Render short template
+        return templates.TemplateResponse("products/info.html", context)
     else:
         # Render full template
         return templates.TemplateResponse(
@@ -208,7 +193,7 @@ async def upsert_product(
     db.refresh(product)
 
     # Render updated list (HTMX swap)
-    products = db.query(Product).all()
+    products = get_products(db)
     response = templates.TemplateResponse(
         "products/list.html",
         {
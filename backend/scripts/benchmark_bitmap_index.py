@@ -0,0 +1,149 @@
+import sys, os, argparse, random, tempfile, time, statistics
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# core.database needs DATABASE_URL at import; the benchmark uses its own file
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.database import create_db_engine
+from core.models.base import Base
+from core.functions.helpers import build_filters
+from models.models import Caller, Customer, CustomerCategory, CustomerOrganisation
+from functions.customers import CUSTOMER_JUNCTIONS, customer_values
+from functions.bitmap_index import CustomerBitmapIndex, BOOLEAN_FIELDS, bit_ids
+
+# Example usage:
+# python scripts/benchmark_bitmap_index.py --customers 50000 --queries 200
+
+CATEGORIES = [f"i{i}" for i in range(1, 21)]
+ORGANISATIONS = [str(i) for i in range(1, 8)]
+FILTER_TYPES = ["has", "has-all", "has-not", "exact"]
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(db, customers: int, rnd):
+    callers = [Caller(name=f"Caller {i}") for i in range(10)]
+    db.add_all(callers)
+    db.flush()
+
+    rows = []
+    for i in range(customers):
+        row = {
+            "user_id": "1",
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "caller_id": rnd.choice(callers).id if rnd.random() > 0.05 else None,
+            "contributes": rnd.choice([None, 1, 2, 3, 4, 5, 6]),
+            "personality_type": rnd.choice([None, 1, 2, 3, 4]),
+            "categories": rnd.sample(CATEGORIES, rnd.randint(0, 3)),
+            "organisations": rnd.sample(ORGANISATIONS, rnd.randint(0, 2)),
+        }
+        for field in BOOLEAN_FIELDS:
+            row[field] = rnd.choice([True, False, None])
+        rows.append(row)
+
+    db.execute(insert(Customer), rows)
+    ids = [c.id for c in db.query(Customer.id).order_by(Customer.id)]
+
+    # Junction tables in bulk, same values sync_customer_values() would write
+    db.execute(insert(CustomerCategory), [
+        {"customer_id": cid, "value_id": v} for cid, row in zip(ids, rows) for v in customer_values(row["categories"])
+    ])
+    db.execute(insert(CustomerOrganisation), [
+        {"customer_id": cid, "value_id": v} for cid, row in zip(ids, rows) for v in customer_values(row["organisations"])
+    ])
+    db.commit()
+    return [c.id for c in callers]
+
+
+def random_filter(rnd, caller_ids):
+    """A set_filter dict as posted by customers/filter.html."""
+    data = {}
+    for _ in range(rnd.randint(1, 3)):
+        field = rnd.choice(["categories", "organisations", "contributes", "personality_type", "caller_id", "boolean"])
+        if field == "boolean":
+            data[rnd.choice(BOOLEAN_FIELDS)] = rnd.choice(["true", "false"])
+            continue
+        if field == "categories":
+            data[field] = rnd.sample(CATEGORIES, rnd.randint(1, 3))
+        elif field == "organisations":
+            data[field] = rnd.sample(ORGANISATIONS, rnd.randint(1, 2))
+        elif field == "caller_id":
+            data[field] = [str(c) for c in rnd.sample(caller_ids, rnd.randint(1, 2))]
+        else:
+            data[field] = [str(rnd.randint(1, 6))]
+        data[f"{field}_type"] = rnd.choice(FILTER_TYPES)
+    return data
+
+# -----------------------------
+# RUN
+# -----------------------------
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bitmap index filter resolution with the SQL path")
+    parser.add_argument("--customers", type=int, default=20000, help="Seeded customers")
+    parser.add_argument("--queries", type=int, default=200, help="Random filter dicts")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", "production")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        caller_ids = seed(db, args.customers, rnd)
+
+        index = CustomerBitmapIndex()
+        _, build_ms = timed(lambda: index.build(db))
+
+        sql_ms, index_ms, facet_ms, mismatches = [], [], [], 0
+        for _ in range(args.queries):
+            data = random_filter(rnd, caller_ids)
+
+            def sql_ids():
+                filters = build_filters(data, Customer, engine.dialect.name, CUSTOMER_JUNCTIONS)
+                return [row.id for row in db.query(Customer.id).filter(*filters).order_by(Customer.id)]
+
+            expected, ms = timed(sql_ids)
+            sql_ms.append(ms)
+
+            bits, ms = timed(lambda: index.resolve(data))
+            got, ids_ms = timed(lambda: bit_ids(bits))
+            index_ms.append(ms + ids_ms)
+
+            _, ms = timed(lambda: index.facet_counts(bits))
+            facet_ms.append(ms)
+
+            if got != expected:
+                mismatches += 1
+                print(f"❌ {data}: SQL {len(expected)} ids, index {len(got)} ids")
+
+        db.close()
+        engine.dispose()
+
+    def p(values, q):
+        return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+    print(f"{args.customers} customers, {args.queries} filters, index built in {build_ms:.0f} ms")
+    print(f"{'path':<22}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'SQL (build_filters)':<22}{p(sql_ms, 50):>10.2f}{p(sql_ms, 99):>10.2f}")
+    print(f"{'bitmap resolve+ids':<22}{p(index_ms, 50):>10.2f}{p(index_ms, 99):>10.2f}")
+    print(f"{'bitmap facet counts':<22}{p(facet_ms, 50):>10.2f}{p(facet_ms, 99):>10.2f}")
+    print(f"{'✅' if not mismatches else '❌'} {mismatches} mismatches between SQL and index")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
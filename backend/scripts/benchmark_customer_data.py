@@ -0,0 +1,142 @@
+import sys, os, argparse, asyncio, random, statistics, tempfile, time
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# The app is imported below and binds to DATABASE_URL at import: point it at a temp file first
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/bench.db"
+os.chdir(BASE_DIR)
+
+import main as app_main
+from fastapi import Depends, HTTPException, Query, Request
+import httpx
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import data.constants as constants
+from core.auth import get_current_user_async
+from core.database import engine, get_async_db
+from core.models.base import Base
+from models.models import Caller, Customer, Call
+from templates import templates
+
+# Example usage:
+# python scripts/benchmark_customer_data.py
+# python scripts/benchmark_customer_data.py --customers 20000 --calls 100 --requests 2000
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(customers: int, calls: int, callers: int):
+    """Callers, customers and `calls` calls each, generated inside SQLite."""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Caller.__table__.insert(), [{"name": f"Caller {i}"} for i in range(callers)])
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO customers (user_id, first_name, last_name, phone, email, caller_id, categories, organisations, tags, extra) "
+            "SELECT '1', 'First' || n, 'Last' || n, '+4670' || n, 'user' || n || '@example.com', 1 + n % ?, "
+            "       '[\"i1\"]', '[\"1\"]', '[]', '{}' FROM seq",
+            (customers, callers),
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO calls (customer_id, caller_id, call_date, status, note, extra) "
+            "SELECT c.id, c.caller_id, datetime('2026-01-01', '+' || abs(random() % 31536000) || ' seconds'), "
+            "       1 + abs(random() % 3), 'Test call', '{}' "
+            "FROM customers c, seq",
+            (calls,),
+        )
+
+# -----------------------------
+# RUN
+# -----------------------------
+async def old_customer_data(
+    request: Request,
+    customer_id: int = Query(default=0),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    """The former handler: customer loaded twice, every Caller, 50 full Call rows with caller."""
+    result = await db.execute(
+        select(Customer).options(selectinload(Customer.caller)).filter(Customer.id == int(customer_id))
+    )
+    customer = result.scalars().first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    result = await db.execute(
+        select(Customer).options(selectinload(Customer.caller)).filter(Customer.id == customer_id)
+    )
+    customer = result.scalars().first()
+    result = await db.execute(select(Caller))
+    callers = result.scalars().all()
+    result = await db.execute(
+        select(Call).options(selectinload(Call.caller)).filter(Call.customer_id == int(customer_id)).order_by(desc(Call.id)).limit(50)
+    )
+    calls = result.scalars().all()
+
+    return templates.TemplateResponse(
+        "calls/customer_calls.html",
+        {
+            "request": request,
+            "customer": customer,
+            "categories_map": constants.categories_map,
+            "organisations_map": constants.organisations_map,
+            "filters_map": constants.filters_map,
+            "personalities_map": constants.personalities_map,
+            "callers": callers,
+            "calls": calls,
+        },
+    )
+
+
+async def measure(client, path: str, ids):
+    timings = []
+    for customer_id in ids:
+        start = time.perf_counter()
+        response = await client.get(path, params={"customer_id": customer_id})
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text[:200]
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+async def run(args):
+    """In-process requests on one event loop (ASGITransport), so the timings are the app's."""
+    app_main.on_startup()
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://testserver") as client:
+        await client.post("/login", data={"username": "admin", "password": "1234"})
+        ids = [random.randint(1, args.customers) for _ in range(args.requests)]
+        await measure(client, "/calls/customer_data", ids[:100])  # warm up
+        return [
+            ("before (old handler)", *await measure(client, "/bench/old_customer_data", ids)),
+            ("after", *await measure(client, "/calls/customer_data", ids)),
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /calls/customer_data latency (p50/p99)")
+    parser.add_argument("--customers", type=int, default=20000, help="Seeded customers")
+    parser.add_argument("--calls", type=int, default=100, help="Calls per customer")
+    parser.add_argument("--callers", type=int, default=200, help="Seeded callers")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per variant")
+    args = parser.parse_args()
+
+    seed(args.customers, args.calls, args.callers)
+    app_main.app.add_api_route("/bench/old_customer_data", old_customer_data, methods=["GET"])
+    results = asyncio.run(run(args))
+
+    print(f"{'/calls/customer_data':<24}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, p50, p99 in results:
+        print(f"{name:<24}{p50:>10.2f}{p99:>10.2f}")
+    print(f"✅ {args.requests} requests per variant, {args.customers} customers x {args.calls} calls")
+
+
+if __name__ == "__main__":
+    main()
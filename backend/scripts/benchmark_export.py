@@ -0,0 +1,117 @@
+import sys, os, argparse, csv, io, tempfile, time, tracemalloc
+from sqlalchemy.orm import sessionmaker
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# core.database needs DATABASE_URL at import; the benchmark uses its own file
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.database import create_db_engine
+from core.models.base import Base
+from models.models import Caller, Customer
+from functions.export import stream_export, customers_export
+
+# Example usage:
+# python scripts/benchmark_export.py                     (1M customers)
+# python scripts/benchmark_export.py --customers 200000 --sample 50000
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(engine, customers: int):
+    """Customers with the JSON list columns filled, generated inside SQLite."""
+    with engine.begin() as conn:
+        conn.execute(Caller.__table__.insert(), [{"name": f"Caller {i}"} for i in range(5)])
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO customers (user_id, first_name, last_name, email, phone, location, caller_id, "
+            "                       categories, organisations, tags, filter_a, extra) "
+            "SELECT '1', 'First' || n, 'Last' || n, 'user' || n || '@example.com', '+4670' || n, 'Stockholm', "
+            "       1 + n % 5, '[\"i1\", \"i2\"]', '[\"1\"]', '\"tag1, tag2\"', n % 2, '{}' FROM seq",
+            (customers,),
+        )
+
+# -----------------------------
+# RUN
+# -----------------------------
+def run_stream(engine, fmt: str, limit=None):
+    """(rows, bytes, seconds) for a streamed export consumed chunk by chunk."""
+    query = customers_export()
+    if limit:
+        query = query.limit(limit)
+    size = lines = 0
+    start = time.perf_counter()
+    for chunk in stream_export(query, fmt, bind=engine):
+        size += len(chunk)
+        lines += chunk.count("\n")
+    rows = lines - 1 if fmt == "csv" else lines
+    return rows, size, time.perf_counter() - start
+
+
+def run_old(engine, limit):
+    """Load everything first (query.all(), like inspect_db.py), then encode."""
+    db = sessionmaker(bind=engine)()
+    start = time.perf_counter()
+    customers = db.query(Customer).order_by(Customer.id).limit(limit).all()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = [c.name for c in Customer.__table__.columns]
+    writer.writerow(columns)
+    for customer in customers:
+        writer.writerow([getattr(customer, c) for c in columns])
+    size = len(buffer.getvalue())
+    db.close()
+    return len(customers), size, time.perf_counter() - start
+
+
+def peak_mb(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming customer export")
+    parser.add_argument("--customers", type=int, default=1000000, help="Seeded customers")
+    parser.add_argument("--sample", type=int, default=100000, help="Rows for the load-everything comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", "production")
+        Base.metadata.create_all(bind=engine)
+
+        start = time.perf_counter()
+        seed(engine, args.customers)
+        print(f"Seeded {args.customers} customers in {time.perf_counter() - start:.0f}s")
+
+        results = []
+        for fmt in ("csv", "ndjson"):
+            rows, size, seconds = run_stream(engine, fmt)
+            results.append((f"stream {fmt}", rows, size, seconds))
+
+        memory = [
+            (f"stream csv, {args.customers} rows", peak_mb(run_stream, engine, "csv")),
+            (f"stream csv, {args.sample} rows", peak_mb(run_stream, engine, "csv", args.sample)),
+            (f"query.all() csv, {args.sample} rows", peak_mb(run_old, engine, args.sample)),
+        ]
+        engine.dispose()
+
+    print(f"{'export':<14}{'rows':>10}{'MB':>10}{'seconds':>10}{'rows/s':>10}")
+    for name, rows, size, seconds in results:
+        print(f"{name:<14}{rows:>10}{size / 1024 / 1024:>10.0f}{seconds:>10.1f}{rows / seconds:>10.0f}")
+    print(f"{'peak Python memory':<36}{'MB':>8}")
+    for name, mb in memory:
+        print(f"{name:<36}{mb:>8.1f}")
+
+    ok = all(rows == args.customers for _, rows, _, _ in results)
+    print(f"{'✅' if ok else '❌'} {args.customers} rows in every format")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import sys, os, argparse, csv, random, tempfile, time
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# core.database needs DATABASE_URL at import; the benchmark uses its own files
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.database import create_db_engine
+from core.models.base import Base
+from core.functions.helpers import formatPhoneNr
+from models.models import Caller, Customer
+from functions.customers import sync_customer_values
+from functions.importer import import_customers_csv, parse_customer_row
+from functions.search import create_search_index
+
+# Example usage:
+# python scripts/benchmark_import.py --rows 50000
+# python scripts/benchmark_import.py --rows 5000 --old      (also time the former row-by-row import)
+
+FIELDS = ["first_name", "last_name", "phone", "email", "location", "caller_name",
+          "categories", "organisations", "tags", "filter_a", "contributes"]
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def write_csv(path: str, rows: int, existing: int, rnd):
+    """rows lines; ~10% reuse a phone (existing customer or earlier line)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for i in range(rows):
+            n = rnd.randint(0, existing + i) if rnd.random() < 0.1 else existing + i
+            writer.writerow({
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "phone": f"070-{n:07d}",
+                "email": f"user{i}@example.com",
+                "location": rnd.choice(["Stockholm", "Göteborg", "Malmö"]),
+                "caller_name": f"Caller {rnd.randint(1, 20)}",
+                "categories": ",".join(rnd.sample(["i1", "i2", "i3", "i4"], rnd.randint(0, 2))),
+                "organisations": rnd.choice(["", "1", "1,3", "[2]"]),
+                "tags": rnd.choice(["", "lead", "lead,vip"]),
+                "filter_a": rnd.choice(["True", "False"]),
+                "contributes": rnd.choice(["", "1", "4"]),
+            })
+
+
+def new_database(tmp: str, name: str, existing: int):
+    engine = create_db_engine(f"sqlite:///{tmp}/{name}.db", "production")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        create_search_index(conn)  # triggers run on every insert in production too
+    db = sessionmaker(bind=engine)()
+    db.add_all([Customer(user_id="1", first_name="E", last_name=str(i), phone=formatPhoneNr(f"070{i:07d}")) for i in range(existing)])
+    db.commit()
+    return engine, db
+
+# -----------------------------
+# REFERENCE: the former import (query per row, commit per new caller)
+# -----------------------------
+def old_import(db, stream):
+    added, duplicates = [], []
+    for row in csv.DictReader(stream):
+        phone = formatPhoneNr(row.get("phone", ""))
+        if not phone:
+            continue
+        if db.query(Customer).filter(Customer.phone == phone).first():
+            duplicates.append(phone)
+            continue
+
+        caller = None
+        name = (row.get("caller_name") or "").strip()
+        if name:
+            caller = db.query(Caller).filter(Caller.name == name).first()
+            if not caller:
+                caller = Caller(name=name)
+                db.add(caller)
+                db.commit()
+                db.refresh(caller)
+
+        customer = Customer(**parse_customer_row(row), caller_id=caller.id if caller else None)
+        sync_customer_values(db, customer)
+        db.add(customer)
+        added.append(phone)
+    db.commit()
+    return len(added), len(duplicates)
+
+# -----------------------------
+# RUN
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming CSV customer import")
+    parser.add_argument("--rows", type=int, default=50000, help="CSV rows")
+    parser.add_argument("--existing", type=int, default=10000, help="Customers already in the database")
+    parser.add_argument("--chunk", type=int, default=1000, help="Rows per transaction")
+    parser.add_argument("--old", action="store_true", help="Also time the former import")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/import.csv"
+        write_csv(path, args.rows, args.existing, random.Random(args.seed))
+
+        results = []
+        engine, db = new_database(tmp, "new", args.existing)
+        with open(path, newline="", encoding="utf-8") as f:
+            r = import_customers_csv(db, f, args.chunk)
+        new_count = db.execute(select(Customer.id)).all()
+        results.append(("streaming, chunked", r["seconds"], r["added"], len(r["duplicates"])))
+        db.close()
+        engine.dispose()
+
+        if args.old:
+            engine, db = new_database(tmp, "old", args.existing)
+            with open(path, newline="", encoding="utf-8") as f:
+                start = time.perf_counter()
+                added, duplicates = old_import(db, f)
+                results.append(("row by row (former)", time.perf_counter() - start, added, duplicates))
+            db.close()
+            engine.dispose()
+
+    print(f"{args.rows} rows, {args.existing} existing customers, chunk {args.chunk}")
+    print(f"{'import':<22}{'seconds':>10}{'rows/s':>10}{'added':>8}{'dupes':>8}")
+    for name, seconds, added, dupes in results:
+        print(f"{name:<22}{seconds:>10.2f}{args.rows / seconds:>10.0f}{added:>8}{dupes:>8}")
+    print(f"✅ {len(new_count)} customers after streaming import")
+
+
+if __name__ == "__main__":
+    main()
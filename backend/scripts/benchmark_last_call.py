@@ -0,0 +1,120 @@
+import sys, os, argparse, random, tempfile, time, datetime
+from sqlalchemy import select, text
+from sqlalchemy.orm import sessionmaker
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# core.database needs DATABASE_URL at import; the benchmark uses its own file
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.database import create_db_engine
+from core.models.base import Base
+from models.models import Caller, Customer, Call
+from functions.customers import LAST_CALL_STATUSES, calculate_last_call, touch_last_call_date
+
+# Example usage:
+# python scripts/benchmark_last_call.py                      (generate_test_data defaults: 200 calls each)
+# python scripts/benchmark_last_call.py --customers 20000 --calls 50
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(engine, customers: int, calls: int):
+    """Customers plus `calls` calls each, generated inside SQLite (70% answered, like generate_test_data)."""
+    with engine.begin() as conn:
+        conn.execute(Caller.__table__.insert(), [{"name": f"Caller {i}"} for i in range(5)])
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO customers (user_id, first_name, last_name, caller_id) "
+            "SELECT '1', 'First' || n, 'Last' || n, 1 + n % 5 FROM seq",
+            (customers,),
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO calls (customer_id, caller_id, call_date, status, note) "
+            "SELECT c.id, c.caller_id, "
+            "       datetime('2026-01-01', '+' || abs(random() % 31536000) || ' seconds'), "
+            "       CASE WHEN abs(random() % 10) < 7 THEN 1 WHEN abs(random() % 3) < 2 THEN 2 ELSE 3 END, "
+            "       'Test call' "
+            "FROM customers c, seq",
+            (calls,),
+        )
+
+# -----------------------------
+# RUN
+# -----------------------------
+def old_calculate_last_call(db, customers):
+    """The former implementation: one Call query per customer."""
+    for customer in customers:
+        last_call = (
+            db.query(Call)
+            .filter(Call.customer_id == customer.id)
+            .filter(Call.status.in_(LAST_CALL_STATUSES))
+            .order_by(Call.call_date.desc())
+            .first()
+        )
+        if last_call:
+            customer.last_call_date = last_call.call_date
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the set-based last_call_date recompute")
+    parser.add_argument("--customers", type=int, default=100000, help="Seeded customers")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per customer")
+    parser.add_argument("--sample", type=int, default=2000, help="Customers timed with the old per-row loop")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", "production")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        start = time.perf_counter()
+        seed(engine, args.customers, args.calls)
+        print(f"Seeded {args.customers} customers, {args.customers * args.calls} calls in {time.perf_counter() - start:.0f}s")
+
+        # Old loop on a sample, extrapolated to all customers
+        sample = db.query(Customer).order_by(Customer.id).limit(args.sample).all()
+        start = time.perf_counter()
+        old_calculate_last_call(db, sample)
+        old_s = (time.perf_counter() - start) * args.customers / len(sample)
+        expected = {c.id: c.last_call_date for c in sample}
+
+        db.execute(text("UPDATE customers SET last_call_date = NULL"))
+        db.commit()
+
+        start = time.perf_counter()
+        updated = calculate_last_call(db)
+        new_s = time.perf_counter() - start
+
+        got = dict(db.execute(
+            select(Customer.id, Customer.last_call_date).where(Customer.id.in_(expected))
+        ).all())
+        mismatches = sum(1 for id, value in expected.items() if got.get(id) != value)
+
+        # Incremental maintenance: one guarded UPDATE per saved call
+        ids = [random.randint(1, args.customers) for _ in range(1000)]
+        now = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+        for customer_id in ids:
+            db.execute(touch_last_call_date(customer_id, now))
+        db.commit()
+        touch_ms = (time.perf_counter() - start) * 1000 / len(ids)
+
+        db.close()
+        engine.dispose()
+
+    print(f"{'method':<34}{'seconds':>10}")
+    print(f"{'per-customer loop (extrapolated)':<34}{old_s:>10.1f}")
+    print(f"{'set-based UPDATE':<34}{new_s:>10.1f}")
+    print(f"Updated {updated} customers, incremental update {touch_ms:.3f} ms per call")
+    print(f"{'✅' if not mismatches else '❌'} {mismatches} mismatches against the per-customer loop ({len(expected)} checked)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
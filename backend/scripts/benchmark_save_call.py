@@ -0,0 +1,239 @@
+import sys, os, argparse, asyncio, random, statistics, tempfile, time
+from datetime import datetime, timedelta, timezone
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# The app is imported below and binds to DATABASE_URL at import: point it at a temp file first
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/bench.db"
+os.environ.setdefault("DB_PROFILE", "production")  # WAL + busy_timeout, as in docker-compose
+os.chdir(BASE_DIR)
+
+import main as app_main
+from fastapi import Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+import httpx
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.auth import get_current_user_async
+from core.database import DB_PROFILE, engine, get_async_db
+from core.functions.helpers import local_to_utc, populate
+from core.models.base import Base
+from core.models.models import Update, User
+from core.write_queue import write_queue
+from functions.customers import LAST_CALL_STATUSES, touch_last_call_date
+from models.models import Alarm, Call, CallUpdate, Caller, Customer, Product, ProductCustomer
+
+# Example usage:
+# python scripts/benchmark_save_call.py
+# python scripts/benchmark_save_call.py --callers 20 --saves 100 --customers 5000
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(customers: int, products: int):
+    """Customers and open products, generated inside SQLite."""
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(Caller.__table__.insert(), [{"name": "Caller 0"}])
+        conn.execute(
+            Product.__table__.insert(),
+            [{"name": f"Product {i}", "start_date": now, "end_date": now + timedelta(days=30)} for i in range(products)],
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO customers (user_id, first_name, last_name, phone, caller_id, categories, organisations, tags, extra) "
+            "SELECT '1', 'First' || n, 'Last' || n, '+4670' || n, 1, '[]', '[]', '[]', '{}' FROM seq",
+            (customers,),
+        )
+
+
+# -----------------------------
+# RUN
+# -----------------------------
+async def old_save_call(
+    request: Request,
+    update_data: Update,
+    comment: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
+):
+    """The former handler: a commit (and refresh) per customer, alarm, ProductCustomer and call."""
+    product_id = update_data.product_id
+    product_status = getattr(update_data, "product_status", None)
+    product_type_status = getattr(update_data, "product_type_status", None)
+    customer_id = update_data.customer_id
+    status = getattr(update_data, "status", None)
+    call_id = getattr(update_data, "call_id", None)
+
+    result = await db.execute(select(Customer).filter_by(id=customer_id))
+    customer = result.scalars().first()
+    customer.comment = getattr(update_data, "customer_comment", None)
+    await db.commit()
+    await db.refresh(customer)
+
+    product_alarm_date = getattr(update_data, "product_alarm_date", None)
+    if product_alarm_date:
+        product_alarm_date = local_to_utc(product_alarm_date)
+        result = await db.execute(
+            select(Alarm).filter_by(customer_id=customer_id, caller_id=user.caller_id, product_id=product_id)
+        )
+        alarm = result.scalars().first()
+        if not alarm:
+            alarm = Alarm(customer_id=customer_id, caller_id=user.caller_id)
+            db.add(alarm)
+        alarm.date = product_alarm_date
+        alarm.reminder = product_alarm_date - timedelta(minutes=30)
+        alarm.reminder_sent = None
+        alarm.note = getattr(update_data, "alarm_note", "")
+        alarm.extra = alarm.extra or {}
+        alarm.product_id = product_id
+        try:
+            await db.commit()
+            await db.refresh(alarm)
+        except Exception:
+            await db.rollback()
+
+    result = await db.execute(
+        select(ProductCustomer).filter_by(customer_id=customer_id, product_id=product_id)
+    )
+    product_customer = result.scalars().first()
+    if (product_id and (product_status or product_type_status)):
+        if not product_customer:
+            product_customer = ProductCustomer(customer_id=customer_id, product_id=product_id)
+        if product_status:
+            product_customer.status = product_status
+            if (product_status == "3" and product_customer.order_date == None):
+                product_customer.order_date = datetime.now(timezone.utc)
+        if product_type_status:
+            product_customer.type_status = product_type_status
+        db.add(product_customer)
+        try:
+            await db.commit()
+        except Exception:
+            await db.rollback()
+
+    existing_call = None
+    if isinstance(call_id, str):
+        result = await db.execute(select(Call).filter_by(id=call_id))
+        existing_call = result.scalars().first()
+
+    if (status):
+        call = existing_call or Call()
+        try:
+            call = populate(update_data.model_dump(exclude_unset=True), call, CallUpdate)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
+        if not existing_call:
+            call.call_date = datetime.now(timezone.utc)
+            call.id = None
+            db.add(call)
+        call.caller_id = user.caller_id
+        if (not call.note):
+            call.note=""
+        if call.status in LAST_CALL_STATUSES:
+            await db.execute(touch_last_call_date(call.customer_id, call.call_date))
+        try:
+            await db.commit()
+            await db.refresh(call)
+        except IntegrityError:
+            await db.rollback()
+            raise
+        return JSONResponse(content={"detail": "Saved", "call_id": call.id})
+    return JSONResponse(content={"detail": "Saved"})
+
+
+def payload(args) -> dict:
+    """One save as the dashboard sends it: call, product status, a comment and sometimes an alarm."""
+    data = {
+        "customer_id": random.randint(1, args.customers),
+        "product_id": str(random.randint(1, args.products)),
+        "product_status": str(random.randint(1, 5)),
+        "product_type_status": str(random.randint(1, 3)),
+        "status": str(random.choice([1, 2, 3])),
+        "note": "Benchmark call",
+        "customer_comment": "Benchmark comment",
+    }
+    if random.random() < 0.3:
+        data["product_alarm_date"] = "2030-01-01T10:00"
+        data["alarm_note"] = "Call back"
+    return data
+
+
+async def caller(client, path: str, args, timings: list, errors: list):
+    for _ in range(args.saves):
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload(args))
+            ok = response.status_code == 200
+        except Exception:  # e.g. "database is locked" raised through the app
+            ok = False
+        timings.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            errors.append(1)
+
+
+async def measure(client, path: str, args):
+    """args.callers concurrent callers, args.saves saves each."""
+    timings, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(client, path, args, timings, errors) for _ in range(args.callers)))
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    saved = len(timings) - len(errors)
+    return saved / elapsed, statistics.median(timings), timings[int(len(timings) * 0.99) - 1], len(errors)
+
+
+async def run(args):
+    """In-process requests on one event loop (ASGITransport), so the timings are the app's."""
+    app_main.on_startup()
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://testserver", timeout=120) as client:
+        await client.post("/login", data={"username": "admin", "password": "1234"})
+        with engine.begin() as conn:
+            conn.execute(User.__table__.update().values(caller_id=1))
+        results = [
+            ("before (old handler)", *await measure(client, "/bench/old_save_call", args)),
+            ("after", *await measure(client, "/calls/call/save", args)),
+        ]
+        # same handler, group commit through core.write_queue (WRITE_QUEUE=1)
+        write_queue.__init__(enabled=True, session_factory=write_queue.session_factory)  # fresh metrics
+        results.append(("after + write queue", *await measure(client, "/calls/call/save", args)))
+        print(f"write queue metrics: {write_queue.metrics()}")
+        await write_queue.stop()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /calls/call/save under concurrent callers")
+    parser.add_argument("--customers", type=int, default=5000, help="Seeded customers")
+    parser.add_argument("--products", type=int, default=10, help="Seeded products")
+    parser.add_argument("--callers", type=int, default=20, help="Concurrent callers")
+    parser.add_argument("--saves", type=int, default=100, help="Saves per caller and variant")
+    args = parser.parse_args()
+
+    seed(args.customers, args.products)
+    app_main.app.add_api_route("/bench/old_save_call", old_save_call, methods=["POST"])
+    results = asyncio.run(run(args))
+
+    print(f"{'/calls/call/save':<24}{'saves/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for name, rate, p50, p99, failed in results:
+        print(f"{name:<24}{rate:>10.1f}{p50:>10.2f}{p99:>10.2f}{failed:>8}")
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(func.count()).select_from(ProductCustomer)).scalar()
+        pairs = conn.execute(
+            select(func.count()).select_from(select(ProductCustomer.customer_id, ProductCustomer.product_id).distinct().subquery())
+        ).scalar()
+    print(f"✅ {args.callers} callers x {args.saves} saves per variant, {DB_PROFILE} profile; product_customers {rows} rows / {pairs} pairs")
+
+
+if __name__ == "__main__":
+    main()
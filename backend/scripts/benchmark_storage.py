@@ -0,0 +1,137 @@
+import sys, os, argparse, random, tempfile, threading, time, datetime
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# core.database needs DATABASE_URL at import; the benchmark uses its own files
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.database import STORAGE_PROFILES, create_db_engine
+from core.models.base import Base
+from models.models import Caller, Customer, Call
+
+# Example usage:
+# python scripts/benchmark_storage.py --seconds 10 --readers 8 --writers 4
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(SessionFactory, customers: int):
+    db = SessionFactory()
+    try:
+        caller = Caller(name="Bench")
+        db.add(caller)
+        db.flush()
+        db.add_all([
+            Customer(
+                user_id="1",
+                first_name=f"First{i}",
+                last_name=f"Last{random.randint(0, customers)}",
+                phone=f"+46700{i:06d}",
+                caller_id=caller.id,
+            )
+            for i in range(customers)
+        ])
+        db.commit()
+        return caller.id
+    finally:
+        db.close()
+
+# -----------------------------
+# WORKLOADS
+# -----------------------------
+counter_lock = threading.Lock()
+
+def bump(counters, key):
+    with counter_lock:
+        counters[key] += 1
+
+def reader(SessionFactory, stop, counters):
+    """Customer list page: the read side of the call center."""
+    while not stop.is_set():
+        db = SessionFactory()
+        try:
+            db.execute(
+                select(Customer.id, Customer.first_name, Customer.last_name, Customer.phone)
+                .order_by(Customer.first_name.collate("NOCASE"), Customer.last_name.collate("NOCASE"))
+                .limit(100)
+            ).all()
+            bump(counters, "reads")
+        except OperationalError:
+            bump(counters, "read_errors")
+        finally:
+            db.close()
+
+
+def writer(SessionFactory, stop, counters, caller_id, customers):
+    """save_call: insert a call and touch the customer."""
+    while not stop.is_set():
+        db = SessionFactory()
+        try:
+            customer_id = random.randint(1, customers)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            db.add(Call(customer_id=customer_id, caller_id=caller_id, call_date=now, status=1, note=""))
+            db.get(Customer, customer_id).last_call_date = now
+            db.commit()
+            bump(counters, "writes")
+        except OperationalError:
+            db.rollback()
+            bump(counters, "write_errors")
+        finally:
+            db.close()
+
+
+def run_profile(profile: str, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", profile)
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        caller_id = seed(SessionFactory, args.customers)
+
+        counters = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=reader, args=(SessionFactory, stop, counters))
+            for _ in range(args.readers)
+        ] + [
+            threading.Thread(target=writer, args=(SessionFactory, stop, counters, caller_id, args.customers))
+            for _ in range(args.writers)
+        ]
+
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        engine.dispose()
+        return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite storage profiles under concurrent load")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration per profile")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads")
+    parser.add_argument("--writers", type=int, default=2, help="Writer threads")
+    parser.add_argument("--customers", type=int, default=20000, help="Seeded customers")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.customers} customers, {args.seconds}s per profile")
+    print(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'read err':>10}{'write err':>10}")
+    for profile in args.profiles:
+        c = run_profile(profile, args)
+        print(
+            f"{profile:<12}{c['reads'] / args.seconds:>10.0f}{c['writes'] / args.seconds:>10.0f}"
+            f"{c['read_errors']:>10}{c['write_errors']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import sys, os, argparse, json, statistics, subprocess, tempfile, time
+from datetime import datetime, timedelta, timezone
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# The app binds to DATABASE_URL and reads TEMPLATE_MODE at import: point them at a temp dir first
+# (each mode runs in its own process, started with the parent's directory in the env)
+TMP_DIR = os.environ.setdefault("TEMPLATE_BENCH_DIR", tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/bench.db"
+os.environ["TEMPLATE_BYTECODE_DIR"] = os.path.join(TMP_DIR, "jinja-bytecode")
+os.chdir(BASE_DIR)
+
+# Example usage:
+# python scripts/benchmark_templates.py
+# python scripts/benchmark_templates.py --customers 2000 --renders 500
+
+PAGES = ["customers/list.html", "calls/dashboard.html"]
+RUNS = [
+    ("development", "development"),
+    ("production", "production"),            # empty bytecode cache: compiled at startup
+    ("production restart", "production"),    # bytecode cache from the previous run, as after a restart
+]
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def seed(customers: int, products: int):
+    """Customers and open products, generated inside SQLite."""
+    from core.database import engine
+    from core.models.base import Base
+    from models.models import Caller, Product
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(Caller.__table__.insert(), [{"name": f"Caller {i}"} for i in range(5)])
+        conn.execute(
+            Product.__table__.insert(),
+            [{"name": f"Product {i}", "start_date": now, "end_date": now + timedelta(days=30)} for i in range(products)],
+        )
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO customers (user_id, first_name, last_name, phone, caller_id, categories, organisations, tags, extra) "
+            "SELECT '1', 'First' || n, 'Last' || n, '+4670' || n, 1 + n % 5, '[]', '[]', '[]', '{}' FROM seq",
+            (customers,),
+        )
+
+
+def make_request(app):
+    """A full-page (non-HTMX) GET as the routes see it."""
+    from starlette.requests import Request
+    return Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("testserver", 80),
+        "path": "/", "root_path": "", "query_string": b"", "headers": [],
+        "app": app, "router": app.router, "session": {},
+    })
+
+
+def contexts(app_main, dashboard_customers: int):
+    """Template contexts built as customers_list and call_center_dashboard build them."""
+    from types import SimpleNamespace
+    from core.database import SessionLocal
+    from data import constants
+    from functions.customers import get_customers, get_user_customers_page
+    from functions.reference import get_active_products, get_callers
+
+    admin = SimpleNamespace(admin=1, caller_id=1, caller=SimpleNamespace(id=1))
+    request = make_request(app_main.app)
+    with SessionLocal() as db:
+        customers, next_cursor = get_user_customers_page(db, request, admin)
+        callers = get_callers(db)
+        dashboard = get_customers(db, admin, list(range(1, dashboard_customers + 1)))
+        products = get_active_products(db)
+        db.expunge_all()
+    return {
+        "customers/list.html": {
+            "request": request, "customers": customers, "next_cursor": next_cursor,
+            "is_admin": admin.admin, "callers": callers,
+        },
+        "calls/dashboard.html": {
+            "request": request, "customers": dashboard, "products": products,
+            "products_json": constants.products, "filters_map": constants.filters_map,
+        },
+    }
+
+
+# -----------------------------
+# RUN (one mode per process)
+# -----------------------------
+def run_mode(renders: int, dashboard_customers: int) -> dict:
+    import main as app_main
+    from core.functions.helpers import render
+    from templates import TEMPLATE_MODE, precompile_templates, templates
+
+    ctx = contexts(app_main, dashboard_customers)
+
+    def render_page(page):
+        if page == "calls/dashboard.html":
+            return render(page, dict(ctx[page])).body   # full page through base.html, as the route
+        return templates.TemplateResponse(page, dict(ctx[page])).body
+
+    result = {"mode": TEMPLATE_MODE, "startup_ms": 0.0, "pages": {}}
+    if TEMPLATE_MODE == "production":
+        t0 = time.perf_counter()
+        result["templates"] = precompile_templates()
+        result["startup_ms"] = (time.perf_counter() - t0) * 1000
+
+    for page in PAGES:
+        t0 = time.perf_counter()
+        size = len(render_page(page))
+        first = (time.perf_counter() - t0) * 1000
+
+        times = []
+        for _ in range(renders):
+            t0 = time.perf_counter()
+            render_page(page)
+            times.append((time.perf_counter() - t0) * 1000)
+        times.sort()
+        result["pages"][page] = {
+            "first_ms": first,
+            "p50_ms": statistics.median(times),
+            "p99_ms": times[min(len(times) - 1, int(len(times) * 0.99))],
+            "bytes": size,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare template render latency in development and production TEMPLATE_MODE")
+    parser.add_argument("--customers", type=int, default=2000, help="Customers in the database")
+    parser.add_argument("--dashboard-customers", type=int, default=200, help="Selected customers on the calls dashboard")
+    parser.add_argument("--products", type=int, default=20, help="Open products")
+    parser.add_argument("--renders", type=int, default=300, help="Timed renders per page and mode")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_mode(args.renders, args.dashboard_customers)))
+        return
+
+    seed(args.customers, args.products)
+    print(f"Seeded {args.customers} customers, {args.products} products; {args.renders} renders per page\n")
+
+    results = []
+    for label, mode in RUNS:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker",
+             "--renders", str(args.renders), "--dashboard-customers", str(args.dashboard_customers)],
+            env={**os.environ, "TEMPLATE_MODE": mode}, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"❌ {label} failed:\n{proc.stderr}")
+            sys.exit(1)
+        results.append((label, json.loads(proc.stdout.strip().splitlines()[-1])))
+
+    print(f"{'mode':<20}{'page':<24}{'startup ms':>12}{'first ms':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for label, result in results:
+        for page, stats in result["pages"].items():
+            print(
+                f"{label:<20}{page:<24}{result['startup_ms']:>12.1f}"
+                f"{stats['first_ms']:>10.2f}{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+            )
+
+    dev, prod = results[0][1]["pages"], results[1][1]["pages"]
+    for page in PAGES:
+        print(
+            f"✅ {page}: first render {dev[page]['first_ms']:.1f} → {prod[page]['first_ms']:.1f} ms, "
+            f"p50 {dev[page]['p50_ms']:.2f} → {prod[page]['p50_ms']:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
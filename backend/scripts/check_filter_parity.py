@@ -0,0 +1,147 @@
+import sys, os, argparse, random, tempfile
+from sqlalchemy.orm import sessionmaker
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# core.database needs DATABASE_URL at import; the check uses its own file
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from core.database import create_db_engine
+from core.models.base import Base
+from core.functions.helpers import build_filters
+from models.models import Customer
+from functions.customers import CUSTOMER_JUNCTIONS, customer_values, sync_customer_values
+
+# Example usage:
+# python scripts/check_filter_parity.py --customers 2000 --filters 500
+#
+# Checks exact matching on the JSON columns (exact_set_filter) against the former
+# Python matcher, and has/has-all/has-not/exact through the junction tables.
+
+# -----------------------------
+# REFERENCE: the former Python-side "exact" matching
+# -----------------------------
+def python_exact_match(row, column, expected):
+    raw_val = getattr(row, column, None)
+    if raw_val is None:
+        return False
+
+    # Normalize actual values (works for CSV or JSON)
+    if isinstance(raw_val, list):
+        actual_vals = set(str(v) for v in raw_val)
+    else:
+        actual_vals = set(v.strip() for v in str(raw_val).split(",") if v.strip())
+
+    return actual_vals == set(expected)
+
+
+def python_set_match(row, column, expected, filter_type):
+    """Set semantics of the junction table filters."""
+    actual, wanted = customer_values(getattr(row, column, None)), set(expected)
+    if filter_type == "has":
+        return bool(actual & wanted)
+    if filter_type == "has-all":
+        return wanted <= actual
+    if filter_type == "has-not":
+        return not (actual & wanted)
+    return actual == wanted
+
+# -----------------------------
+# DATA
+# -----------------------------
+POOL = ["i1", "i2", "i3", "a", "b", "c d", "Ö", "1", "10"]
+
+def random_value(rnd):
+    """Stored shapes seen in the wild: JSON lists, CSV strings, NULL, empty."""
+    kind = rnd.choice(["list", "list", "csv", "csv", "none", "empty", "dupes", "scalar"])
+    picked = rnd.sample(POOL, rnd.randint(1, 3))
+    if kind == "list":
+        return picked
+    if kind == "dupes":
+        return picked + picked[:1]
+    if kind == "csv":
+        sep = rnd.choice([",", ", ", " , "])
+        return sep.join(picked) + rnd.choice(["", ",", ", "])
+    if kind == "empty":
+        return rnd.choice([[], ""])
+    if kind == "scalar":
+        return rnd.choice([1, 10])
+    return None
+
+
+def random_filter(rnd):
+    picked = rnd.sample(POOL, rnd.randint(1, 3))
+    if rnd.random() < 0.3:
+        # Form posts CSV text for tag-like fields
+        return ", ".join(picked)
+    return picked
+
+# -----------------------------
+# CHECK
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQL list filters (JSON exact, junction tables) with Python references")
+    parser.add_argument("--customers", type=int, default=1000, help="Random customers")
+    parser.add_argument("--filters", type=int, default=300, help="Random filters per column")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    columns = ["categories", "organisations", "tags"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/parity.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        db.add_all([
+            Customer(user_id="1", first_name=f"F{i}", last_name=f"L{i}", **{c: random_value(rnd) for c in columns})
+            for i in range(args.customers)
+        ])
+        db.commit()
+        rows = db.query(Customer).all()
+
+        for row in rows:
+            sync_customer_values(db, row)
+        db.commit()
+
+        checked = mismatches = 0
+
+        def compare(label, sql_ids, py_ids):
+            nonlocal checked, mismatches
+            checked += 1
+            if sql_ids != py_ids:
+                mismatches += 1
+                print(f"❌ {label}: only SQL {sorted(sql_ids - py_ids)[:5]}, only Python {sorted(py_ids - sql_ids)[:5]}")
+
+        for column in columns:
+            for _ in range(args.filters):
+                value = random_filter(rnd)
+                # build_filters normalizes CSV input the same way for both
+                expected = value if isinstance(value, list) else [v.strip() for v in value.split(",") if v.strip()]
+                data = {column: value, f"{column}_type": "exact"}
+
+                filters = build_filters(data, Customer, engine.dialect.name)
+                sql_ids = {c.id for c in db.query(Customer.id).filter(*filters)}
+                py_ids = {r.id for r in rows if python_exact_match(r, column, expected)}
+                compare(f"json {column} exact {value!r}", sql_ids, py_ids)
+
+                for filter_type in ("has", "has-all", "has-not", "exact"):
+                    data[f"{column}_type"] = filter_type
+                    filters = build_filters(data, Customer, engine.dialect.name, CUSTOMER_JUNCTIONS)
+                    sql_ids = {c.id for c in db.query(Customer.id).filter(*filters)}
+                    py_ids = {r.id for r in rows if python_set_match(r, column, expected, filter_type)}
+                    compare(f"junction {column} {filter_type} {value!r}", sql_ids, py_ids)
+
+        db.close()
+        engine.dispose()
+
+    print(f"{'✅' if not mismatches else '❌'} {checked} filters checked, {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
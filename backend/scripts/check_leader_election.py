@@ -0,0 +1,163 @@
+import sys, os, argparse, asyncio, multiprocessing, signal, tempfile, time
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# Workers bind to DATABASE_URL at import: point it at a temp file first
+# (spawned workers re-run this module and inherit the parent's directory through the env)
+TMP_DIR = os.environ.setdefault("LEADER_CHECK_DIR", tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/leader.db"
+os.environ.setdefault("DB_PROFILE", "production")  # WAL + busy_timeout, as in docker-compose
+LOG_PATH = os.path.join(TMP_DIR, "events.log")
+
+# Example usage:
+# python scripts/check_leader_election.py
+# python scripts/check_leader_election.py --workers 5 --ttl 3 --renew 1
+
+# -----------------------------
+# WORKER PROCESS
+# -----------------------------
+def log_event(event: str):
+    """One line per event; O_APPEND keeps lines from several processes whole."""
+    with open(LOG_PATH, "a") as f:
+        f.write(f"{os.getpid()} {event} {time.time()}\n")
+
+
+def worker(ttl: float, renew: float):
+    """A worker running core.leader with one background loop that only logs start / stop."""
+    from core.leader import LeaderElection
+
+    async def run():
+        leader = LeaderElection(ttl=ttl, renew_interval=renew)
+
+        async def stop():
+            log_event("stop")
+
+        leader.add(lambda: log_event("start"), stop)
+        leader.start()
+
+        done = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, done.set)
+        await done.wait()
+        await leader.stop()  # clean shutdown: releases the lease
+
+    asyncio.run(run())
+
+
+# -----------------------------
+# CHECKS
+# -----------------------------
+def events():
+    if not os.path.exists(LOG_PATH):
+        return []
+    with open(LOG_PATH) as f:
+        return [(int(pid), event, float(t)) for pid, event, t in (line.split() for line in f)]
+
+
+def leaders():
+    """pid -> start time of the workers currently leading (per the log)."""
+    current = {}
+    for pid, event, t in events():
+        if event == "start":
+            current[pid] = t
+        else:
+            current.pop(pid, None)
+    return current
+
+
+def wait_for_leader(exclude, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        current = {pid: t for pid, t in leaders().items() if pid not in exclude}
+        if current:
+            return current
+        time.sleep(0.05)
+    return {}
+
+
+def overlaps(killed: dict):
+    """Leadership intervals that overlap; a killed leader's interval ends at the kill."""
+    intervals, open_ = [], {}
+    for pid, event, t in events():
+        if event == "start":
+            open_[pid] = t
+        elif pid in open_:
+            intervals.append((open_.pop(pid), t, pid))
+    for pid, start in open_.items():
+        intervals.append((start, killed.get(pid, float("inf")), pid))
+    intervals.sort()
+    return [(a, b) for a, b in zip(intervals, intervals[1:]) if b[0] < a[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several workers against one database and check leader election")
+    parser.add_argument("--workers", type=int, default=3, help="Worker processes")
+    parser.add_argument("--ttl", type=float, default=2.0, help="Lease TTL in seconds")
+    parser.add_argument("--renew", type=float, default=0.5, help="Renew interval in seconds")
+    args = parser.parse_args()
+
+    from core.database import engine
+    from core.models.models import Lease
+    Lease.__table__.create(bind=engine, checkfirst=True)
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = {}
+    for _ in range(args.workers):
+        p = ctx.Process(target=worker, args=(args.ttl, args.renew))
+        p.start()
+        procs[p.pid] = p
+
+    failures, killed = [], {}
+    try:
+        # 1. One leader among all workers
+        first = wait_for_leader(set(), 10 + args.ttl)
+        time.sleep(args.ttl)  # every worker has tried to take the lease by now
+        if len(leaders()) != 1 or not first:
+            failures.append(f"expected one leader, got {leaders()}")
+        leader_pid = next(iter(leaders()), None)
+        print(f"✅ elected {leader_pid} of {args.workers} workers")
+
+        # 2. Failover: the leader dies without releasing its lease
+        if leader_pid is not None:
+            os.kill(leader_pid, signal.SIGKILL)
+            killed[leader_pid] = time.time()
+            new = wait_for_leader(set(killed), args.ttl + 2 * args.renew + 2)
+            if not new:
+                failures.append("no new leader after the leader was killed")
+            else:
+                pid, t = next(iter(new.items()))
+                print(f"✅ failover to {pid} after {t - killed[leader_pid]:.2f}s (lease TTL {args.ttl}s)")
+                leader_pid = pid
+
+        # 3. Hand-over: the leader shuts down cleanly and releases its lease
+        if leader_pid is not None and args.workers > 2:
+            stopped = time.time()
+            os.kill(leader_pid, signal.SIGTERM)
+            procs[leader_pid].join(10)
+            new = wait_for_leader(set(killed) | {leader_pid}, 2 * args.renew + 2)
+            if not new:
+                failures.append("no new leader after a clean shutdown")
+            else:
+                pid, t = next(iter(new.items()))
+                print(f"✅ hand-over to {pid} after {t - stopped:.2f}s")
+    finally:
+        for p in procs.values():
+            if p.is_alive():
+                p.terminate()
+            p.join(10)
+
+    bad = overlaps(killed)
+    if bad:
+        failures.append(f"overlapping leaders: {bad}")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"✅ never more than one leader ({len(events())} events, log {LOG_PATH})")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ if BASE_DIR not in sys.path:
 from core.database import SessionLocal
 from models.models import Caller, Customer, Call, Product, ProductCustomer
 from core.models.models import User
+import functions.reference  # noqa: F401 - Caller/Product writes bump the web workers' cached lists
 
 # -----------------------------
 # CONFIG (base numbers)
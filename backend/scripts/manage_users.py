@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 from models.models import Caller
 from core.database import SessionLocal
 from core.models.models import User
+import functions.reference  # noqa: F401 - Caller writes bump the web workers' cached caller list
 from passlib.context import CryptContext
 
 # Example usage:
@@ -0,0 +1,39 @@
+import sys
+import os
+import argparse
+import time
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core.database import engine
+from functions.search import create_search_index, drop_search_index, rebuild_search_index
+
+# Example usage:
+# python scripts/rebuild_search_index.py
+# python scripts/rebuild_search_index.py --recreate
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the customer full-text search index")
+    parser.add_argument("--recreate", action="store_true", help="Drop and recreate table and triggers first")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        print(f"❌ Full-text index is SQLite only (database is {engine.dialect.name})")
+        return
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if args.recreate:
+            drop_search_index(conn)
+        create_search_index(conn)
+        count = rebuild_search_index(conn)
+        conn.exec_driver_sql("INSERT INTO customers_fts(customers_fts) VALUES ('optimize')")
+
+    print(f"✅ Indexed {count} customers in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
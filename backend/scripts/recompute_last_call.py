@@ -0,0 +1,38 @@
+import sys
+import os
+import argparse
+import time
+
+# --- Path setup ---
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core.database import SessionLocal
+from functions.customers import calculate_last_call
+
+# Example usage:
+# python scripts/recompute_last_call.py --all
+# python scripts/recompute_last_call.py --customer 12 --customer 15
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute customers.last_call_date from answered calls")
+    parser.add_argument("--all", action="store_true", help="All customers")
+    parser.add_argument("--customer", type=int, action="append", help="Only this customer id (repeatable)")
+    args = parser.parse_args()
+
+    if not args.all and not args.customer:
+        parser.print_help()
+        return
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        count = calculate_last_call(db, None if args.all else args.customer)
+        print(f"✅ Updated last_call_date for {count} customers in {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
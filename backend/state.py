@@ -1,10 +1,8 @@
 # app/state.py
 
-from typing import Dict, List
-from fastapi import WebSocket
+from typing import Dict
 
 # Store shared variables per user
 user_data: Dict[str, dict] = {}
 
-# Store active WebSocket connections per user
-active_connections: Dict[str, List[WebSocket]] = {}
\ No newline at end of file
+# Open WebSocket connections per user: core.ws.connections (ConnectionManager)
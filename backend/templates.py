@@ -1,9 +1,13 @@
 # app/templates.py
 from fastapi.templating import Jinja2Templates
 import os
+import tempfile
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from jinja2 import ChoiceLoader, FileSystemLoader
+from jinja2 import ChoiceLoader, FileSystemBytecodeCache, FileSystemLoader
+from jinja2.utils import LRUCache
+
+from core.lang import lang_context, translate_filter
 
 # Point to your templates directory
 
@@ -18,10 +22,53 @@ loader = ChoiceLoader([
 ])
 
 # Jinja2 will look in this order
-templates = Jinja2Templates(directory=str(app_templates_path))
+templates = Jinja2Templates(directory=str(app_templates_path), context_processors=[lang_context])
 templates.env.loader = loader
 
-# 🔥 disable Jinja caching
-templates.env.cache = {}
-templates.env.auto_reload = True
+# "t" uses the translator lang_context put in the request's context
+templates.env.filters["t"] = translate_filter
+
+# -------------------------------------------------
+# TEMPLATE_MODE selects how templates are loaded:
+#   development  edited templates are picked up on the next render
+#                (mtime checked on every load, the default)
+#   production   no mtime checks; a bounded cache (TEMPLATE_CACHE_SIZE)
+#                and compiled templates kept on disk in
+#                TEMPLATE_BYTECODE_DIR, so a restarted or additional
+#                worker skips the Jinja compiler. precompile_templates()
+#                loads every template at startup, so no request pays for
+#                compilation.
+# -------------------------------------------------
+TEMPLATE_MODE = os.environ.get("TEMPLATE_MODE", "development")
+TEMPLATE_CACHE_SIZE = int(os.environ.get("TEMPLATE_CACHE_SIZE", "400"))
+TEMPLATE_BYTECODE_DIR = os.environ.get(
+    "TEMPLATE_BYTECODE_DIR", os.path.join(tempfile.gettempdir(), "jinja-bytecode")
+)
+
+if TEMPLATE_MODE == "production":
+    os.makedirs(TEMPLATE_BYTECODE_DIR, exist_ok=True)
+    templates.env.cache = LRUCache(TEMPLATE_CACHE_SIZE)
+    templates.env.auto_reload = False
+    templates.env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_BYTECODE_DIR)
+elif TEMPLATE_MODE == "development":
+    # 🔥 pick up edited templates
+    templates.env.cache = {}
+    templates.env.auto_reload = True
+else:
+    raise ValueError(f"Unknown TEMPLATE_MODE '{TEMPLATE_MODE}'. Choose from: development, production")
+
+
+def precompile_templates() -> int:
+    """Load every template under templates/ and core/templates into the cache; returns the count."""
+    names = templates.env.list_templates(extensions=["html"])
+    if len(names) > TEMPLATE_CACHE_SIZE:
+        print(f"⚠️ {len(names)} templates but TEMPLATE_CACHE_SIZE is {TEMPLATE_CACHE_SIZE}: some will be recompiled")
+    loaded = 0
+    for name in names:
+        try:
+            templates.env.get_template(name)
+            loaded += 1
+        except Exception as e:
+            print(f"❌ Template {name} failed to compile: {e}")
+    return loaded
 